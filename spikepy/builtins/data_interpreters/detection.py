@@ -20,6 +20,7 @@ import scipy
 
 from spikepy.developer.data_interpreter import DataInterpreter 
 from spikepy.common.valid_types import ValidOption
+from spikepy.utils.ragged_array import as_ragged
 
 class DetectionInterpreter(DataInterpreter):
     name = 'Detection'
@@ -39,22 +40,26 @@ class DetectionInterpreter(DataInterpreter):
             fullpath = '%s%s' % (filename, file_format)
             fullpaths.append(fullpath)
 
+            event_times = as_ragged(trial.event_times.data)
+            channel_ids = event_times.channel_ids
+            if channel_ids is None:
+                channel_ids = range(len(event_times))
             data_dict = {}
-            for channel_num, channel_data in enumerate(trial.event_times.data):
-                data_dict['events_on_channel_%d' % channel_num] = channel_data
+            for channel_id, channel_data in zip(channel_ids, event_times):
+                data_dict['events_on_channel_%d' % channel_id] = channel_data
             if file_format == '.mat':
                 scipy.io.savemat(fullpath, data_dict)
             elif file_format == '.npz':
                 scipy.savez(fullpath, **data_dict)
             elif file_format == '.cPickle':
                 with open(fullpath, 'wb') as outfile:
-                    cPickle.dump(trial.event_times.data, outfile, protocol=-1)
+                    cPickle.dump(event_times.tolist(), outfile, protocol=-1)
             elif file_format == '.csv' or file_format == '.txt':
                 delimiters = {'.csv':',', '.txt':' '}
                 delimiter = delimiters[file_format]
                 with open(fullpath, 'wb') as outfile:
                     writer = csv.writer(outfile, delimiter=delimiter)
-                    for channel_data in trial.event_times.data:
+                    for channel_data in event_times:
                         writer.writerow(channel_data)
         return fullpaths
             
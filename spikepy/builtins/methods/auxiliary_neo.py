@@ -42,6 +42,9 @@ class NEODF(AuxiliaryMethod):
     requires = ['df_traces']
     provides = ['df_traces']
     is_stochastic = False
+    is_channel_parallel = True
+    sharded_requires = ['df_traces']
+    sharded_provides = ['df_traces']
 
     def run(self, signal, **kwargs):
         return [nonlinear_energy_operator(signal)]
@@ -52,3 +55,5 @@ class NEOEF(NEODF):
     runs_with_stage = 'extraction_filter'
     requires = ['ef_traces']
     provides = ['ef_traces']
+    sharded_requires = ['ef_traces']
+    sharded_provides = ['ef_traces']
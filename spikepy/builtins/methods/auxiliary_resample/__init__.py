@@ -15,8 +15,9 @@
 
 
 from spikepy.developer.methods import AuxiliaryMethod
-from spikepy.common.valid_types import ValidInteger
-from spikepy.utils.resample import resample
+from spikepy.common.valid_types import ValidInteger, ValidOption
+from spikepy.utils.resample import resample, resampled_rate, \
+        ResampleStream, RESAMPLE_METHODS
 
 class ResampleAEF(AuxiliaryMethod):
     name = 'Resample after Extraction Filter'
@@ -25,13 +26,30 @@ class ResampleAEF(AuxiliaryMethod):
     requires = ['ef_traces', 'ef_sampling_freq']
     provides = ['ef_traces', 'ef_sampling_freq']
     is_stochastic = False
+    execution_backend = 'thread'
 
     new_sampling_frequency = ValidInteger(10, 100000, default=30000)
+    method = ValidOption(*RESAMPLE_METHODS, default='polyphase')
 
     def run(self, signal, sampling_freq, **kwargs):
-        return [resample(signal, sampling_freq, 
-                kwargs['new_sampling_frequency']), 
-                kwargs['new_sampling_frequency']]
+        method = kwargs.get('method', 'polyphase')
+        new_sampling_freq = kwargs['new_sampling_frequency']
+        # the rate actually reached, if the ratio had to be approximated.
+        return [resample(signal, sampling_freq, new_sampling_freq, 
+                method=method), 
+                resampled_rate(sampling_freq, new_sampling_freq, method)]
+
+    def make_stream(self, sampling_freq, num_channels, **kwargs):
+        '''
+            Return a ResampleStream that resamples a recording block by
+        block (see FilteringMethod.make_stream), only for the polyphase
+        method.
+        '''
+        method = kwargs.get('method', 'polyphase')
+        if method != 'polyphase':
+            raise ValueError('Resampling method "%s" cannot be streamed, use "polyphase".' % method)
+        return ResampleStream(num_channels, sampling_freq,
+                kwargs['new_sampling_frequency'])
 
 class ResampleADF(ResampleAEF):
     name = 'Resample after Detection Filter'
@@ -27,6 +27,9 @@ class VoltageThreshold(DetectionMethod):
 
     requires = ['df_traces', 'df_sampling_freq']
     provides = ['event_times']
+    is_channel_parallel = True
+    sharded_requires = ['df_traces']
+    sharded_provides = ['event_times']
 
     # method settings (become kwargs for run)
     threshold_1 = ValidFloat(default=-6.0)
@@ -16,6 +16,7 @@
 
 import numpy
 
+from spikepy.utils.ragged_array import RaggedArray
 from .two_threshold_spike_find import two_threshold_spike_find
 
 def threshold_detection(signal, sampling_freq, threshold_1=None, 
@@ -46,10 +47,8 @@ def threshold_detection(signal, sampling_freq, threshold_1=None,
                     threshold_2=t2,
                     refractory_period=refractory_period,
                     max_spike_width=max_spike_width)
-            if len(spikes) > 0:
-                results.append(spikes/float(sampling_freq))
-            else:
-                results.append([])
+            results.append(numpy.asarray(spikes)/float(sampling_freq))
+        results = RaggedArray.from_lists(results)
     else:
         # determine thresholds
         if threshold_units.lower() == 'standard deviation':
@@ -21,6 +21,8 @@ from spikepy.developer.methods import ExtractionMethod
 from spikepy.common.valid_types import ValidFloat, ValidOption, ValidBoolean,\
         ValidInteger
 from spikepy.utils.generate_spike_windows import generate_spike_windows
+from spikepy.utils.precision import result_dtype
+from spikepy.common import pooled_arena
 
 class ExtractionSpikeWaveletCoefficients(ExtractionMethod):
     name = "Spike Wavelet Coefficients"
@@ -59,32 +61,22 @@ class ExtractionSpikeWaveletCoefficients(ExtractionMethod):
             feature_times_list.append(feature_times)
 
         # unify features before getting wavelet_coefficients
-        total_len = 0
-        for features in features_list:
-            total_len += len(features)
-
-        unified_features = numpy.empty((total_len, )+features_list[0].shape[1:])
-        begin = 0
-        end = 0
-        unpacking_index = {}
-        for i, features in enumerate(features_list):
-            end = begin + len(features)
-            unified_features[begin:end] = features
-            unpacking_index[i] = [begin, end]
-            begin = end
+        lengths = [len(features) for features in features_list]
+        unified_features, _ = pooled_arena.pack(features_list)
+        del features_list
 
         wavelet_coefficients = get_wavelet_coefficients(unified_features, 
                 wavelet, num_coefficients_kept)
+        del unified_features
         if normalize:
             means = numpy.average(wavelet_coefficients, axis=0)
             stds = numpy.std(wavelet_coefficients, axis=0)
-            wavelet_coefficients = (wavelet_coefficients-means)/stds
+            wavelet_coefficients -= means
+            wavelet_coefficients /= stds
 
-        # deunify wavelet_coefficients before returning them
-        wavelet_coefficients_list = []
-        for i in range(len(features_list)):
-            begin, end = unpacking_index[i]
-            wavelet_coefficients_list.append(wavelet_coefficients[begin:end])
+        # each trial's coefficients are a view of the unified ones.
+        wavelet_coefficients_list = pooled_arena.split(wavelet_coefficients,
+                lengths)
 
         return [wavelet_coefficients_list, feature_times_list]
 
@@ -117,7 +109,7 @@ def get_wavelet_coefficients(observations, wavelet='db20', num_coefficients=10):
     # calculate wavelet coefficients
     coeffs = numpy.hstack(pywt.wavedec(observations[0], wavelet))
     obs_wavelet_coeffs = numpy.empty((len(observations), len(coeffs)), 
-            dtype=numpy.float64)
+            dtype=result_dtype(observations))
     obs_wavelet_coeffs[0] = coeffs
 
     for i, obs in enumerate(observations[1:]):
@@ -23,6 +23,7 @@ class FilteringCopyDetection(FilteringMethod):
     name = 'Copy Detection Filtering'
     description = 'Copy the results of the detection filtering stage.'
     is_stochastic = False
+    execution_backend = 'inline'
     requires = ['df_traces', 'df_sampling_freq'] # different from defaults.
     provides = ['ef_traces', 'ef_sampling_freq']
 
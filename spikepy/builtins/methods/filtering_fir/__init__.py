@@ -16,7 +16,8 @@
 
 from spikepy.developer.methods import FilteringMethod
 from spikepy.common.valid_types import ValidOption, ValidInteger
-from .simple_fir import fir_filter
+from spikepy.utils.streaming_filters import FIRStream
+from .simple_fir import fir_filter, fir_kernel, impulse_response_length
 
 class FilteringFIR(FilteringMethod):
     '''
@@ -25,6 +26,11 @@ class FilteringFIR(FilteringMethod):
     name = 'Finite Impulse Response'
     description = 'Sinc type filters with a windowing function.'
     is_stochastic = False
+    is_channel_parallel = True
+    sharded_requires = ['pf_traces']
+    sharded_provides = ['<stage_name>_traces']
+    is_time_chunkable = True
+    execution_backend = 'thread'
 
     # method parameters
     kernel_window = ValidOption('boxcar', 'triang', 'blackman', 'hamming', 
@@ -37,7 +43,7 @@ class FilteringFIR(FilteringMethod):
     order = ValidInteger(min=31, default=100,
             description="The impulse response of an Nth-order FIR filter (i.e. with a Kronecker delta impulse input) lasts for N+1 samples, and then dies to zero." )
 
-    def run(self, signal, sampling_freq, **kwargs):
+    def _filter_kwargs(self, kwargs):
         kind = kwargs['kind'] = kwargs['kind'].lower()
         if 'low' in kind:
             critical_freq = kwargs['low_cutoff_frequency']
@@ -50,6 +56,18 @@ class FilteringFIR(FilteringMethod):
         del kwargs['high_cutoff_frequency']
         kwargs['critical_freq'] = critical_freq
         kwargs['kernel_window'] = str(kwargs['kernel_window'])
+        return kwargs
+
+    def run(self, signal, sampling_freq, **kwargs):
+        kwargs = self._filter_kwargs(kwargs)
         filtered_signal = fir_filter(signal, sampling_freq, **kwargs)
         return [filtered_signal, sampling_freq]
 
+    def make_stream(self, sampling_freq, num_channels, **kwargs):
+        kwargs = self._filter_kwargs(dict(kwargs))
+        kernel = fir_kernel(sampling_freq, **kwargs)
+        return FIRStream(kernel, num_channels)
+
+    def chunk_overlap(self, signal, sampling_freq, **kwargs):
+        return impulse_response_length(kwargs['order'])
+
@@ -17,11 +17,25 @@
 import numpy
 import scipy.signal as scisig
 
+from spikepy.utils.precision import result_dtype
+from spikepy.utils.fir_convolve import convolve_same
+from spikepy.utils.filter_design_cache import memoized
+
 def spectral_inversion(kernel):
     kernel = -kernel
     kernel[len(kernel)/2] += 1.0
     return kernel
 
+def impulse_response_length(order):
+    """
+    Return the number of taps (always odd) in a kernel of the given order.
+    """
+    taps = order+1
+    if not taps % 2: # ensure taps is odd
+        taps += 1
+    return taps
+
+@memoized
 def make_fir_filter(sampling_freq, critical_freq, kernel_window, order, kind, 
                     **kwargs):
     """
@@ -44,9 +58,7 @@ def make_fir_filter(sampling_freq, critical_freq, kernel_window, order, kind,
     critical_freq = numpy.array(critical_freq, dtype=numpy.float64)
     normalized_critical_freq = critical_freq / nyquist_freq
 
-    taps = order+1
-    if not taps % 2: # ensure taps is odd
-        taps += 1
+    taps = impulse_response_length(order)
 
     if kind.lower() in ['low', 'low pass', 'low_pass']:
         kernel = scisig.firwin(taps, normalized_critical_freq, 
@@ -70,6 +82,22 @@ def make_fir_filter(sampling_freq, critical_freq, kernel_window, order, kind,
 
     return kernel
 
+def fir_kernel(sampling_freq, critical_freq, kernel_window, order, kind,
+               **kwargs):
+    """
+    Return the kernel fir_filter applies, like make_fir_filter but <kind>
+    may also be 'stop' (band stop).
+    """
+    if kind.lower()[-4:] == 'stop':
+        # the sum of a low and a high pass, as one kernel.
+        low = numpy.min(critical_freq)
+        high = numpy.max(critical_freq)
+        return make_fir_filter(sampling_freq, low, kernel_window, order,
+                'low', **kwargs) + make_fir_filter(sampling_freq, high, 
+                kernel_window, order, 'high', **kwargs)
+    return make_fir_filter(sampling_freq, critical_freq, kernel_window,
+            order, kind, **kwargs)
+
 def fir_filter(signal, sampling_freq, critical_freq, kernel_window='hamming',
                order=101, kind='high', **kwargs):
     """
@@ -92,32 +120,8 @@ def fir_filter(signal, sampling_freq, critical_freq, kernel_window='hamming',
     Returns:
         filtered_signal     : an n element sequence
     """
-    if kind.lower()[-4:] == 'stop':
-        low = numpy.min(critical_freq)
-        high = numpy.max(critical_freq)
-        result = fir_filter(signal, sampling_freq, low, 
-                kernel_window=kernel_window, order=order, kind='low', **kwargs)
-        result += fir_filter(signal, sampling_freq, high, 
-                kernel_window=kernel_window, order=order, kind='high', **kwargs)
-        return result
-
-    kernel = make_fir_filter(sampling_freq, critical_freq, kernel_window, order,
+    kernel = fir_kernel(sampling_freq, critical_freq, kernel_window, order,
             kind, **kwargs)
-
-    taps = order+1
-
-    if not taps % 2: # ensure taps is odd
-        taps += 1
-
-    if signal.ndim == 2:
-        result = numpy.empty(signal.shape, dtype=signal.dtype)
-        for i in range(len(signal)):
-            zero_padded_signal = numpy.hstack([signal[i], 
-                    numpy.zeros(taps, dtype=signal.dtype)])
-            result[i] = numpy.roll(scisig.lfilter(kernel, [1], zero_padded_signal), 
-                    -taps/2+1)[:len(signal[i])]
-    else:
-        zero_padded_signal = numpy.hstack([signal, 
-                numpy.zeros(taps, dtype=signal.dtype)])
-        result = numpy.roll(scisig.lfilter(kernel, [1], signal), -taps/2+1)[:len(signal)]
-    return result
+    signal = numpy.asarray(signal)
+    result = numpy.empty(signal.shape, dtype=result_dtype(signal))
+    return convolve_same(signal, kernel, out=result)
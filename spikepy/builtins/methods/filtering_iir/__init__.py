@@ -17,7 +17,10 @@
 from spikepy.developer.methods import FilteringMethod
 from spikepy.common.valid_types import ValidOption, \
         ValidInteger, ValidBoolean
-from .simple_iir import butterworth, bessel
+from spikepy.utils.streaming_filters import CausalIIRStream, \
+        ZeroPhaseIIRStream
+from .simple_iir import butterworth, bessel, design_functions, \
+        make_iir_filter, impulse_response_length
 
 class FilteringIIR(FilteringMethod):
     '''
@@ -26,6 +29,11 @@ class FilteringIIR(FilteringMethod):
     name = 'Infinite Impulse Response'
     description = 'Butterworth and bessel filters.  Can be high/low/band pass types.'
     is_stochastic = False
+    is_channel_parallel = True
+    sharded_requires = ['pf_traces']
+    sharded_provides = ['<stage_name>_traces']
+    is_time_chunkable = True
+    execution_backend = 'thread'
 
     function_name = ValidOption('butterworth', 'bessel', default='butterworth')
     acausal = ValidBoolean(default=True)
@@ -33,19 +41,13 @@ class FilteringIIR(FilteringMethod):
     high_cutoff_frequency = ValidInteger(min=10, default=3000)
     kind = ValidOption('low pass', 'high pass', 'band pass', 
             'band stop', default='band pass')
-    order = ValidInteger(2, 8, default=3)
-
-    def run(self, signal, sampling_freq, **kwargs):
-        if kwargs['function_name'].lower() == 'butterworth':
-            filter_function = butterworth
-        elif kwargs['function_name'].lower() == 'bessel':
-            filter_function = bessel
-        del kwargs['function_name']
+    order = ValidInteger(2, 20, default=3)
 
+    def _filter_kwargs(self, kwargs):
         kind = kwargs['kind'] = kwargs['kind'].replace(' ', '')
-        if kind == 'low':
+        if kind in ['low', 'lowpass']:
             critical_freq = kwargs['low_cutoff_frequency']
-        elif kind == 'high':
+        elif kind in ['high', 'highpass']:
             critical_freq = kwargs['high_cutoff_frequency']
         else:
             critical_freq = (kwargs['low_cutoff_frequency'],
@@ -53,7 +55,32 @@ class FilteringIIR(FilteringMethod):
         del kwargs['low_cutoff_frequency']
         del kwargs['high_cutoff_frequency']
         kwargs['critical_freq'] = critical_freq
+        return kwargs
+
+    def run(self, signal, sampling_freq, **kwargs):
+        if kwargs['function_name'].lower() == 'butterworth':
+            filter_function = butterworth
+        elif kwargs['function_name'].lower() == 'bessel':
+            filter_function = bessel
+        del kwargs['function_name']
+        kwargs = self._filter_kwargs(kwargs)
 
         filtered_signal = filter_function(signal, sampling_freq, **kwargs)
         return [filtered_signal, sampling_freq]
+
+    def make_stream(self, sampling_freq, num_channels, **kwargs):
+        design_function = design_functions[kwargs['function_name'].lower()]
+        kwargs = self._filter_kwargs(dict(kwargs))
+        sos = make_iir_filter(sampling_freq, kwargs['critical_freq'], 
+                design_function, kwargs['order'], kwargs['kind'])
+        if kwargs['acausal']:
+            return ZeroPhaseIIRStream(sos, num_channels)
+        return CausalIIRStream(sos, num_channels)
+
+    def chunk_overlap(self, signal, sampling_freq, **kwargs):
+        design_function = design_functions[kwargs['function_name'].lower()]
+        kwargs = self._filter_kwargs(dict(kwargs))
+        sos = make_iir_filter(sampling_freq, kwargs['critical_freq'], 
+                design_function, kwargs['order'], kwargs['kind'])
+        return impulse_response_length(sos)
     
@@ -17,9 +17,48 @@
 import numpy
 import scipy.signal as scisig
 
-from .filtfilt import filtfilt
+from spikepy.utils.precision import result_dtype
+from spikepy.utils import sos_filter
+from spikepy.utils.filter_design_cache import memoized
 
 
+design_functions = {'butterworth':scisig.butter, 'bessel':scisig.bessel}
+
+@memoized
+def make_iir_filter(sampling_freq, critical_freq, filter_func, order, kind,
+                    **kwargs):
+    """
+    Design an infinite impulse response filter.
+    Inputs:
+        sampling_freq   : rate at which data were collected (Hz)
+        critical_freq   : frequency for low-pass/high-pass cutoff (Hz)
+                          -- for band-pass this is a 2-element sequence
+        filter_func     : scipy.signal.bessel or scipy.signal.butter
+        order           : the order of the filter (an integer)
+        kind            : the kind of pass filtering to perform 
+    Returns:
+        sos             : the filter in second-order sections, shaped 
+                          (num_sections, 6)
+    """
+    nyquist_freq = sampling_freq/2
+    critical_freq = numpy.array(critical_freq, dtype=numpy.float64)
+    normalized_critical_freq = critical_freq / nyquist_freq
+
+    return filter_func(order, normalized_critical_freq, 
+                       btype=kind, output='sos', **kwargs)
+
+def impulse_response_length(sos, tolerance=1e-12):
+    """
+    Return the number of samples it takes the response of the filter <sos>
+    to an impulse (or to a mismatched starting state) to decay below 
+    <tolerance>, plus the edge that filtfilt pads the signal with.  Returns
+    None if the filter is not stable.
+    """
+    decay_length = sos_filter.decay_length(sos, tolerance)
+    if decay_length is None:
+        return None
+    return decay_length + sos_filter.default_padlen(sos)
+
 def iir_filter(signal, sampling_freq, critical_freq, filter_func,
                 order, kind, acausal=False, **kwargs):
     """
@@ -27,7 +66,8 @@ def iir_filter(signal, sampling_freq, critical_freq, filter_func,
     Returns the filtered signal.
 
     Inputs:
-        signal              : an n element sequence
+        signal          : an n element sequence, or a 2D array with one
+                          row per channel (all are filtered at once)
         sampling_freq   : rate at which data were collected (Hz)
         critical_freq   : frequency for low-pass/high-pass cutoff (Hz)
                           -- for band-pass this is a 2-element sequence
@@ -37,20 +77,18 @@ def iir_filter(signal, sampling_freq, critical_freq, filter_func,
         order           : the order of the filter (an integer)
         kind            : the kind of pass filtering to perform 
                           -- ('high', 'low', 'band')
-        **kwargs        : keyword arguments passed on to scipy.signal functions.
+        acausal         : filter forwards and backwards (zero phase)
+        **kwargs        : keyword arguments passed on to filter_func.
     Returns:
         filtered_signal     : an n element sequence
     """
-    nyquist_freq = sampling_freq/2
-    critical_freq = numpy.array(critical_freq, dtype=numpy.float64)
-    normalized_critical_freq = critical_freq / nyquist_freq
-
-    b, a = filter_func(order, normalized_critical_freq, 
-                       btype=kind, output='ba', **kwargs)
+    sos = make_iir_filter(sampling_freq, critical_freq, filter_func, order,
+            kind, **kwargs)
+    # the filter runs in float64, the result has the signal's precision.
     if acausal:
-        return filtfilt(b, a, signal)
+        return sos_filter.filtfilt(sos, signal, dtype=result_dtype(signal))
     else:
-        return scisig.lfilter(b, a, signal, **kwargs)
+        return sos_filter.lfilter(sos, signal, dtype=result_dtype(signal))
 
 
 def butterworth(signal, sampling_freq, critical_freq,
@@ -58,31 +96,17 @@ def butterworth(signal, sampling_freq, critical_freq,
     """
     This calls iir_filter with filter_func = scipy.signal.butter.
     """
-    if signal.ndim == 2:
-        result = numpy.empty(signal.shape, dtype=signal.dtype)
-        for i in range(len(signal)):
-            result[i] = iir_filter(signal[i], sampling_freq, critical_freq,
-                    scisig.butter, order, kind, **kwargs)
-    else:
-        result = iir_filter(signal, sampling_freq, critical_freq,
-                      scisig.butter, order, kind, **kwargs)
-    return result
+    return iir_filter(signal, sampling_freq, critical_freq, scisig.butter, 
+            order, kind, acausal=acausal, **kwargs)
 
 butterworth.__doc__ += '\n--iir_filter docstring--\n%s' % iir_filter.__doc__
 
 def bessel(signal, sampling_freq, critical_freq,
                 order=4, kind='high', acausal=False, **kwargs):
     """
-    This calls iir_filter with filter_func = scipy.signal.butter.
+    This calls iir_filter with filter_func = scipy.signal.bessel.
     """
-    if signal.ndim == 2:
-        result = numpy.empty(signal.shape, dtype=signal.dtype)
-        for i in range(len(signal)):
-            result[i] = iir_filter(signal[i], sampling_freq, critical_freq,
-                    scisig.bessel, order, kind, **kwargs)
-    else:
-        result = iir_filter(signal, sampling_freq, critical_freq,
-                      scisig.bessel, order, kind, **kwargs)
-    return result
+    return iir_filter(signal, sampling_freq, critical_freq, scisig.bessel, 
+            order, kind, acausal=acausal, **kwargs)
 
 bessel.__doc__ += '\n--iir_filter docstring--\n%s' % iir_filter.__doc__
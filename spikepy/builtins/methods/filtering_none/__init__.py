@@ -21,6 +21,7 @@ class NoFiltering(FilteringMethod):
     name = "No Filtering"
     description = "No Filtering, simply use the raw traces."
     is_stochastic = False
+    execution_backend = 'inline'
 
     def run(self, signal, sampling_freq, **kwargs):
         return [signal, sampling_freq]
@@ -17,6 +17,7 @@ import pywt
 
 from spikepy.developer.methods import FilteringMethod
 from spikepy.common.valid_types import ValidOption, ValidInteger
+from spikepy.utils.precision import like
 from .wavelet import filt
 
 class FilteringWavelets(FilteringMethod):
@@ -26,6 +27,9 @@ class FilteringWavelets(FilteringMethod):
     name = 'Wavelets Filter'
     description = 'Filter based on wavelet decomposition.'
     is_stochastic = False
+    is_time_chunkable = True
+    sharded_requires = ['pf_traces']
+    sharded_provides = ['<stage_name>_traces']
 
     # method parameters
     wavelet = ValidOption(*pywt.wavelist(), default='db20')
@@ -36,8 +40,20 @@ class FilteringWavelets(FilteringMethod):
 
     def run(self, signal, sampling_freq, wavelet='db20', 
             min_level=1, max_level=6):
-        filtered_signal = filt(signal,
+        filtered_signal = like(filt(signal,
                 wavelet=wavelet,
                 minlevel=min_level, 
-                maxlevel=max_level)
+                maxlevel=max_level), signal)
         return [filtered_signal, sampling_freq]
+
+    def chunk_overlap(self, signal, sampling_freq, wavelet='db20', 
+            min_level=1, max_level=6):
+        # the support of the coarsest wavelet, for decomposition and 
+        # reconstruction.
+        filter_length = pywt.Wavelet(wavelet).dec_len
+        return 2*filter_length*2**max_level
+
+    def chunk_alignment(self, signal, sampling_freq, wavelet='db20', 
+            min_level=1, max_level=6):
+        # blocks must start on the same decimation grid as the recording.
+        return 2**max_level
@@ -107,16 +107,16 @@ class EventRasterVisualization(Visualization):
             for i, event_sequence in enumerate(event_times):
                 if len(event_sequence) > 0:
                     color = colors[invert_colors][i%len(colors[invert_colors])]
-                    e_xs = event_sequence
+                    e_xs = numpy.asarray(event_sequence)
                     if raster_position == 'center':
-                        e_ys = [offsets[i] for e in e_xs]
+                        e_ys = numpy.empty(len(e_xs))
+                        e_ys.fill(offsets[i])
                     else:
                         # 0.1 corrects for roundoff error
-                        event_indexes = [int(f_sf*e+0.1) for e in e_xs] 
-                        e_ys = [f_traces[i][ei]+offsets[i] 
-                                for ei in event_indexes]
+                        event_indexes = (f_sf*e_xs+0.1).astype(int)
+                        e_ys = f_traces[i][event_indexes]+offsets[i]
 
-                    axes.plot(numpy.array(e_xs), numpy.array(e_ys), 
+                    axes.plot(e_xs, e_ys, 
                             linewidth=0, marker='|', 
                             markersize=raster_size, color=color,
                             markeredgewidth=2)
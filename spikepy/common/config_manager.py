@@ -118,6 +118,21 @@ class ConfigManager(object):
         num_process_workers = min(num_process_workers, processes_limit)
         return num_process_workers
 
+    def get_execution_backend(self, plugin):
+        '''
+            Return how tasks that run <plugin> should be executed, one of
+        'process', 'thread' or 'inline'.  Unless the configuration variable
+        ['backend']['execution_backend'] is 'plugin' it overrides the 
+        plugin's own execution_backend, except that plugins written for
+        worker processes (which may modify their arguments) always run in
+        worker processes.
+        '''
+        plugin_backend = getattr(plugin, 'execution_backend', 'process')
+        backend = self['backend']['execution_backend']
+        if backend == 'plugin' or plugin_backend == 'process':
+            return plugin_backend
+        return backend
+
     def get_size(self, name):
         if name == 'main_frame':
             height = self['gui']['main_frame']['height']
@@ -35,6 +35,12 @@ class NoCurrentStrategyError(SpikepyError):
 class NoTasksError(SpikepyError):
     pass
 
+class WorkerPoolError(SpikepyError):
+    pass
+
+class SweepError(SpikepyError):
+    pass
+
 class ImpossibleTaskError(SpikepyError):
     pass
 
@@ -191,6 +191,9 @@ class PluginManager(object):
             new_items = [item.replace('<stage_name>', provides_prefix)
                     for item in typed_filter.provides]
             typed_filter.provides = new_items
+            typed_filter.sharded_provides = [
+                    item.replace('<stage_name>', provides_prefix)
+                    for item in typed_filter.sharded_provides]
             is_correct_type = False
             for pname in typed_filter.provides:
                 if provides_prefix in pname:
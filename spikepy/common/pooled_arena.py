@@ -0,0 +1,139 @@
+#  Copyright (C) 2012  David Morton
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+    Arenas hold the data of many trials in one contiguous array, with each
+trial's resource a view of its block of rows.  A pooling plugin can then be
+handed the whole arena (or the block covering the trials it pools) without
+anything being copied.
+'''
+import os
+import weakref
+
+import numpy
+
+from spikepy.common import shared_arrays, trace_storage
+
+# the files of stored arenas, keyed on the id of a weak reference to the 
+# arena.  Each file is removed once its arena (and every view of it) is gone.
+_stored_arenas = {}
+
+def _remove_file(reference):
+    filename = _stored_arenas.pop(id(reference), (None, None))[1]
+    if filename is not None:
+        try:
+            os.remove(filename)
+        except OSError:
+            pass # removed at exit instead.
+
+def allocate(shape, dtype=numpy.float64):
+    '''
+        Return a new, uninitialized arena, kept in trace storage if it is
+    large enough (see trace_storage.empty).
+    '''
+    arena = trace_storage.empty(shape, dtype=dtype)
+    if trace_storage.is_stored(arena):
+        reference = weakref.ref(arena, _remove_file)
+        _stored_arenas[id(reference)] = (reference, arena.filename)
+    return arena
+
+def split(arena, lengths):
+    '''Return views of consecutive blocks of <lengths> rows of <arena>.'''
+    views = []
+    begin = 0
+    for length in lengths:
+        views.append(arena[begin:begin+length])
+        begin += length
+    return views
+
+def pack(arrays):
+    '''
+        Copy <arrays> (which must agree in all but their first dimension)
+    into a new arena.
+    Returns:
+        arena: the new arena.
+        views: a view of the arena equal to each of <arrays>.
+    '''
+    arrays = [numpy.asarray(array) for array in arrays]
+    lengths = [len(array) for array in arrays]
+    dtype = numpy.result_type(*arrays)
+    arena = allocate((sum(lengths),) + arrays[0].shape[1:], dtype=dtype)
+    views = split(arena, lengths)
+    for view, array in zip(views, arrays):
+        view[...] = array
+    return arena, views
+
+def _owner(array):
+    while isinstance(array.base, numpy.ndarray):
+        array = array.base
+    return array
+
+def pooled_view(arrays):
+    '''
+        If <arrays> are consecutive blocks of rows of one array (such as
+    the views returned by pack) return a single array of those rows
+    without copying anything, otherwise return None.
+    '''
+    if not arrays or not all(isinstance(array, numpy.ndarray) and 
+            array.ndim > 0 for array in arrays):
+        return None
+    first = arrays[0]
+    row_nbytes = first.itemsize*int(numpy.prod(first.shape[1:]))
+    if row_nbytes == 0:
+        return None
+    blocks = [array for array in arrays if len(array)]
+    if not blocks:
+        return None
+    owner = _owner(blocks[0])
+    address = shared_arrays._address(blocks[0])
+    for array in arrays:
+        if (array.dtype != first.dtype or array.shape[1:] != first.shape[1:]
+                or not array.flags.c_contiguous):
+            return None
+    for array in blocks:
+        if (_owner(array) is not owner or 
+                shared_arrays._address(array) != address):
+            return None
+        address += array.nbytes
+
+    num_rows = sum([len(array) for array in blocks])
+    if (owner.dtype == first.dtype and owner.shape[1:] == first.shape[1:]
+            and owner.flags.c_contiguous):
+        offset = shared_arrays._address(blocks[0]) - \
+                shared_arrays._address(owner)
+        begin = offset//row_nbytes
+        if begin == 0 and num_rows == len(owner):
+            return owner
+        return owner[begin:begin+num_rows]
+    return numpy.lib.stride_tricks.as_strided(blocks[0], 
+            shape=(num_rows,) + first.shape[1:])
+
+def gather(arrays):
+    '''
+        Return <arrays> as views of one arena, copying them into a new
+    arena unless they already are.  Anything that cannot be pooled (not a
+    list of arrays that agree in all but their first dimension) is
+    returned as is.
+    '''
+    if not isinstance(arrays, (list, tuple)) or not arrays:
+        return arrays
+    for array in arrays:
+        if (not isinstance(array, numpy.ndarray) or array.ndim == 0 or 
+                array.dtype == object or
+                array.shape[1:] != arrays[0].shape[1:]):
+            return arrays
+    if pooled_view(arrays) is not None:
+        return arrays
+    return pack(arrays)[1]
@@ -14,11 +14,10 @@
 #  along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import uuid
-import random
 import multiprocessing
 import traceback
 import time
-from collections import defaultdict
+from collections import defaultdict, deque
 
 import numpy
 
@@ -32,6 +31,10 @@ from spikepy.common.config_manager import config_manager
 from spikepy.common.plugin_manager import plugin_manager
 from spikepy.common.task_manager import TaskManager, Task, RootTask,\
         StageRootTask
+from spikepy.common.worker_pool import WorkerPool
+from spikepy.common.runtime_history import RuntimeHistory
+from spikepy.common.result_cache import ResultCache
+from spikepy.common import shared_arrays, trace_storage
 from spikepy.common.errors import *
 
 def build_tasks(marked_trials, plugin, plugin_category, plugin_kwargs):
@@ -47,53 +50,37 @@ def build_tasks(marked_trials, plugin, plugin_category, plugin_kwargs):
             tasks.append(Task([trial], plugin, plugin_category, plugin_kwargs)) 
     return tasks 
 
-def open_file_worker(input_queue, results_queue):
-    '''Worker process to handle open_file operations.'''
-    for fullpath in iter(input_queue.get, None):
-        file_interpreters = plugin_manager.file_interpreters
-        try:
-            results = open_data_file(fullpath, file_interpreters)
-        except:
-            results = []
-            traceback.print_exc()
-        results_queue.put(results)
-
-def task_worker(input_queue, results_queue):
-    '''Worker process to handle task operations.'''
-    for task_info in iter(input_queue.get, None):
-        args = task_info['args']
-        kwargs = task_info['kwargs']
-        stage_name = task_info['plugin_info']['stage']
-        plugin_name = task_info['plugin_info']['name']
-        plugin = plugin_manager.find_plugin(stage_name, plugin_name)
-
-        results_dict = {}
-        begin_time = time.time()
-        try:
-            results_dict['result'] = plugin.run(*args, **kwargs)
-        except:
-            results_dict['result'] = None
-            results_dict['traceback'] = traceback.format_exc()
-            traceback.print_exc()
-        end_time = time.time()
-        results_dict['task_id'] = task_info['task_id']
-        results_dict['runtime'] = end_time - begin_time
-
-        results_queue.put(results_dict)
-    
 class ProcessManager(object):
     '''
         ProcessManager handles all the multi-processing and task
     creation and management.
     '''
-    def __init__(self, trial_manager):
+    def __init__(self, trial_manager, worker_pool=None, runtime_history=None,
+            result_cache=None):
         self.trial_manager  = trial_manager
         self.task_manager = None
-
-    def build_tasks_from_strategy(self, strategy, stage_name=None):
-        '''Create a task for each stage of the strategy.'''
+        self.skipped_tasks = []
+        if worker_pool is None:
+            worker_pool = WorkerPool()
+        self.worker_pool = worker_pool
+        if runtime_history is None:
+            runtime_history = RuntimeHistory()
+        self.runtime_history = runtime_history
+        if result_cache is None:
+            result_cache = ResultCache(None, 0) # disabled
+        self.result_cache = result_cache
+
+    def build_tasks_from_strategy(self, strategy, stage_name=None, 
+            trials=None):
+        '''
+            Create a task for each stage of the strategy, run on <trials>
+        (default is the marked trials).
+        '''
         tasks = []
-        marked_trials = self.trial_manager.marked_trials
+        if trials is None:
+            marked_trials = self.trial_manager.marked_trials
+        else:
+            marked_trials = trials
 
         if stage_name == 'auxiliary':
             for plugin_name, plugin_kwargs in strategy.auxiliary_stages.items():
@@ -135,109 +122,317 @@ class ProcessManager(object):
                         'auxiliary', plugin_kwargs))
         return tasks 
 
-    def prepare_to_run_strategy(self, strategy, stage_name=None):
+    def prepare_to_run_strategy(self, strategy, stage_name=None, 
+            incremental=False):
         '''
             Validate strategy, build tasks for it and put the task_manager.
+        If <incremental>, tasks whose results are up to date (see 
+        Task.is_stale) and that don't depend on stale tasks are skipped.
         '''
         plugin_manager.validate_strategy(strategy)
         tasks = self.build_tasks_from_strategy(strategy, stage_name=stage_name)
-        self.task_manager = TaskManager()
-        for task in tasks:
-            self.task_manager.add_task(task)
         if stage_name is None:
             root_task = RootTask(self.trial_manager.marked_trials)
         else:
             plugins = [task.plugin for task in tasks]
             root_task = StageRootTask(self.trial_manager.marked_trials, plugins)
-        self.obsoleted_tasks = self.task_manager.add_root_task(root_task)
+        self._setup_task_manager(tasks, root_task)
+        if incremental:
+            self.skipped_tasks = self.task_manager.skip_up_to_date_tasks()
+        else:
+            self.skipped_tasks = []
         return self.obsoleted_tasks
 
+    def prepare_to_run_sweep(self, sweep):
+        '''
+            Validate and build tasks for every variant of <sweep> (a
+        ParameterSweep) and put one task_manager that runs them all, with
+        tasks shared between variants run only once.
+        '''
+        for variant in sweep.variants:
+            plugin_manager.validate_strategy(variant.strategy)
+            variant.tasks = self.build_tasks_from_strategy(variant.strategy,
+                    trials=variant.trials)
+        tasks = sweep.merge_tasks()
+        self._setup_task_manager(tasks, RootTask(sweep.original_trials))
+        self.skipped_tasks = []
+        return self.obsoleted_tasks
+
+    def _setup_task_manager(self, tasks, root_task):
+        self.task_manager = TaskManager()
+        for task in tasks:
+            cost = self.runtime_history.estimate(task.plugin_category,
+                    task.plugin.name, task.data_size)
+            self.task_manager.add_task(task, cost=cost)
+        self.obsoleted_tasks = self.task_manager.add_root_task(root_task)
+
     def run_tasks(self, message_queue=multiprocessing.Queue()):
         '''
             Run all the tasks in self.task_manager
-        (see self.prepare_to_run_strategy()).
+        (see self.prepare_to_run_strategy()) on the worker pool.
         '''
-        num_process_workers = config_manager.get_num_workers()
         num_tasks = self.task_manager.num_tasks
         if num_tasks == 0:
-            raise NoTasksError('There are no tasks to run')
-        if num_tasks < num_process_workers:
-            num_process_workers = num_tasks
-
-        input_queue = multiprocessing.Queue()
-        results_queue = multiprocessing.Queue()
-
-        # start the jobs
-        jobs = []
-        results_list = []
-        for i in xrange(num_process_workers):
-            job = multiprocessing.Process(target=task_worker, 
-                                          args=(input_queue, 
-                                                results_queue))
-            job.start()
-            jobs.append(job)
+            if not self.skipped_tasks:
+                raise NoTasksError('There are no tasks to run')
+            # an incremental run with everything up to date still starts 
+            #   and finishes, so listeners aren't left waiting.
+            message_queue.put(('TASKS', []))
+            message_queue.put(('FINISHED_RUN', None))
+            return {}, {}
+
+        with self.worker_pool.lock:
+            return self._run_tasks(message_queue)
+
+    def _run_tasks(self, message_queue):
+        worker_pool = self.worker_pool
+        worker_pool.start()
+        worker_pool.check_health()
 
         task_index = {}
         for task in self.task_manager.tasks:
             task_index[task.task_id] = task
         message_queue.put(('TASKS', [str(t) for t in task_index.values()]))
+        # the graph is laid out once, after that only changes are sent.
+        message_queue.put(('GRAPH_LAYOUT', 
+                (self.task_manager.get_plot_layout(), 0.0)))
             
+        # arrays at least this large (in bytes) are sent as shared segments.
+        shared_threshold = config_manager['backend']['shared_memory_threshold']
+        if trace_storage.is_enabled():
+            # stored traces are always passed to workers by reference.
+            shared_threshold = shared_threshold or trace_storage.get_threshold()
+        shared_segments = {}
+        # results of channel-sharded tasks, collected until all shards are in.
+        shard_results = {}
+        # blocks of time not yet sent, a few are out at a time per task.
+        pending_blocks = {}
+        cache_keys = {}
+
         results_index = {}
         queued_tasks = 0
         base_time = time.time()
         while True:
             # queue up ready tasks
-            ready_tasks = self.task_manager.get_ready_tasks()
-            while ready_tasks:
-                picked_task = random.choice(ready_tasks)
+            picked_task = self.task_manager.get_next_ready_task()
+            while picked_task is not None:
+                num_ready_tasks = self.task_manager.num_ready_tasks
                 task_info = self.task_manager.checkout_task(picked_task)
                 message_queue.put(('RUNNING_TASK', str(picked_task)))
-                message_queue.put(('DISPLAY_GRAPH', 
-                        (self.task_manager.get_plot_dict(), 
-                        time.time()-base_time)))
-                input_queue.put(task_info)
+                self._report_graph_changes(message_queue, base_time)
+                if self.result_cache.enabled:
+                    cache_key = picked_task.cache_key
+                    cached_result = None
+                    if cache_key is not None:
+                        cached_result = self.result_cache.get(cache_key)
+                    if cached_result is not None:
+                        # complete it here, no need to bother the workers.
+                        message_queue.put(('FINISHED_TASK', 
+                                {'task':str(picked_task), 
+                                 'runtime':0.0,
+                                 'cached':True}))
+                        results_index[picked_task.task_id] = cached_result
+                        queued_tasks += 1
+                        self.task_manager.complete_task(picked_task, 
+                                cached_result)
+                        self._report_graph_changes(message_queue, base_time)
+                        picked_task = self.task_manager.get_next_ready_task()
+                        continue
+                    cache_keys[picked_task.task_id] = cache_key
+
+                backend = config_manager.get_execution_backend(
+                        picked_task.plugin)
+                task_info['backend'] = backend
+                # threads and inline jobs use the trials' arrays directly.
+                if shared_threshold > 0 and backend == 'process':
+                    task_info['args'], shared_segments[picked_task.task_id] =\
+                            shared_arrays.pack(task_info['args'], 
+                            shared_threshold)
+                    # results are written straight into trace storage.
+                    task_info['shared_dir'] = (trace_storage.get_storage_dir()
+                            or shared_arrays.get_scratch_dir())
+                    task_info['shared_threshold'] = shared_threshold
+
+                if backend == 'inline':
+                    shard_infos = [task_info]
+                else:
+                    shard_infos = self._split_task(picked_task, task_info,
+                            num_ready_tasks)
+                if len(shard_infos) > 1:
+                    shard_results[picked_task.task_id] = \
+                            [None for shard_info in shard_infos]
+                    if picked_task.chunk_trims is not None:
+                        # the rest go out as blocks come back.
+                        num_sent = worker_pool.num_workers
+                        pending_blocks[picked_task.task_id] = deque(
+                                shard_infos[num_sent:])
+                        shard_infos = shard_infos[:num_sent]
+                    for shard_info in shard_infos:
+                        worker_pool.submit('task', shard_info, backend)
+                else:
+                    worker_pool.submit('task', task_info, backend)
                 queued_tasks += 1
 
-                ready_tasks = self.task_manager.get_ready_tasks()
+                picked_task = self.task_manager.get_next_ready_task()
 
-            # wait for one result
-            if queued_tasks > 0:
-                result = results_queue.get()
-                finished_task_id = result['task_id']
-                finished_task = task_index[finished_task_id]
-                results_index[finished_task_id] = result['result']
-                if result['result'] is None:
-                    message_queue.put(('TASK_ERROR', 
-                            {'task':str(finished_task),
-                             'traceback':result['traceback'],
-                             'runtime':result['runtime']}))
-                    self.task_manager.complete_task(finished_task)
-                    self.task_manager.remove_all_tasks()
-                else:
-                    message_queue.put(('FINISHED_TASK', 
-                            {'task':str(finished_task), 
-                             'runtime':result['runtime']}))
-                    self.task_manager.complete_task(finished_task, 
-                            result['result'])
-                message_queue.put(('DISPLAY_GRAPH', 
-                        (self.task_manager.get_plot_dict(),
-                        time.time()-base_time)))
-
-            # are we done queueing up tasks? then add in the sentinals.
-            if self.task_manager.num_tasks == 0:
-                for i in xrange(num_process_workers):
-                    input_queue.put(None)
-            
-                # are we done getting results? then exit.
-                if len(results_index.keys()) == queued_tasks:
-                    break
+            # are we done getting results? then exit.
+            if len(results_index.keys()) == queued_tasks:
+                break
 
-        for job in jobs:
-            job.join() # halt this thread until processes are all complete.
+            # wait for one result
+            try:
+                result = worker_pool.get_result()
+            except WorkerPoolError:
+                worker_pool.abandon('task')
+                message_queue.put(('TASK_ERROR', 
+                        {'task':'(unknown task)',
+                         'traceback':traceback.format_exc(),
+                         'runtime':time.time()-base_time}))
+                for task_id, task in task_index.items():
+                    if task.locking_keys and task_id not in results_index:
+                        task.skip()
+                self.task_manager.remove_all_tasks()
+                for segments in shared_segments.values():
+                    shared_arrays.release(segments)
+                break
+            finished_task_id = result['task_id']
+            finished_task = task_index[finished_task_id]
+            if result.get('shard') is not None:
+                shards = shard_results[finished_task_id]
+                if finished_task.chunk_trims is not None:
+                    result = self._merge_block(finished_task, result)
+                    blocks = pending_blocks[finished_task_id]
+                    if blocks:
+                        block_info = blocks.popleft()
+                        worker_pool.submit('task', block_info, 
+                                block_info['backend'])
+                shards[result['shard']] = result
+                if None in shards:
+                    continue # wait for the rest of the shards.
+                pending_blocks.pop(finished_task_id, None)
+                result = self._merge_shard_results(finished_task, 
+                        shard_results.pop(finished_task_id))
+            # argument segments are only needed while the task is out.
+            shared_arrays.release(shared_segments.pop(finished_task_id, []))
+            result['result'] = shared_arrays.unpack(result['result'])
+            results_index[finished_task_id] = result['result']
+            if finished_task not in self.task_manager:
+                # run was aborted while this task was out on a worker.
+                shared_arrays.release(result['result'])
+                finished_task.skip()
+            elif result['result'] is None:
+                message_queue.put(('TASK_ERROR', 
+                        {'task':str(finished_task),
+                         'traceback':result['traceback'],
+                         'runtime':result['runtime']}))
+                self.task_manager.complete_task(finished_task)
+                self.task_manager.remove_all_tasks()
+            else:
+                message_queue.put(('FINISHED_TASK', 
+                        {'task':str(finished_task), 
+                         'runtime':result['runtime']}))
+                self.runtime_history.record(finished_task.plugin_category,
+                        finished_task.plugin.name, finished_task.data_size,
+                        result['runtime'])
+                cache_key = cache_keys.pop(finished_task_id, None)
+                if cache_key is not None:
+                    self.result_cache.put(cache_key, result['result'])
+                self.task_manager.complete_task(finished_task, 
+                        result['result'])
+            self._report_graph_changes(message_queue, base_time)
+
+        self.runtime_history.save()
         message_queue.put(('FINISHED_RUN', None))
 
         return task_index, results_index
 
+    def _report_graph_changes(self, message_queue, base_time):
+        changes = self.task_manager.pop_plot_changes()
+        if changes:
+            message_queue.put(('GRAPH_CHANGES', 
+                    (changes, time.time()-base_time)))
+
+    def _split_task(self, task, task_info, num_ready_tasks):
+        '''
+            Return the list of run_infos to send to the workers for <task>.
+        Recordings longer than the backend's time_chunk_size are split into
+        blocks of time, so no worker holds more than one block.  Otherwise
+        channels are split into groups so that workers left idle by a 
+        short ready-list get used.
+        '''
+        chunk_size = config_manager['backend']['time_chunk_size']
+        if (task.is_chunkable and chunk_size > 0 and 
+                task.num_samples(task_info) > chunk_size):
+            return task.chunk(task_info, chunk_size)
+
+        if task.is_shardable and task.num_channels(task_info) is not None:
+            idle_share = self.worker_pool.num_workers // max(1, 
+                    num_ready_tasks)
+            num_shards = min(task.num_channels(task_info), idle_share)
+            if num_shards > 1:
+                return task.shard(task_info, num_shards)
+        return [task_info]
+
+    def _merge_block(self, task, block_result):
+        '''
+            Merge the result of one of <task>'s blocks of time into the
+        task's merged_result as soon as it arrives (see Task.merge_block),
+        so the blocks' results are not all held at once.  Returns the 
+        block's results dictionary with 'result' True, or None if the 
+        block failed.
+        '''
+        value = shared_arrays.unpack(block_result['result'])
+        summary = dict(block_result)
+        summary['result'] = None
+        if value is not None:
+            shared_arrays.release(task.merge_block(block_result['shard'], 
+                    value))
+            summary['result'] = True
+        return summary
+
+    def _merge_shard_results(self, task, shard_results):
+        '''
+            Combine the results dictionaries of a task's shards into the
+        results dictionary the unsharded task would have produced.
+        '''
+        merged = {'task_id':task.task_id,
+                  'runtime':sum([r['runtime'] for r in shard_results])}
+        if task.chunk_trims is not None:
+            # blocks of time were merged as they arrived (see _merge_block).
+            failed = [r for r in shard_results if r['result'] is None]
+            if failed:
+                merged['result'] = None
+                merged['traceback'] = failed[0]['traceback']
+                if task.merged_result is not None:
+                    shared_arrays.release(task.merged_result)
+            else:
+                merged['result'] = task.merged_result
+            task.merged_result = None
+            return merged
+
+        for shard_result in shard_results:
+            shard_result['result'] = shared_arrays.unpack(
+                    shard_result['result'])
+
+        failed = [r for r in shard_results if r['result'] is None]
+        if failed:
+            merged['result'] = None
+            merged['traceback'] = failed[0]['traceback']
+            for shard_result in shard_results:
+                shared_arrays.release(shard_result['result'])
+            return merged
+
+        shard_values = [r['result'] for r in shard_results]
+        merged['result'] = task.merge_shards(shard_values)
+        # everything but what made it into the merged result can go.
+        for i, pname in enumerate(task.plugin.provides):
+            parts = [shard_value[i] for shard_value in shard_values]
+            if pname not in task.plugin.sharded_provides:
+                shared_arrays.release(parts[1:])
+            elif isinstance(merged['result'][i], numpy.ndarray):
+                shared_arrays.release(parts)
+        return merged
+
     def open_file(self, fullpath):
         '''
             Open a single data file. Returns the list of trials created.
@@ -245,10 +440,27 @@ class ProcessManager(object):
         return self.open_files([fullpath])[0]
 
     @supports_callbacks
-    def open_files(self, fullpaths):
+    def open_files(self, fullpaths, file_opened=None):
         '''
             Open a multiple data files. Returns a list of 
-        'list of trials created'.
+        'list of trials created'.  If <file_opened> is passed it is called
+        with (fullpath, results) as soon as each file has been opened.
+        '''
+        results_list = []
+        for fullpath, results in self.iter_open_files(fullpaths):
+            if file_opened is not None:
+                file_opened(fullpath, results)
+            results_list.extend(results)
+        return results_list
+
+    def iter_open_files(self, fullpaths, max_in_flight=None):
+        '''
+            Open multiple data files, yielding (fullpath, results) for each
+        file as soon as it has been opened (in the order they finish).  At
+        most <max_in_flight> files (default from the config) are being 
+        opened or waiting to be collected at any time.  The worker pool is
+        not locked while the caller has a file, so tasks can be run from
+        inside the loop.
         '''
         file_interpreters = plugin_manager.file_interpreters
         if len(fullpaths) == 1:
@@ -257,37 +469,30 @@ class ProcessManager(object):
             except:
                 results = []
                 traceback.print_exc()
-            return results
-
-        num_process_workers = config_manager.get_num_workers()
-        if len(fullpaths) < num_process_workers:
-            num_process_workers = len(fullpaths)
-
-        # setup the input and return queues.
-        input_queue = multiprocessing.Queue()
-        for fullpath in fullpaths:
-            input_queue.put(fullpath)
-        for i in xrange(num_process_workers):
-            input_queue.put(None)
-        results_queue = multiprocessing.Queue()
-
-        # start the jobs
-        jobs = []
-        for i in xrange(num_process_workers):
-            job = multiprocessing.Process(target=open_file_worker, 
-                                          args=(input_queue, 
-                                                results_queue))
-            job.start()
-            jobs.append(job)
-
-        # collect the results, waiting for all the jobs to complete
-        results_list = []
-        for i in xrange(len(fullpaths)):
-            # file_interpreters return list of trial objects.
-            results_list.extend(results_queue.get())
-
-        for job in jobs:
-            job.join() # halt this thread until processes are all complete.
-
-        return results_list
-
+            yield fullpaths[0], results
+            return
+
+        if max_in_flight is None:
+            max_in_flight = config_manager['backend']['max_files_in_flight']
+        worker_pool = self.worker_pool
+        pending = list(reversed(fullpaths))
+        num_in_flight = 0
+        try:
+            while pending or num_in_flight:
+                with worker_pool.lock:
+                    while pending and num_in_flight < max_in_flight:
+                        worker_pool.submit('open_file', pending.pop())
+                        num_in_flight += 1
+                    # file_interpreters return list of trial objects.
+                    fullpath, results = worker_pool.get_result('open_file')
+                    num_in_flight -= 1
+                yield fullpath, results
+        finally:
+            # if stopped early (or on error) drop the files still out.
+            if num_in_flight:
+                with worker_pool.lock:
+                    worker_pool.abandon('open_file')
+
+    def shutdown(self):
+        '''Stop the worker pool's processes.'''
+        self.worker_pool.shutdown()
@@ -0,0 +1,196 @@
+#  Copyright (C) 2012  David Morton
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+    Keeps the data of Resources within a memory budget by spilling the
+least recently used data to compressed files, which are read back when
+the data are next used.  Resources that are checked out (locked) are never
+spilled, nor are data that something else still refers to (spilling those
+would not free any memory).  Spilling is off until enable() is called, and
+only happens in the process that called it.
+'''
+import os
+import sys
+import gzip
+import uuid
+import atexit
+import shutil
+import weakref
+import cPickle
+import tempfile
+import threading
+from collections import OrderedDict
+
+import numpy
+
+from spikepy.common import shared_arrays, trace_storage
+from spikepy.utils.ragged_array import RaggedArray
+
+_directory = None
+_budget = 0
+_owner_pid = None
+_lock = threading.RLock()
+
+# _resident[resource_id] = size in bytes, least recently used first.
+_resident = OrderedDict()
+_resident_bytes = 0
+# _blobs[resource_id] = file the resource's data were spilled to.
+_blobs = {}
+_refs = {}
+num_spilled = 0
+num_faulted = 0
+
+def enable(budget, directory=None):
+    '''
+        Keep at most <budget> bytes of resource data in memory, spilling
+    to a new directory made under <directory> (default is the system's
+    temporary directory).  The directory is removed when the program exits.
+    '''
+    global _directory, _budget, _owner_pid
+    _directory = tempfile.mkdtemp(prefix='spikepy_spill_', dir=directory)
+    _budget = budget
+    _owner_pid = os.getpid()
+    atexit.register(shutil.rmtree, _directory, True)
+    return _directory
+
+def disable():
+    '''Stop spilling (data already spilled are still read back).'''
+    global _budget
+    _budget = None
+
+def is_enabled():
+    return _budget is not None and _directory is not None
+
+def _active():
+    return is_enabled() and os.getpid() == _owner_pid
+
+def get_resident_bytes():
+    return _resident_bytes
+
+def data_nbytes(thing):
+    '''
+        The memory taken by the arrays in <thing> (arrays kept in trace
+    storage take none).
+    '''
+    if isinstance(thing, numpy.ndarray):
+        if thing.dtype == object or trace_storage.is_stored(thing):
+            return 0
+        return thing.nbytes
+    if isinstance(thing, RaggedArray):
+        return data_nbytes(thing.values) + thing.offsets.nbytes
+    if isinstance(thing, (list, tuple)):
+        return sum([data_nbytes(item) for item in thing])
+    return 0
+
+def is_spilled(resource):
+    return resource.id in _blobs
+
+def update(resource):
+    '''Call when <resource>'s data were replaced.'''
+    with _lock:
+        _discard_blob(resource.id)
+        if _active():
+            _set_resident(resource, data_nbytes(resource._data))
+            _evict(keep=resource.id)
+
+def touch(resource):
+    '''
+        Call before <resource>'s data are used, reads them back if they
+    were spilled and marks them as most recently used.
+    '''
+    with _lock:
+        if resource.id in _blobs:
+            _fault_in(resource)
+        elif resource.id in _resident:
+            # move to the most recently used end.
+            _resident[resource.id] = _resident.pop(resource.id)
+        else:
+            return
+        if _active():
+            _evict(keep=resource.id)
+
+def _set_resident(resource, nbytes):
+    global _resident_bytes
+    key = resource.id
+    _resident_bytes += nbytes - _resident.pop(key, 0)
+    if nbytes:
+        _resident[key] = nbytes
+        if key not in _refs:
+            _refs[key] = weakref.ref(resource, 
+                    lambda ref, key=key: _forget(key))
+
+def _forget(key):
+    global _resident_bytes
+    with _lock:
+        _resident_bytes -= _resident.pop(key, 0)
+        _refs.pop(key, None)
+        _discard_blob(key)
+
+def _discard_blob(key):
+    filename = _blobs.pop(key, None)
+    if filename is not None:
+        try:
+            os.remove(filename)
+        except OSError:
+            pass
+
+def _evict(keep=None):
+    '''Spill least recently used data until within the budget.'''
+    for key in _resident.keys():
+        if _resident_bytes <= _budget:
+            break
+        resource = _refs[key]() if key in _refs else None
+        if key == keep or resource is None or resource.is_locked:
+            continue
+        if _is_referenced_elsewhere(resource):
+            continue
+        _spill(resource)
+
+def _is_referenced_elsewhere(resource):
+    '''True if something besides <resource> refers to its data.'''
+    # the resource's reference and getrefcount's argument.
+    num_references = 2
+    filename = getattr(resource._data, 'filename', None)
+    if (filename is not None and 
+            shared_arrays._attached.get(filename) is resource._data):
+        num_references += 1
+    return sys.getrefcount(resource._data) > num_references
+
+def _spill(resource):
+    global num_spilled
+    filename = os.path.join(_directory, '%s.spill' % uuid.uuid4().hex)
+    try:
+        with gzip.open(filename, 'wb', compresslevel=1) as ofile:
+            cPickle.dump(resource._data, ofile, protocol=2)
+    except (IOError, OSError):
+        if os.path.exists(filename):
+            os.remove(filename)
+        return
+    data = resource._data
+    resource._data = None
+    # the shared segment (if any) behind the data is no longer needed.
+    shared_arrays.release(data)
+    _set_resident(resource, 0)
+    _blobs[resource.id] = filename
+    num_spilled += 1
+
+def _fault_in(resource):
+    global num_faulted
+    filename = _blobs[resource.id]
+    with gzip.open(filename, 'rb') as infile:
+        resource._data = cPickle.load(infile)
+    _discard_blob(resource.id)
+    _set_resident(resource, data_nbytes(resource._data))
+    num_faulted += 1
@@ -0,0 +1,229 @@
+#  Copyright (C) 2012  David Morton
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import sys
+import time
+import json
+import uuid
+import hashlib
+import cPickle
+
+import numpy
+import scipy
+
+import spikepy
+from spikepy.common.warnings import warn
+from spikepy.utils.ragged_array import RaggedArray
+
+def hash_data(thing, hasher=None):
+    '''
+        Return the hex digest of the contents of <thing>, which may be a
+    numpy array, a scalar, a string or lists/tuples/dicts of those.
+    '''
+    if hasher is None:
+        hasher = hashlib.sha1()
+    _update_hash(thing, hasher)
+    return hasher.hexdigest()
+
+def _update_hash(thing, hasher):
+    if isinstance(thing, numpy.ndarray) and thing.dtype != object:
+        hasher.update('array%s%s' % (thing.dtype.str, str(thing.shape)))
+        hasher.update(numpy.ascontiguousarray(thing).data)
+    elif isinstance(thing, (list, tuple, numpy.ndarray)):
+        hasher.update('%s%d[' % (type(thing).__name__, len(thing)))
+        for item in thing:
+            _update_hash(item, hasher)
+        hasher.update(']')
+    elif isinstance(thing, RaggedArray):
+        hasher.update('ragged')
+        _update_hash(thing.values, hasher)
+        _update_hash(thing.offsets, hasher)
+        _update_hash(thing.channel_ids, hasher)
+    elif isinstance(thing, dict):
+        hasher.update('dict%d{' % len(thing))
+        for key in sorted(thing.keys()):
+            _update_hash(key, hasher)
+            _update_hash(thing[key], hasher)
+        hasher.update('}')
+    else:
+        hasher.update('%s:%s;' % (type(thing).__name__, repr(thing)))
+
+def canonical_kwargs(kwargs):
+    '''Return a string that is the same for all equal <kwargs>.'''
+    return json.dumps(kwargs, sort_keys=True, default=repr)
+
+def _source_files(module):
+    filename = getattr(module, '__file__', None)
+    if filename is None:
+        return []
+    if filename.endswith(('.pyc', '.pyo')):
+        filename = filename[:-1]
+    if os.path.splitext(os.path.basename(filename))[0] == '__init__':
+        # a plugin package, any of its modules may be part of the plugin.
+        directory = os.path.dirname(filename)
+        return sorted([os.path.join(directory, f) for f in 
+                os.listdir(directory) if f.endswith('.py')])
+    return [filename]
+
+_code_hashes = {}
+
+def code_version(thing):
+    '''
+        Return a hash of the source of the module that defines <thing>'s
+    class (the whole package if that module is a package's __init__) and of
+    the spikepy, numpy and scipy versions.  It changes when the plugin is 
+    edited or any of those are upgraded.
+    '''
+    module = sys.modules.get(type(thing).__module__)
+    files = _source_files(module)
+    versions = 'spikepy %s numpy %s scipy %s' % (spikepy.__version__,
+            numpy.__version__, scipy.__version__)
+    key = [versions, type(thing).__name__]
+    for filename in files:
+        try:
+            key.append((filename, os.path.getmtime(filename)))
+        except OSError:
+            key.append((filename, None))
+    key = tuple(key)
+    if key not in _code_hashes:
+        hasher = hashlib.sha1()
+        hasher.update('%s;%s;' % key[:2])
+        for filename in files:
+            try:
+                with open(filename, 'rb') as infile:
+                    hasher.update(infile.read())
+            except IOError:
+                hasher.update(filename)
+        _code_hashes[key] = hasher.hexdigest()
+    return _code_hashes[key]
+
+def _as_plain_arrays(thing):
+    # memmaps (shared segments) are stored as ordinary arrays.
+    if isinstance(thing, numpy.memmap):
+        return numpy.array(thing)
+    if isinstance(thing, (list, tuple)):
+        result = [_as_plain_arrays(item) for item in thing]
+        if isinstance(thing, tuple):
+            result = tuple(result)
+        return result
+    return thing
+
+
+class ResultCache(object):
+    '''
+        A persistent, on-disk cache of plugin results, keyed on the content
+    of everything that went into producing them (see Task.cache_key).
+    When the cache grows beyond <max_size> bytes the least recently used
+    results are removed.  A max_size of 0 disables the cache.
+    '''
+    suffix = '.result'
+
+    def __init__(self, directory, max_size):
+        self.directory = directory
+        self.max_size = max_size
+        # _index[key] = [size_in_bytes, last_used]
+        self._index = {}
+        if self.enabled:
+            if not os.path.exists(directory):
+                os.makedirs(directory)
+            self._scan()
+
+    @property
+    def enabled(self):
+        return self.max_size > 0
+
+    @property
+    def size(self):
+        return sum([size for size, last_used in self._index.values()])
+
+    def _scan(self):
+        for filename in os.listdir(self.directory):
+            if filename.endswith(self.suffix):
+                fullpath = os.path.join(self.directory, filename)
+                stat = os.stat(fullpath)
+                key = filename[:-len(self.suffix)]
+                self._index[key] = [stat.st_size, stat.st_mtime]
+
+    def _fullpath(self, key):
+        return os.path.join(self.directory, key + self.suffix)
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def get(self, key):
+        '''Return the result stored under <key>, or None.'''
+        if key not in self._index:
+            return None
+        fullpath = self._fullpath(key)
+        try:
+            with open(fullpath, 'rb') as infile:
+                result = cPickle.load(infile)
+        except Exception:
+            warn('Could not read cached result %s, discarding it.' % key)
+            self.discard(key)
+            return None
+        now = time.time()
+        self._index[key][1] = now
+        try:
+            os.utime(fullpath, (now, now))
+        except OSError:
+            pass
+        return result
+
+    def put(self, key, result):
+        '''Store <result> under <key>, evicting old results if needed.'''
+        if not self.enabled:
+            return
+        fullpath = self._fullpath(key)
+        # write then rename, so a partial file is never read back.
+        temp_fullpath = '%s.%s.tmp' % (fullpath, uuid.uuid4().hex)
+        try:
+            with open(temp_fullpath, 'wb') as ofile:
+                cPickle.dump(_as_plain_arrays(result), ofile, protocol=-1)
+            os.rename(temp_fullpath, fullpath)
+        except (IOError, OSError, cPickle.PicklingError):
+            warn('Could not cache result %s' % key)
+            if os.path.exists(temp_fullpath):
+                os.remove(temp_fullpath)
+            return
+        self._index[key] = [os.path.getsize(fullpath), time.time()]
+        self._evict(keep=key)
+
+    def discard(self, key):
+        if key in self._index:
+            del self._index[key]
+        try:
+            os.remove(self._fullpath(key))
+        except OSError:
+            pass
+
+    def clear(self):
+        for key in self._index.keys():
+            self.discard(key)
+
+    def _evict(self, keep=None):
+        '''Remove least recently used results until under max_size.'''
+        total_size = self.size
+        by_age = sorted(self._index.items(), key=lambda item: item[1][1])
+        for key, (size, last_used) in by_age:
+            if total_size <= self.max_size:
+                break
+            if key == keep:
+                continue
+            self.discard(key)
+            total_size -= size
+        if total_size > self.max_size and keep is not None:
+            self.discard(keep) # too big to cache at all.
@@ -0,0 +1,91 @@
+#  Copyright (C) 2012  David Morton
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import json
+
+import numpy
+
+from spikepy.common.warnings import warn
+
+def size_bucket(data_size):
+    '''Data sizes within a factor of two of each other share a bucket.'''
+    return int(round(numpy.log2(max(data_size, 1))))
+
+
+class RuntimeHistory(object):
+    '''
+        Remembers how long plugins took to run, per plugin and per data
+    size, so that the expected runtime of a task can be estimated before
+    it is run.  If <fullpath> is given, the history is loaded from there
+    and save() writes it back.
+    '''
+    def __init__(self, fullpath=None, smoothing=0.5):
+        self.fullpath = fullpath
+        # weight given to the newest runtime in the running average.
+        self.smoothing = smoothing
+        # _runtimes[plugin_key][bucket] = average runtime (seconds)
+        self._runtimes = {}
+        if fullpath is not None and os.path.exists(fullpath):
+            self.load(fullpath)
+
+    @staticmethod
+    def _plugin_key(stage_name, plugin_name):
+        return '%s|%s' % (stage_name, plugin_name)
+
+    def record(self, stage_name, plugin_name, data_size, runtime):
+        '''Add a measured <runtime> (in seconds) to the history.'''
+        runtimes = self._runtimes.setdefault(
+                self._plugin_key(stage_name, plugin_name), {})
+        bucket = str(size_bucket(data_size))
+        if bucket in runtimes:
+            runtimes[bucket] = (self.smoothing*runtime +
+                    (1.0-self.smoothing)*runtimes[bucket])
+        else:
+            runtimes[bucket] = runtime
+
+    def estimate(self, stage_name, plugin_name, data_size):
+        '''
+            Return the expected runtime of the plugin on data of the given
+        size, or None if it has never been run.  Sizes without a history of
+        their own are scaled linearly from the closest size that has one.
+        '''
+        runtimes = self._runtimes.get(
+                self._plugin_key(stage_name, plugin_name))
+        if not runtimes:
+            return None
+        bucket = size_bucket(data_size)
+        closest = min([int(b) for b in runtimes.keys()],
+                key=lambda b: abs(b-bucket))
+        return runtimes[str(closest)] * 2.0**(bucket-closest)
+
+    def load(self, fullpath):
+        try:
+            with open(fullpath, 'r') as infile:
+                self._runtimes = json.load(infile)
+        except (IOError, ValueError):
+            warn('Could not read runtime history from %s' % fullpath)
+            self._runtimes = {}
+
+    def save(self, fullpath=None):
+        if fullpath is None:
+            fullpath = self.fullpath
+        if fullpath is None:
+            return
+        try:
+            with open(fullpath, 'w') as ofile:
+                json.dump(self._runtimes, ofile, indent=4)
+        except IOError:
+            warn('Could not save runtime history to %s' % fullpath)
@@ -15,6 +15,8 @@
 
 import copy
 import uuid
+import random
+import heapq
 from collections import defaultdict
 import itertools
 from exceptions import Exception
@@ -31,19 +33,21 @@ class Operation(object):
     of the scheduled workflow.  Nodes have inputs and outputs which determine
     how the directed-graph is constructed.
     '''
-    def __init__(self, inputs, outputs, name=None):
+    def __init__(self, inputs, outputs, name=None, cost=None):
         '''
         Inputs:
             inputs: A list of hashable elements
             outputs: A list of hashable elements
             *kwargs*
             name: A string describing the operation
+            cost: The expected runtime of the operation (None if unknown)
         '''
         if name is None:
             name = uuid.uuid4()
         inputs = set(inputs)
         outputs = set(outputs)
         self.name = name
+        self.cost = cost
         self.inputs = inputs
         self.outputs = outputs
         self.modifies = inputs.intersection(outputs)
@@ -137,14 +141,14 @@ def find_dependencies(xputs):
         dependencies: a set of tuples of Operation objects
     '''
     dependencies = set()
-    for p, desc in xputs.items():
-        dependencies.update(list(itertools.product(desc['originated_by'], 
-                desc['modified_by'])))
-        dependencies.update(list(itertools.product(desc['modified_by'],
-                desc['finalized_by'])))
+    for p, desc in xputs.iteritems():
+        dependencies.update(itertools.product(desc['originated_by'], 
+                desc['modified_by']))
+        dependencies.update(itertools.product(desc['modified_by'],
+                desc['finalized_by']))
         if len(desc['modified_by']) == 0: 
-            dependencies.update(list(itertools.product(desc['originated_by'],
-                    desc['finalized_by'])))
+            dependencies.update(itertools.product(desc['originated_by'],
+                    desc['finalized_by']))
     return dependencies
 
 
@@ -186,24 +190,50 @@ def find_impossible_operations(operations):
     return impossible_operations 
 
 
-def clear_impossible_operations(operations):
+def clear_impossible_operations(operations, xputs=None):
     '''
         Removes impossible operations and return the set of removed operations.
     Inputs:
         operations: a list or set of Operation objects
+        *kwarg*
+        xputs: the output of find_xputs(operations), if already known.  It
+                is updated to no longer include the removed operations.
     Returns:
         impossible_operations: the list of operations removed from <operations>
                 because they were impossible
     '''
+    if xputs is None:
+        xputs = find_xputs(operations)
+
+    # removing an operation may leave the things it originates without an
+    # originator, so follow those along instead of rescanning everything.
+    num_originators = {}
+    for p, info in xputs.iteritems():
+        num_originators[p] = len(info['originated_by'])
     impossible_operations = set()
-    while True:
-        tio = find_impossible_operations(operations)
-        impossible_operations.update(tio)
-        if tio:
-            for io in tio:
-                operations.remove(io)
-        else:
-            break
+    to_check = xputs.keys()
+    while to_check:
+        p = to_check.pop()
+        if num_originators[p] > 0:
+            continue
+        info = xputs[p]
+        for op in info['modified_by'].union(info['finalized_by']):
+            if op in impossible_operations:
+                continue
+            impossible_operations.add(op)
+            for op_p in op.originates:
+                num_originators[op_p] -= 1
+                if num_originators[op_p] == 0:
+                    to_check.append(op_p)
+
+    for io in impossible_operations:
+        operations.remove(io)
+        for p in io.originates:
+            xputs[p]['originated_by'].discard(io)
+        for p in io.modifies:
+            xputs[p]['modified_by'].discard(io)
+        for p in io.finalizes:
+            xputs[p]['finalized_by'].discard(io)
     return impossible_operations 
 
 
@@ -256,7 +286,7 @@ def copy_operation_set(operations):
     new_ops = {}
     old_ops = {}
     for op in operations:
-        new_op = Operation(op.inputs, op.outputs, op.name)
+        new_op = Operation(op.inputs, op.outputs, op.name, cost=op.cost)
         new_ops[op] = new_op 
         old_ops[new_op] = op
 
@@ -294,6 +324,95 @@ def find_ready_sets(operations):
     return results
     
 
+def find_upward_ranks(operations, default_cost=0.0):
+    '''
+        Return the upward rank (as in HEFT) of each operation, that is, the
+    total cost of the most expensive path from the operation to the end of
+    the dependency graph, including the operation itself.
+
+    Inputs:
+        operations: a set or list of Operation objects (already pointed)
+        *kwarg*
+        default_cost: the cost used for operations whose cost is None
+    Returns:
+        ranks: a dictionary keyed on the operations in <operations>
+    '''
+    operations = set(operations)
+    # count links to successors within <operations> and start from the ends.
+    num_successors = {}
+    for op in operations:
+        num_successors[op] = len(op.points_at.intersection(operations))
+    to_visit = [op for op, count in num_successors.items() if count == 0]
+
+    ranks = {}
+    while to_visit:
+        op = to_visit.pop()
+        cost = op.cost
+        if cost is None:
+            cost = default_cost
+        successor_ranks = [ranks[other] for other in op.points_at 
+                if other in operations]
+        ranks[op] = cost + max(successor_ranks + [0.0])
+        for other in op.is_pointed_at_by:
+            if other in operations:
+                num_successors[other] -= 1
+                if num_successors[other] == 0:
+                    to_visit.append(other)
+    return ranks
+
+
+def make_plot_dict(layout, states):
+    '''
+        Return a dictionary that can be used to plot operations (see 
+    plotting_utils.plot_operations).
+    Inputs:
+        layout: see Scheduler.get_plot_layout
+        states: a list with the state of each node in the layout, one of
+                'default', 'started' or 'finished'.
+    Returns:
+        plot_dict: a dictionary describing how the operations and the links
+                should be plotted.
+    '''
+    fill_colors = {'started':'cyan', 'finished':'black', 'default':'white'}
+    edge_colors = {'started':'black', 'finished':'cyan', 'default':'black'}
+
+    verts = numpy.array([(0.0, 0.0), (1.0, -1.0), (8.0, -1.0), 
+                         (9.0, 0.0), (9.0, 3.0), (8.0, 4.0), 
+                         (1.0, 4.0), (0.0, 3.0), (0.0, 0.0)])
+    verts -= numpy.average(verts, axis=0)
+    verts = [v for v in verts]
+
+    xs = layout['xs']
+    ys = layout['ys']
+    edgecolors = [edge_colors[state] for state in states]
+    facecolors = [fill_colors[state] for state in states]
+    labels = []
+    for x, y, name, color in zip(xs, ys, layout['names'], edgecolors):
+        labels.append((x, y, name, 
+                {'color':color, 'zorder':3, 
+                 'horizontalalignment':'center',
+                 'verticalalignment':'center'}))
+
+    links = []
+    for i, j in layout['links']:
+        color = edgecolors[i]
+        x = (xs[i], xs[j])
+        y = (ys[i], ys[j])
+        kwargs = {'color':color, 'linewidth':1, 'zorder':1}
+        links.append((x, y, kwargs))
+
+        mid_x = (numpy.average(x), x[1])
+        mid_y = (numpy.average(y), y[1])
+        kwargs = {'color':color, 'linewidth':3, 'zorder':1}
+        links.append((mid_x, mid_y, kwargs))
+
+    plot_dict = {}
+    plot_dict['link_list'] = links
+    plot_dict['node_info'] = {'xs':list(xs), 'ys':list(ys), 'kwargs':{'verts':verts, 'marker':None, 'edgecolors':edgecolors, 'facecolors':facecolors, 's':600, 'zorder':2}}
+    plot_dict['label_list'] = labels
+    return plot_dict 
+
+
 def layout_operations(operations, offset=None):
     '''
         Return a dictionary keyed on the operations and with
@@ -315,9 +434,8 @@ def layout_operations(operations, offset=None):
     adjustment = numpy.sin(numpy.linspace(0.0, 2.0*numpy.pi, len(ready_sets)))
     positions = {}
     for x, rs in enumerate(ready_sets):
-        names = sorted([op.name for op in rs])
-        for op in rs:
-            y = names.index(op.name)
+        rs = sorted(rs, key=lambda op: op.name)
+        for y, op in enumerate(rs):
             positions[op] = numpy.array([x+1, y+1+adjustment[x]])*offset
         
     return positions
@@ -335,12 +453,17 @@ class Scheduler(object):
         s.set_root_outputs(<outputs>)
 
         while s.operations:
-            ready_operation = random.choice(s.ready_operations)
+            ready_operation = s.get_next_ready_operation()
             s.start_operation(ready_operation)
 
             finished_operations = some_fn()
             for op in finished_operations:
                 s.finish_operation(op)
+
+        The dependency graph is built once, the first time it is needed.
+    After that the set of ready operations is kept up to date as operations
+    start and finish, so those calls only cost as much as the number of 
+    links the operation has.
     '''
     def __init__(self):
         self.reset()
@@ -356,12 +479,93 @@ class Scheduler(object):
         self._root_operation = RootOperation([])
         self._originated_outputs = set()
 
+        # operations in the graph that nothing points at and aren't started.
+        self._ready_operations = set()
+        # (-rank, tie_breaker, operation) for each ready operation, entries
+        # for operations that have since started are skipped when popped.
+        self._ready_queue = []
+        self._ranks = {}
+
+        # see get_plot_layout
+        self._plot_layout = None
+        self._plot_operations = None
+        self._plot_index = None
+        self._plot_changes = []
+
     def get_ready_operations(self):
         if self._graph is None:
             self._construct_graph()
-        potentials = find_ready_operations(self._graph)
-        potentials.difference_update(self._started_operations)
-        return list(potentials)
+        return list(self._ready_operations)
+
+    @property
+    def num_ready_operations(self):
+        if self._graph is None:
+            self._construct_graph()
+        return len(self._ready_operations)
+
+    def get_next_ready_operation(self):
+        '''
+            Return the ready operation heading the most expensive remaining
+        path through the graph (see prioritize_operations), or None if no
+        operations are ready.
+        '''
+        if self._graph is None:
+            self._construct_graph()
+        queue = self._ready_queue
+        while queue and queue[0][-1] not in self._ready_operations:
+            heapq.heappop(queue)
+        if queue:
+            return queue[0][-1]
+        return None
+
+    def _make_ready(self, operation):
+        self._ready_operations.add(operation)
+        heapq.heappush(self._ready_queue, (-self._ranks.get(operation, 0.0), 
+                random.random(), operation))
+
+    def find_dependents(self, operations):
+        '''
+            Return the set of <operations> together with all the operations
+        that depend on them, directly or through other operations.
+        '''
+        if self._graph is None:
+            self._construct_graph()
+        dependents = set()
+        to_visit = list(operations)
+        while to_visit:
+            op = to_visit.pop()
+            if op not in dependents:
+                dependents.add(op)
+                to_visit.extend(op.points_at)
+        return dependents
+
+    def prioritize_operations(self, operations):
+        '''
+            Return <operations> sorted so that those heading the most
+        expensive remaining paths through the graph come first.  Operations
+        without a cost are assumed to cost the average of those that have
+        one.  Ties (e.g. when no costs are known) are broken randomly.
+        '''
+        if self._graph is None:
+            self._construct_graph()
+        ranks = self._ranks
+
+        operations = list(operations)
+        random.shuffle(operations)
+        operations.sort(key=lambda op: ranks.get(op, 0.0), reverse=True)
+        return operations
+
+    def _rank_operations(self):
+        '''
+            Find the upward ranks used to prioritize operations.  Only
+        operations upstream of an operation are removed as the run goes on,
+        so its rank stays the same and this is done once per graph.
+        '''
+        known_costs = [op.cost for op in self._graph if op.cost is not None]
+        default_cost = 0.0
+        if known_costs:
+            default_cost = numpy.average(known_costs)
+        self._ranks = find_upward_ranks(self._graph, default_cost=default_cost)
 
     @property
     def impossible_operations(self):
@@ -373,72 +577,95 @@ class Scheduler(object):
         
     def start_operation(self, operation):
         self._started_operations.add(operation)
+        self._ready_operations.discard(operation)
+        self._record_plot_change(operation)
 
     def finish_operation(self, operation):
         self._started_operations.remove(operation)
         self._finished_operations.add(operation)
+        self._record_plot_change(operation)
+        successors = operation.points_at
         operation.unpoint()
         if operation in self._operations:
             self._operations.remove(operation)
             self._graph.remove(operation)
+        # successors with nothing left to wait on are now ready.
+        for other in successors:
+            if (not other.is_pointed_at_by and other in self._graph and
+                    other not in self._started_operations):
+                self._make_ready(other)
 
     def get_plot_dict(self):
         '''
             Return a dictionary that can be used to plot the scheduled 
-        operations.  The dictionary is keyed on the operations and has 
-        dictionaries as the values which describe how the operations and 
-        the links should be plotted.
+        operations (see make_plot_dict).
         '''
-        fill_colors = {'started':'cyan', 'finished':'black', 'default':'white'}
-        edge_colors = {'started':'black', 'finished':'cyan', 'default':'black'}
-
-        positions = layout_operations(self._display_graph)
-
-        verts = numpy.array([(0.0, 0.0), (1.0, -1.0), (8.0, -1.0), 
-                             (9.0, 0.0), (9.0, 3.0), (8.0, 4.0), 
-                             (1.0, 4.0), (0.0, 3.0), (0.0, 0.0)])
-        verts -= numpy.average(verts, axis=0)
-        verts = [v for v in verts]
-
-        plot_dict = {}
-        links = []
-        xs = []
-        ys = []
-        edgecolors = []
-        facecolors = []
-        labels = []
-        for op in positions.keys():
-            graph_op = self._graph_index[op]
-            state = 'default'
-            if graph_op in self._started_operations:
-                state = 'started'
-            if graph_op in self._finished_operations:
-                state = 'finished'
-            color = edge_colors[state]
-            edgecolors.append(color)
-            facecolors.append(fill_colors[state])
-            xs.append(positions[op][0])
-            ys.append(positions[op][1])
-            labels.append((xs[-1], ys[-1], op.name, 
-                    {'color':color, 'zorder':3, 
-                     'horizontalalignment':'center',
-                     'verticalalignment':'center'}))
-            for other in op.points_at:
-                x = (positions[op][0], positions[other][0])
-                y = (positions[op][1], positions[other][1])
-                kwargs = {'color':color, 'linewidth':1, 'zorder':1}
-                links.append((x, y, kwargs))
-
-                mid_x = (numpy.average(x), x[1])
-                mid_y = (numpy.average(y), y[1])
-                kwargs = {'color':color, 'linewidth':3, 'zorder':1}
-                links.append((mid_x, mid_y, kwargs))
-        plot_dict['link_list'] = links
-        
-        plot_dict['node_info'] = {'xs':xs, 'ys':ys, 'kwargs':{'verts':verts, 'marker':None, 'edgecolors':edgecolors, 'facecolors':facecolors, 's':600, 'zorder':2}}
-        plot_dict['label_list'] = labels
-        return plot_dict 
+        layout = self.get_plot_layout()
+        return make_plot_dict(layout, layout['states'])
 
+    def get_plot_layout(self):
+        '''
+            Return a dictionary describing where the operations should be
+        plotted (see make_plot_dict).  The layout is only worked out once 
+        per graph, and from then on the changes in the operations' states 
+        are recorded (see pop_plot_changes).
+        Returns:
+            layout: {'names':list of operation names,
+                     'xs', 'ys':lists of node positions,
+                     'links':list of (from_index, to_index),
+                     'states':list of the current state of each node}
+        '''
+        if self._graph is None:
+            self._construct_graph()
+        if self._plot_layout is None:
+            if self._display_graph is None:
+                self._copy_display_graph()
+            positions = layout_operations(self._display_graph)
+            display_ops = positions.keys()
+            display_op_index = {}
+            for i, op in enumerate(display_ops):
+                display_op_index[op] = i
+            self._plot_operations = [self._graph_index[op] 
+                    for op in display_ops]
+            self._plot_index = {}
+            for i, op in enumerate(self._plot_operations):
+                self._plot_index[op] = i
+            self._plot_changes = []
+            links = []
+            for op in display_ops:
+                for other in op.points_at:
+                    links.append((display_op_index[op], 
+                            display_op_index[other]))
+            self._plot_layout = {'names':[op.name for op in display_ops],
+                    'xs':[positions[op][0] for op in display_ops],
+                    'ys':[positions[op][1] for op in display_ops],
+                    'links':links}
+
+        layout = dict(self._plot_layout)
+        layout['states'] = [self._operation_state(op) 
+                for op in self._plot_operations]
+        return layout
+
+    def pop_plot_changes(self):
+        '''
+            Return the list of (node_index, state) changes since the last
+        call (or since get_plot_layout was first called).
+        '''
+        changes = self._plot_changes
+        self._plot_changes = []
+        return changes
+
+    def _operation_state(self, operation):
+        if operation in self._finished_operations:
+            return 'finished'
+        if operation in self._started_operations:
+            return 'started'
+        return 'default'
+
+    def _record_plot_change(self, operation):
+        if self._plot_index is not None and operation in self._plot_index:
+            self._plot_changes.append((self._plot_index[operation], 
+                    self._operation_state(operation)))
 
     def add_operation(self, new_op):
         # enforce the one-originator rule.
@@ -466,22 +693,54 @@ class Scheduler(object):
             self._graph: a subset of self._operations that are included in
                     the dependency graph.
             self._display_graph: a copy of self._graph but also includes
-                    a copy of the RootOperation. (used for visualization)
+                    a copy of the RootOperation. (used for visualization,
+                    made by _copy_display_graph when first needed)
         '''
         self._graph = copy.copy(self._operations)
         operations = self._operations.union(set([self._root_operation]))
 
-        impossible_operations = clear_impossible_operations(operations)
-        point_operations(operations)
+        xputs = find_xputs(operations)
+        impossible_operations = clear_impossible_operations(operations, 
+                xputs=xputs)
+        dependencies = find_dependencies(xputs)
+        for source, target in dependencies:
+            source.point_at(target)
 
-        self._display_graph, self._display_index, self._graph_index =\
-                copy_operation_set(operations)
+        self._display_graph = None
+        self._display_source = (operations, dependencies)
+        self._plot_layout = None
+        self._plot_index = None
+        self._rank_operations()
+        self._ready_operations = set()
+        self._ready_queue = []
         self.start_operation(self._root_operation)
         self.finish_operation(self._root_operation)
+        for op in find_ready_operations(self._graph):
+            if (op not in self._ready_operations and 
+                    op not in self._started_operations):
+                self._make_ready(op)
 
         self._impossible_operations = impossible_operations
         return impossible_operations 
 
+    def _copy_display_graph(self):
+        '''
+            Make self._display_graph, a copy of the graph as it was when
+        it was constructed (the graph itself loses links as operations
+        finish).
+        '''
+        operations, dependencies = self._display_source
+        self._display_index = {}
+        self._graph_index = {}
+        for op in operations:
+            display_op = Operation(op.inputs, op.outputs, op.name, 
+                    cost=op.cost)
+            self._display_index[op] = display_op
+            self._graph_index[display_op] = op
+        for source, target in dependencies:
+            self._display_index[source].point_at(self._display_index[target])
+        self._display_graph = set(self._display_index.values())
+
     def set_root_outputs(self, outputs):
         '''
             Sets the root_operation's outputs and removes any of the operations
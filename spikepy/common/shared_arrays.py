@@ -0,0 +1,263 @@
+#  Copyright (C) 2012  David Morton
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import uuid
+import atexit
+import shutil
+import tempfile
+import weakref
+
+import numpy
+
+# arrays handed out by attach(), keyed on the segment's filename.  Only
+# these arrays may be re-shared without copying.
+_attached = weakref.WeakValueDictionary()
+_scratch_dir = None
+
+def get_scratch_dir():
+    '''
+        Return the directory where shared segments are stored, creating it
+    the first time.  RAM-backed /dev/shm is used where it exists.
+    '''
+    global _scratch_dir
+    if _scratch_dir is None:
+        base_dir = None
+        if os.path.isdir('/dev/shm'):
+            base_dir = '/dev/shm'
+        _scratch_dir = tempfile.mkdtemp(prefix='spikepy_shared_',
+                dir=base_dir)
+        atexit.register(shutil.rmtree, _scratch_dir, True)
+    return _scratch_dir
+
+
+class SharedArray(object):
+    '''
+        A small, picklable descriptor of a numpy array that lives in a
+    memory-mapped segment.  These are what get sent across process
+    boundaries instead of the array itself.
+    '''
+    def __init__(self, filename, dtype, shape, offset=0, columns=None):
+        self.filename = filename
+        self.dtype = numpy.dtype(dtype).str
+        self._shape = tuple(shape)
+        self.offset = offset
+        # (begin, end) of the slice along the second axis that is described.
+        self.columns = columns
+
+    @property
+    def shape(self):
+        if self.columns is None:
+            return self._shape
+        begin, end = self.columns
+        return (self._shape[0], end-begin) + self._shape[2:]
+
+    def take_rows(self, begin, end):
+        '''
+            Return a SharedArray describing rows begin:end of this one,
+        without copying anything.
+        '''
+        row_nbytes = numpy.dtype(self.dtype).itemsize
+        for dim in self._shape[1:]:
+            row_nbytes *= dim
+        end = min(end, self._shape[0])
+        return SharedArray(self.filename, self.dtype, 
+                (end-begin,) + self._shape[1:], 
+                offset=self.offset + begin*row_nbytes, columns=self.columns)
+
+    def take_columns(self, begin, end):
+        '''
+            Return a SharedArray describing columns begin:end (the second
+        axis) of this one, without copying anything.  Only the pages holding
+        those columns are read when it is attached.
+        '''
+        first = 0
+        if self.columns is not None:
+            first = self.columns[0]
+        end = min(end, self.shape[1])
+        return SharedArray(self.filename, self.dtype, self._shape,
+                offset=self.offset, columns=(first+begin, first+end))
+
+    def attach(self, mode='r+'):
+        '''
+            Map the segment into this process.  Use mode='c'
+        (copy-on-write) to get an array you may modify without changing
+        the segment.
+        '''
+        array = numpy.memmap(self.filename, dtype=self.dtype, mode=mode,
+                shape=self._shape, offset=self.offset)
+        if self.columns is not None:
+            begin, end = self.columns
+            return array[:, begin:end]
+        if mode != 'c' and self.offset == 0:
+            _attached[self.filename] = array
+        return array
+
+    def __repr__(self):
+        return 'SharedArray(%s, %s, %s, offset=%d, columns=%s)' % (
+                self.filename, self.dtype, str(self._shape), self.offset, 
+                str(self.columns))
+
+
+def take_rows(thing, begin, end):
+    '''Rows begin:end of an array or a SharedArray.'''
+    if isinstance(thing, SharedArray):
+        return thing.take_rows(begin, end)
+    return thing[begin:end]
+
+def take_columns(thing, begin, end):
+    '''Columns begin:end of a (2D or more) array or a SharedArray.'''
+    if isinstance(thing, SharedArray):
+        return thing.take_columns(begin, end)
+    return thing[:, begin:end]
+
+def num_rows(thing):
+    '''The length of the first dimension of an array or a SharedArray.'''
+    if isinstance(thing, SharedArray):
+        return thing.shape[0]
+    return len(thing)
+
+
+def _address(array):
+    return array.__array_interface__['data'][0]
+
+def get_attached(array):
+    '''
+        Return the array returned by SharedArray.attach that <array> is,
+    or is a view of, or None.
+    '''
+    filename = getattr(array, 'filename', None)
+    if filename is None:
+        return None
+    attached = _attached.get(filename)
+    base = array
+    while isinstance(base, numpy.ndarray):
+        if base is attached:
+            return attached
+        base = base.base
+    return None
+
+def describe_rows(array):
+    '''
+        Return a SharedArray describing <array> if it is an array returned
+    by SharedArray.attach or a block of whole rows of one, otherwise None.
+    '''
+    attached = get_attached(array)
+    if attached is None:
+        return None
+    if array is attached:
+        return SharedArray(array.filename, array.dtype, array.shape)
+    offset = _address(array) - _address(attached)
+    row_nbytes = array.itemsize*int(numpy.prod(array.shape[1:]))
+    if (array.dtype != attached.dtype or 
+            array.shape[1:] != attached.shape[1:] or
+            not array.flags.c_contiguous or
+            row_nbytes == 0 or offset % row_nbytes != 0):
+        return None
+    return SharedArray(array.filename, array.dtype, array.shape,
+            offset=offset)
+
+def share(array, directory=None, reuse=True):
+    '''
+        Return a SharedArray describing <array>.  If <array> was itself
+    returned by SharedArray.attach (or is a block of rows of such an array)
+    and <reuse> is True, the existing segment is described, otherwise the
+    data are copied into a new segment.
+    Returns:
+        shared_array: a SharedArray object
+        created: True if a new segment was created.
+    '''
+    if reuse:
+        shared_array = describe_rows(array)
+        if shared_array is not None:
+            return shared_array, False
+
+    if directory is None:
+        directory = get_scratch_dir()
+    filename = os.path.join(directory, '%s.dat' % uuid.uuid4().hex)
+    segment = numpy.memmap(filename, dtype=array.dtype, mode='w+',
+            shape=array.shape)
+    segment[...] = array
+    segment.flush()
+    del segment
+    return SharedArray(filename, array.dtype, array.shape), True
+
+def should_share(thing, threshold):
+    return (threshold > 0 and isinstance(thing, numpy.ndarray) and
+            thing.dtype != object and thing.nbytes >= threshold)
+
+def pack(thing, threshold, directory=None, reuse=True):
+    '''
+        Replace the numpy arrays in <thing> (which may be nested in lists
+    and tuples) that are at least <threshold> bytes with SharedArray
+    descriptors.
+    Returns:
+        packed_thing: <thing> with large arrays replaced.
+        created: list of SharedArrays whose segments were created here.
+    '''
+    created = []
+    packed_thing = _pack(thing, threshold, directory, reuse, created)
+    return packed_thing, created
+
+def _pack(thing, threshold, directory, reuse, created):
+    if should_share(thing, threshold):
+        shared_array, was_created = share(thing, directory=directory,
+                reuse=reuse)
+        if was_created:
+            created.append(shared_array)
+        return shared_array
+    if isinstance(thing, (list, tuple)):
+        result = [_pack(item, threshold, directory, reuse, created)
+                for item in thing]
+        if isinstance(thing, tuple):
+            result = tuple(result)
+        return result
+    return thing
+
+def unpack(thing, mode='r+'):
+    '''Replace the SharedArray descriptors in <thing> with mapped arrays.'''
+    if isinstance(thing, SharedArray):
+        return thing.attach(mode=mode)
+    if isinstance(thing, (list, tuple)):
+        result = [unpack(item, mode=mode) for item in thing]
+        if isinstance(thing, tuple):
+            result = tuple(result)
+        return result
+    return thing
+
+def release(thing):
+    '''
+        Remove the segments behind <thing>, which may be a SharedArray, an
+    array returned by SharedArray.attach, or lists/tuples of those.  Arrays
+    that are still mapped remain valid until they are garbage collected.
+    '''
+    if isinstance(thing, (list, tuple)):
+        for item in thing:
+            release(item)
+        return
+
+    if isinstance(thing, SharedArray):
+        filename = thing.filename
+    else:
+        filename = getattr(thing, 'filename', None)
+        if filename is None or _attached.get(filename) is not thing:
+            return # not a segment we manage.
+
+    if filename in _attached:
+        del _attached[filename]
+    try:
+        os.remove(filename)
+    except OSError:
+        pass # already gone, or still mapped on windows (removed at exit).
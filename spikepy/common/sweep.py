@@ -0,0 +1,206 @@
+#  Copyright (C) 2012  David Morton
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import itertools
+from collections import defaultdict
+
+from spikepy.common.trial_manager import Trial, Resource
+from spikepy.common.result_cache import hash_data, canonical_kwargs
+from spikepy.common.errors import *
+
+def expand_grid(base_strategy, parameter_grid):
+    '''
+        Return a list of (parameters, strategy) pairs, one for every
+    combination of values in <parameter_grid>.
+    Inputs:
+        base_strategy: the Strategy that all variants start from.
+        parameter_grid: a dictionary keyed on (stage_name, setting_name)
+                with lists of values.  For auxiliary stages use
+                (plugin_name, setting_name).
+    Returns:
+        variants: list of (parameters, strategy) where parameters is a
+                dictionary keyed like <parameter_grid> with single values.
+    '''
+    keys = sorted(parameter_grid.keys())
+    for stage_name, setting_name in keys:
+        if (stage_name not in base_strategy.settings and
+                stage_name not in base_strategy.auxiliary_stages):
+            raise SweepError('The strategy has no stage or auxiliary stage named "%s".' % 
+                    stage_name)
+
+    variants = []
+    for values in itertools.product(*[parameter_grid[key] for key in keys]):
+        parameters = dict(zip(keys, values))
+        strategy = base_strategy.copy()
+        for (stage_name, setting_name), value in parameters.items():
+            if stage_name in strategy.settings:
+                strategy.settings[stage_name][setting_name] = value
+            else:
+                strategy.auxiliary_stages[stage_name][setting_name] = value
+        variants.append((parameters, strategy))
+    return variants
+
+def make_variant_trial(trial):
+    '''
+        Return a new trial that shares <trial>'s id, attributes and the
+    resources it originates, but none of its other resources (nor its
+    cache of clustered data, which is computed from them).
+    '''
+    variant_trial = Trial()
+    for key, value in trial.__dict__.items():
+        if not isinstance(value, Resource) and key != '_clustered_cache':
+            setattr(variant_trial, key, value)
+    for resource in trial.originates:
+        setattr(variant_trial, resource.name, resource)
+    variant_trial.originates = list(trial.originates)
+    return variant_trial
+
+
+class SweepVariant(object):
+    '''One point of a parameter sweep, with its own namespace of trials.'''
+    def __init__(self, parameters, strategy, trials):
+        self.parameters = parameters
+        self.strategy = strategy
+        self.trials = [make_variant_trial(trial) for trial in trials]
+        self.tasks = []
+
+    def get_trial(self, display_name):
+        '''
+            Return this variant's trial named <display_name>.
+        Raises MissingTrialError if there is no such trial.
+        '''
+        for trial in self.trials:
+            if trial.display_name == display_name:
+                return trial
+        raise MissingTrialError('No trial named "%s" in this variant.' %
+                display_name)
+
+
+class ParameterSweep(object):
+    '''
+        Runs every combination of the settings in a parameter grid over the
+    same trials.  Tasks that every variant would run identically (same
+    plugin, kwargs and inputs) are run only once and their results are
+    shared by the variants.  Each variant's results are kept on its own
+    trials (see SweepVariant and results_table).
+    '''
+    def __init__(self, trials, base_strategy, parameter_grid):
+        self.original_trials = trials
+        self.base_strategy = base_strategy
+        self.parameter_grid = parameter_grid
+        self.variants = [SweepVariant(parameters, strategy, trials) for
+                parameters, strategy in expand_grid(base_strategy,
+                parameter_grid)]
+
+    def merge_tasks(self):
+        '''
+            Share resources between variants wherever they would be computed
+        the same way, and return the list of distinct tasks (each variant's
+        tasks must have been built already).
+        '''
+        shared_resources = {}
+        unique_tasks = {}
+        for variant in self.variants:
+            keys = find_resource_keys(variant.trials, variant.tasks)
+            for trial in variant.trials:
+                for resource in trial.resources:
+                    key = keys.get((trial.trial_id, resource.name))
+                    if key is None:
+                        continue # originated or unused.
+                    if key in shared_resources:
+                        setattr(trial, resource.name, shared_resources[key])
+                    else:
+                        shared_resources[key] = resource
+
+            for task in variant.tasks:
+                # an originator and its modifiers provide the same resource.
+                task_key = hash_data([task.plugin_category, task.plugin.name,
+                        sorted([keys[(trial.trial_id, pname)]
+                        for trial in task.trials
+                        for pname in task.plugin.provides])])
+                if task_key not in unique_tasks:
+                    unique_tasks[task_key] = task
+        self.num_tasks_without_sharing = sum([len(v.tasks)
+                for v in self.variants])
+        return unique_tasks.values()
+
+    def results_table(self, resource_name):
+        '''
+            Return a list with one row per variant of
+        (parameters, {trial_display_name:data}).
+        '''
+        table = []
+        for variant in self.variants:
+            row = {}
+            for trial in variant.trials:
+                resource = getattr(trial, resource_name, None)
+                if isinstance(resource, Resource):
+                    row[trial.display_name] = resource.data
+            table.append((variant.parameters, row))
+        return table
+
+
+def find_resource_keys(trials, tasks):
+    '''
+        Return a dictionary keyed on (trial_id, resource_name), for every
+    resource the <tasks> provide, valued with a key that is equal for two
+    resources exactly when they are computed the same way: by the same
+    plugins, with the same kwargs, from inputs that are themselves computed
+    the same way.  A resource's key covers every task that writes it
+    (originator and any modifiers).
+    '''
+    writers = defaultdict(list)
+    for task in tasks:
+        for trial in task.trials:
+            for pname in task.plugin.provides:
+                writers[(trial.trial_id, pname)].append(task)
+
+    root_keys = {}
+    for trial in trials:
+        for resource in trial.originates:
+            root_keys[(trial.trial_id, resource.name)] = hash_data(
+                    ['root', str(trial.trial_id), resource.name])
+
+    keys = {}
+    def find_key(resource_id, visiting):
+        if resource_id in root_keys:
+            return root_keys[resource_id]
+        if resource_id in keys:
+            return keys[resource_id]
+        if resource_id in visiting:
+            raise SweepError('Circular dependency involving %s.' %
+                    resource_id[1])
+        visiting = visiting.union([resource_id])
+
+        descriptions = []
+        for task in writers[resource_id]:
+            input_keys = []
+            for trial in task.trials:
+                for rname in task.plugin.requires:
+                    input_id = (trial.trial_id, rname)
+                    if input_id != resource_id:
+                        input_keys.append(find_key(input_id, visiting))
+            descriptions.append([task.plugin_category, task.plugin.name,
+                    canonical_kwargs(task.plugin_kwargs),
+                    resource_id[1] in task.plugin.requires, input_keys])
+        # originators first, then modifiers in a fixed order.
+        descriptions.sort(key=lambda d: (d[3], repr(d)))
+        keys[resource_id] = hash_data([str(resource_id[0]), resource_id[1],
+                descriptions])
+        return keys[resource_id]
+
+    for resource_id in writers.keys():
+        find_key(resource_id, frozenset())
+    return keys
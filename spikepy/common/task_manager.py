@@ -16,10 +16,16 @@
 import datetime
 import copy
 import uuid
+from collections import defaultdict
 
 import numpy
 
 from spikepy.common.scheduler import Scheduler, Operation
+from spikepy.common import shared_arrays, trace_storage, resource_spill,\
+        pooled_arena
+from spikepy.common.result_cache import hash_data, canonical_kwargs, \
+        code_version
+from spikepy.utils.ragged_array import RaggedArray
 
 class TaskManager(object):
     '''
@@ -30,6 +36,8 @@ class TaskManager(object):
         self._scheduler = Scheduler()
         self._task_to_operation_index = {}
         self._operation_name_to_task_index = {}
+        # how many operations have been named after each plugin.
+        self._name_counts = defaultdict(int)
 
     @property
     def tasks(self):
@@ -37,14 +45,18 @@ class TaskManager(object):
 
     @property
     def num_tasks(self):
-        return len(self.tasks)
+        return len(self._task_to_operation_index)
+
+    def __contains__(self, task):
+        return task in self._task_to_operation_index
 
     def remove_all_tasks(self):
         self._task_to_operation_index = {}
         self._operation_name_to_task_index = {}
+        self._scheduler.reset()
 
     def remove_task(self, task):
-        if task in self._task_to_operation_index.keys():
+        if task in self._task_to_operation_index:
             operation = self._task_to_operation_index[task]
             del self._operation_name_to_task_index[operation.name]
             del self._task_to_operation_index[task]
@@ -59,21 +71,19 @@ class TaskManager(object):
             self.remove_task(task)
         return removed_tasks
 
-    def add_task(self, new_task):
+    def add_task(self, new_task, cost=None):
         # 1. make operation
         # 2. add operation into scheduler
         # 3. add task and operation to indecies
 
         # find a unique name for this operation.
         operation_name = new_task.plugin.name[:1] # TODO make shorter 
-        if operation_name in self._operation_name_to_task_index.keys():
-            operation_name += '_2'
-        while operation_name in self._operation_name_to_task_index.keys():
-            num = int(operation_name.split('_')[-1])
-            operation_name = operation_name.replace('_%d' % num, '_%d' % (num+1))
+        self._name_counts[operation_name] += 1
+        if self._name_counts[operation_name] > 1:
+            operation_name += '_%d' % self._name_counts[operation_name]
             
         operation = Operation(new_task.required_ids, new_task.provided_ids,
-                name=operation_name)
+                name=operation_name, cost=cost)
         self._scheduler.add_operation(operation)
 
         self._task_to_operation_index[new_task] = operation
@@ -81,9 +91,11 @@ class TaskManager(object):
     
     def get_ready_tasks(self):
         '''
-            Return a list of runnable tasks. 
+            Return a list of runnable tasks, those on the longest remaining
+        path through the graph first (see Scheduler.prioritize_operations).
         '''
-        potentials = self._scheduler.get_ready_operations()
+        potentials = self._scheduler.prioritize_operations(
+                self._scheduler.get_ready_operations())
 
         ready_tasks = []
         for op in potentials:
@@ -93,11 +105,59 @@ class TaskManager(object):
 
         return ready_tasks 
 
+    @property
+    def num_ready_tasks(self):
+        return self._scheduler.num_ready_operations
+
+    def get_next_ready_task(self):
+        '''
+            Return the runnable task that would come first in 
+        get_ready_tasks(), or None.  Unlike get_ready_tasks this doesn't 
+        look at every ready task, so it stays quick however many there are.
+        '''
+        operation = self._scheduler.get_next_ready_operation()
+        if operation is None:
+            return None
+        task = self._operation_name_to_task_index[operation.name]
+        if task.is_ready:
+            return task
+        ready_tasks = self.get_ready_tasks()
+        if ready_tasks:
+            return ready_tasks[0]
+        return None
+
     def get_plot_dict(self):
         return self._scheduler.get_plot_dict()
 
+    def get_plot_layout(self):
+        return self._scheduler.get_plot_layout()
+
+    def pop_plot_changes(self):
+        return self._scheduler.pop_plot_changes()
+
+    def skip_up_to_date_tasks(self):
+        '''
+            Mark as finished (without running them) all the tasks that are
+        not stale and do not depend on a stale task.  Returns the list of 
+        tasks skipped.
+        '''
+        stale_operations = [self._task_to_operation_index[task] 
+                for task in self.tasks if task.is_stale]
+        must_run = self._scheduler.find_dependents(stale_operations)
+
+        skipped_tasks = []
+        for task, operation in self._task_to_operation_index.items():
+            if operation not in must_run:
+                skipped_tasks.append(task)
+        for task in skipped_tasks:
+            operation = self._task_to_operation_index[task]
+            self._scheduler.start_operation(operation)
+            self._scheduler.finish_operation(operation)
+            self.remove_task(task)
+        return skipped_tasks
+
     def checkout_task(self, task):
-        if task not in self.tasks:
+        if task not in self:
             raise TaskError('Task not under management: %s' % 
                     str(task))
         else:
@@ -106,7 +166,7 @@ class TaskManager(object):
             return task.checkout()
 
     def complete_task(self, task, result=None):
-        if task not in self.tasks:
+        if task not in self:
             raise TaskError('Task not under management: %s' % 
                     str(task))
         else:
@@ -196,6 +256,12 @@ class Task(object):
         self.locking_keys = {}
         self._prepare_trials_for_task()
         self.trial_packing_index = {}
+        # for tasks split into blocks of time, (trim, length) of each block.
+        self.chunk_trims = None
+        # the result merged from the blocks of time so far (see merge_block).
+        self.merged_result = None
+        # change_id of each required resource when this task was checked out.
+        self.input_change_ids = {}
 
     def __str__(self):
         str_list = ['Task: plugin="%s"' % self.plugin.name]
@@ -215,6 +281,36 @@ class Task(object):
     @property
     def provided_ids(self):
         return [r.id for r in self.provides]
+
+    @property
+    def cache_key(self):
+        '''
+            Return a key that identifies the result of this task by the
+        content of everything that goes into it (plugin and its code, 
+        kwargs and the data of the required resources), or None for 
+        stochastic plugins.
+        '''
+        if self.plugin.is_stochastic:
+            return None
+        parts = [self.plugin_category, self.plugin.name, 
+                code_version(self.plugin), 
+                canonical_kwargs(self.plugin_kwargs)]
+        for trial in self.trials:
+            for resource_name in self.plugin.requires:
+                parts.append(getattr(trial, resource_name).data_hash)
+        return hash_data(parts)
+
+    @property
+    def data_size(self):
+        '''
+            The number of raw samples (over all channels) in this task's
+        trials, used to estimate how long the task will take.
+        '''
+        result = 0
+        for trial in self.trials:
+            raw_traces = getattr(trial, 'raw_traces', None)
+            result += getattr(raw_traces, 'size', 0)
+        return result
         
     @property
     def requires(self):
@@ -270,8 +366,34 @@ class Task(object):
             pu = [(trial.trial_id, rname) for trial in self.trials]
             u.append(pu)
         return_dict['using'] = u
+        return_dict['inputs'] = dict(self.input_change_ids)
         return return_dict
 
+    def _input_resources(self):
+        '''Return a dictionary of the required resources, keyed on 
+        (trial_id, resource_name).'''
+        result = {}
+        for trial in self.trials:
+            for rname in self.plugin.requires:
+                result[(trial.trial_id, rname)] = getattr(trial, rname)
+        return result
+
+    @property
+    def is_stale(self):
+        '''
+            Return True if this task's results are missing or out of date,
+        that is, if any resource it provides was not last computed by this
+        plugin with these kwargs from the current versions of its inputs.
+        '''
+        input_resources = self._input_resources()
+        for trial in self.trials:
+            for pname in self.plugin.provides:
+                resource = getattr(trial, pname)
+                if not resource.is_up_to_date(self.plugin.name, 
+                        self.plugin_kwargs, input_resources):
+                    return True
+        return False
+
     @property
     def is_ready(self):
         '''
@@ -309,6 +431,9 @@ class Task(object):
                         if unpool_as is not None:
                             presult = self._unpack_pooled_resource(unpool_as, 
                                     presult)
+                else:
+                    # so a later pooling plugin is handed them for free.
+                    presult = pooled_arena.gather(presult)
             else:
                 presult = [presult for t in self.trials]
 
@@ -333,6 +458,8 @@ class Task(object):
                 'name':self.plugin.name}
         run_info['args'] = self._get_args()
         run_info['kwargs'] = self.plugin_kwargs
+        self.input_change_ids = dict([(key, resource.change_id) for 
+                key, resource in self._input_resources().items()])
 
         # check out and keep track of locking keys for what task provides.
         for item in self.provides:
@@ -340,6 +467,177 @@ class Task(object):
             self.locking_keys[item] = co['locking_key']
         return run_info
 
+    @property
+    def is_shardable(self):
+        '''
+            Return True if this task's plugin can be run on groups of channels
+        independently (see SpikepyMethod.is_channel_parallel).
+        '''
+        return (getattr(self.plugin, 'is_channel_parallel', False) and
+                not self.plugin.is_pooling and
+                bool(self.plugin.sharded_requires))
+
+    @property
+    def is_chunkable(self):
+        '''
+            Return True if this task's plugin can be run on overlapping
+        blocks of time (see SpikepyMethod.is_time_chunkable).
+        '''
+        return (getattr(self.plugin, 'is_time_chunkable', False) and
+                not self.plugin.is_pooling and
+                bool(self.plugin.sharded_requires))
+
+    def _sharded_shape(self, run_info):
+        resource_name = self.plugin.sharded_requires[0]
+        arg = run_info['args'][self.plugin.requires.index(resource_name)]
+        return getattr(arg, 'shape', ())
+
+    def num_channels(self, run_info):
+        '''
+            Return the number of channels in the sharded arguments of
+        <run_info> (as returned by checkout), or None if they are not
+        multi-channel.
+        '''
+        shape = self._sharded_shape(run_info)
+        if len(shape) < 2:
+            return None
+        return shape[0]
+
+    def num_samples(self, run_info):
+        '''
+            Return the number of samples (per channel) in the sharded 
+        arguments of <run_info>, or None if they are not multi-channel.
+        '''
+        shape = self._sharded_shape(run_info)
+        if len(shape) < 2:
+            return None
+        return shape[1]
+
+    def chunk(self, run_info, block_size):
+        '''
+            Split <run_info> (as returned by checkout) into run_infos that 
+        each cover <block_size> samples of the plugin's sharded_requires,
+        plus the overlap the plugin needs on either side.
+        '''
+        args = run_info['args']
+        kwargs = run_info['kwargs']
+        overlap = self.plugin.chunk_overlap(*args, **kwargs)
+        if overlap is None:
+            self.chunk_trims = None
+            return [run_info]
+        alignment = self.plugin.chunk_alignment(*args, **kwargs)
+        # round up to whole multiples of the alignment.
+        block_size = -(-max(block_size, 1)//alignment)*alignment
+        overlap = -(-overlap//alignment)*alignment
+
+        num_samples = self.num_samples(run_info)
+        sharded_indexes = [self.plugin.requires.index(rname)
+                for rname in self.plugin.sharded_requires]
+
+        chunks = []
+        self.chunk_trims = []
+        self.merged_result = None
+        for begin in xrange(0, num_samples, block_size):
+            end = min(num_samples, begin+block_size)
+            padded_begin = max(0, begin-overlap)
+            padded_end = min(num_samples, end+overlap)
+            chunk_args = list(args)
+            for i in sharded_indexes:
+                chunk_args[i] = shared_arrays.take_columns(chunk_args[i],
+                        padded_begin, padded_end)
+            chunk_info = dict(run_info)
+            chunk_info['args'] = chunk_args
+            chunk_info['shard'] = len(chunks)
+            chunks.append(chunk_info)
+            self.chunk_trims.append((begin-padded_begin, end-begin))
+        return chunks
+
+    def shard(self, run_info, num_shards):
+        '''
+            Split <run_info> (as returned by checkout) into <num_shards>
+        run_infos, each with a contiguous group of the channels in the
+        plugin's sharded_requires.  Arguments may be arrays or SharedArrays.
+        '''
+        num_channels = self.num_channels(run_info)
+        num_shards = max(1, min(num_shards, num_channels))
+        self.chunk_trims = None
+        bounds = numpy.array_split(numpy.arange(num_channels), num_shards)
+        sharded_indexes = [self.plugin.requires.index(rname)
+                for rname in self.plugin.sharded_requires]
+
+        shards = []
+        for shard_index, channels in enumerate(bounds):
+            begin, end = channels[0], channels[-1]+1
+            args = list(run_info['args'])
+            for i in sharded_indexes:
+                args[i] = shared_arrays.take_rows(args[i], begin, end)
+            shard_info = dict(run_info)
+            shard_info['args'] = args
+            shard_info['shard'] = shard_index
+            shards.append(shard_info)
+        return shards
+
+    def merge_shards(self, shard_results):
+        '''
+            Combine the results of running the shards (in shard order, as
+        made by shard or chunk) into the result the plugin would have 
+        returned for the whole trial.
+        '''
+        if self.chunk_trims is not None:
+            self.merged_result = None
+            for index, shard_result in enumerate(shard_results):
+                self.merge_block(index, shard_result)
+            return self.merged_result
+
+        result = []
+        for i, pname in enumerate(self.plugin.provides):
+            parts = [shard_result[i] for shard_result in shard_results]
+            if pname not in self.plugin.sharded_provides:
+                result.append(parts[0])
+            elif all(isinstance(p, numpy.ndarray) for p in parts):
+                result.append(numpy.concatenate(parts))
+            elif all(isinstance(p, RaggedArray) for p in parts):
+                result.append(RaggedArray.concatenate(parts))
+            else:
+                merged = []
+                for part in parts:
+                    merged.extend(part)
+                result.append(merged)
+        return result
+
+    def merge_block(self, index, block_result):
+        '''
+            Merge the result of block <index> (as made by chunk) into 
+        merged_result, the result the plugin would have returned for the
+        whole trial.  Its arrays are allocated when the first block arrives
+        and each block is trimmed straight into them, so blocks may arrive
+        in any order and need not be held until the last one is in.  
+        Returns the parts of <block_result> that were copied (and so may be
+        released).
+        '''
+        num_samples = sum([length for trim, length in self.chunk_trims])
+        if self.merged_result is None:
+            self.merged_result = [None for pname in self.plugin.provides]
+        begin = sum([length for trim, length in self.chunk_trims[:index]])
+        trim, length = self.chunk_trims[index]
+        copied = []
+        for i, pname in enumerate(self.plugin.provides):
+            part = block_result[i]
+            if pname not in self.plugin.sharded_provides:
+                # taken from the first block, like merge_shards does.
+                if index == 0:
+                    self.merged_result[i] = part
+                else:
+                    copied.append(part)
+                continue
+            if self.merged_result[i] is None:
+                self.merged_result[i] = trace_storage.empty(
+                        (part.shape[0], num_samples), dtype=part.dtype)
+            self.merged_result[i][:, begin:begin+length] = \
+                    part[:, trim:trim+length]
+            copied.append(part)
+        return copied
+
     def _get_args(self):
         '''Return the data we require as arguments to run.'''
         arg_list = []
@@ -362,6 +660,11 @@ class Task(object):
                 resource = getattr(trial, resource_name).data
                 result.append(resource)
             return result
+
+        resources = [getattr(trial, resource_name).data
+                for trial in self.trials]
+        if all(isinstance(resource, RaggedArray) for resource in resources):
+            return self._pack_pooled_ragged_resource(resource_name, resources)
             
         # count total length
         ndim_set = set()
@@ -404,24 +707,33 @@ class Task(object):
                 pooled_resource = numpy.array(pooled_resource)
             except ValueError: #can't be made into an array.
                 raise ValueError('Cannot perform silent_pooling on "%s" because it cannot be made into a numpy array' % resource_name)
-        elif ndim == 1:
-            pooled_resource = numpy.empty(total_len, dtype=resource.dtype)
-            for trial in self.trials:
-                resource = getattr(trial, resource_name).data
-                begin, end = self.trial_packing_index[
-                        str(trial.trial_id)+resource_name]
-                pooled_resource[begin:end] = resource
-        elif ndim >= 2:
-            pooled_shape = (total_len, ) + resource.shape[1:]
-            pooled_resource = numpy.empty(pooled_shape, 
-                    dtype=resource.dtype)
-            for trial in self.trials:
-                resource = getattr(trial, resource_name).data
-                begin, end = self.trial_packing_index[
-                        str(trial.trial_id)+resource_name]
-                pooled_resource[begin:end] = resource
+            return pooled_resource
+
+        # trials' resources that are already views of one arena are pooled
+        # for free, otherwise they are moved into a new arena so that they
+        # will be next time.
+        pooled_resource = pooled_arena.pooled_view(resources)
+        if pooled_resource is None:
+            pooled_resource, views = pooled_arena.pack(resources)
+            for trial, view in zip(self.trials, views):
+                resource = getattr(trial, resource_name)
+                if not resource.is_locked:
+                    resource.move_data(view)
         return pooled_resource
             
+    def _pack_pooled_ragged_resource(self, resource_name, resources):
+        '''
+        Pack RaggedArray resources into one, with the channels of each trial
+        one after another.
+        '''
+        begin = 0
+        self.trial_packing_index = {}
+        for trial, resource in zip(self.trials, resources):
+            self.trial_packing_index[str(trial.trial_id)+resource_name] = \
+                    [begin, begin + len(resource)]
+            begin += len(resource)
+        return RaggedArray.concatenate(resources)
+
     def _unpack_pooled_resource(self, resource_name, pooled_resource):
         results = []
         for trial in self.trials:
@@ -457,7 +769,45 @@ class Resource(object):
             raise ResourceError(pt.RESOURCE_LOCKED % self.name)
         self._change_info = {'by':'Manually', 'at':datetime.datetime.now(), 
                 'with':None, 'using':None, 'change_id':uuid.uuid4()}
-        self._data = data
+        self._set_data(data)
+
+    def move_data(self, data):
+        '''
+            Replace the data with <data>, which must be equal to it (e.g. a
+        view of a pooled arena), keeping the change information.
+        '''
+        if self._locked:
+            raise ResourceError(pt.RESOURCE_LOCKED % self.name)
+        data_hash = self._data_hash
+        self._set_data(data)
+        self._data_hash = data_hash
+
+    def _set_data(self, data):
+        # the shared segment (if any) behind the old data goes with it.
+        old_data = getattr(self, '_data', None)
+        if old_data is not data:
+            shared_arrays.release(old_data)
+        self._data = trace_storage.store(data)
+        self._data_hash = None
+        resource_spill.update(self)
+
+    def __getstate__(self):
+        # stored data is pickled as a reference to its file.
+        state = dict(self.__dict__)
+        state['_data'] = trace_storage.describe(self.data)
+        return state
+
+    def __setstate__(self, state):
+        state['_data'] = trace_storage.restore(state['_data'])
+        self.__dict__.update(state)
+        resource_spill.update(self)
+
+    @property
+    def data_hash(self):
+        '''A digest of this resource's data (computed once per change).'''
+        if self._data_hash is None:
+            self._data_hash = hash_data(self.data)
+        return self._data_hash
 
     @classmethod
     def from_dict(cls, info_dict):
@@ -484,7 +834,8 @@ class Resource(object):
             raise ResourceError(pt.RESOURCE_LOCKED % self.name)
         else:
             self._locking_key = uuid.uuid4()
-            self._locked = True
+            self._locked = True # pinned in memory until checked in.
+            resource_spill.touch(self)
             return {'name':self.name, 
                     'data':self._data, 
                     'locking_key':self._locking_key}
@@ -506,7 +857,7 @@ class Resource(object):
                 if data_dict is not None:
                     self._commit_change_info(data_dict['change_info'], 
                             preserve_provenance)
-                    self._data = data_dict['data']
+                    self._set_data(data_dict['data'])
                 self._locking_key = None
                 self._locked = False
             else:
@@ -536,8 +887,49 @@ class Resource(object):
     def is_locked(self):
         return self._locked
 
+    @property
+    def change_id(self):
+        '''The change_id of the most recent change to this resource.'''
+        if isinstance(self._change_info, list):
+            return self._change_info[-1]['change_id']
+        return self._change_info['change_id']
+
+    def is_up_to_date(self, by, with_kwargs, input_resources):
+        '''
+            Return True if this resource was computed by the plugin named 
+        <by> with <with_kwargs>, and none of the <input_resources> (a 
+        dictionary keyed like change_info['inputs']) has changed since.
+        '''
+        if not isinstance(self._change_info, list):
+            return False # never computed (or set manually).
+        changes = [i for i, ci in enumerate(self._change_info) 
+                if ci['by'] == by]
+        if not changes:
+            return False
+        index = changes[-1]
+        change_info = self._change_info[index]
+        if change_info['with'] != with_kwargs:
+            return False
+        recorded_change_ids = change_info.get('inputs', None)
+        if recorded_change_ids is None:
+            return False # from before inputs were recorded.
+
+        for key, resource in input_resources.items():
+            if resource is self:
+                # this change modified us, compare with what came before.
+                if index == 0:
+                    return False
+                previous_change = self._change_info[index-1]
+                current_change_id = previous_change['change_id']
+            else:
+                current_change_id = resource.change_id
+            if recorded_change_ids.get(key) != current_change_id:
+                return False
+        return True
+
     @property
     def data(self):
+        resource_spill.touch(self)
         return self._data
 
     @property
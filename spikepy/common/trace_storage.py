@@ -0,0 +1,136 @@
+#  Copyright (C) 2012  David Morton
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+    Disk-backed storage for the large arrays of trials (traces and stage
+results), so recordings larger than the available memory can be used.
+Stored arrays are numpy.memmaps of files in a per-session directory, and
+are registered with shared_arrays so that workers map the same file
+instead of being sent a copy.  Storage is off until enable() is called.
+'''
+import os
+import uuid
+import atexit
+import shutil
+import tempfile
+
+import numpy
+
+from spikepy.common import shared_arrays
+
+_storage_dir = None
+_threshold = 0
+
+def enable(directory=None, threshold=2**20):
+    '''
+        Store arrays of at least <threshold> bytes in a new directory made
+    under <directory> (default is the system's temporary directory).  The
+    directory is removed when the program exits.
+    '''
+    global _storage_dir, _threshold
+    _storage_dir = tempfile.mkdtemp(prefix='spikepy_traces_', dir=directory)
+    _threshold = threshold
+    atexit.register(shutil.rmtree, _storage_dir, True)
+    return _storage_dir
+
+def disable():
+    '''Stop storing new arrays (those already stored remain valid).'''
+    global _storage_dir
+    _storage_dir = None
+
+def is_enabled():
+    return _storage_dir is not None
+
+def get_storage_dir():
+    '''The directory arrays are stored in, or None if storage is off.'''
+    return _storage_dir
+
+def get_threshold():
+    '''Arrays smaller than this (in bytes) are kept in memory.'''
+    return max(_threshold, 1)
+
+def is_stored(thing):
+    '''
+        True if <thing> is an array kept in the storage directory (or a view
+    of one).
+    '''
+    if shared_arrays.get_attached(thing) is None:
+        return False
+    return _storage_dir is not None and \
+            os.path.dirname(thing.filename) == _storage_dir
+
+def empty(shape, dtype=numpy.float64):
+    '''
+        Return a new, uninitialized array, stored on disk if storage is on
+    and the array is large enough.
+    '''
+    nbytes = numpy.dtype(dtype).itemsize*int(numpy.prod(shape))
+    if _storage_dir is None or nbytes < get_threshold():
+        return numpy.empty(shape, dtype=dtype)
+    filename = os.path.join(_storage_dir, '%s.dat' % uuid.uuid4().hex)
+    segment = numpy.memmap(filename, dtype=dtype, mode='w+', shape=shape)
+    del segment
+    return shared_arrays.SharedArray(filename, dtype, shape).attach()
+
+def store(thing):
+    '''
+        Return <thing>, moved into storage if storage is on and it is a
+    large enough array.  Arrays already in storage are returned as is.
+    '''
+    if (_storage_dir is None or is_stored(thing) or
+            not shared_arrays.should_share(thing, get_threshold())):
+        return thing
+    shared_array, created = shared_arrays.share(thing,
+            directory=_storage_dir, reuse=False)
+    return shared_array.attach()
+
+def describe(thing):
+    '''
+        Return a SharedArray in place of a stored array or a block of its rows
+    (for pickling), other views of stored arrays are copied and anything
+    else is returned as is.
+    '''
+    if is_stored(thing):
+        shared_array = shared_arrays.describe_rows(thing)
+        if shared_array is None:
+            return numpy.array(thing)
+        return shared_array
+    return thing
+
+def restore(thing):
+    '''
+        The inverse of describe.  A file that is already mapped gives the
+    same array (or a view of it), so arrays shared between resources stay
+    shared.
+    '''
+    if not isinstance(thing, shared_arrays.SharedArray):
+        return thing
+    if thing.offset == 0:
+        existing = shared_arrays._attached.get(thing.filename)
+        if existing is not None and existing.shape == thing.shape:
+            return existing
+        if existing is None:
+            return thing.attach()
+
+    # a block of rows, map the whole file and take them from it.
+    row_nbytes = numpy.dtype(thing.dtype).itemsize*int(
+            numpy.prod(thing.shape[1:]))
+    existing = shared_arrays._attached.get(thing.filename)
+    if existing is None or existing.shape[1:] != thing.shape[1:]:
+        num_rows = os.path.getsize(thing.filename)//max(row_nbytes, 1)
+        existing = shared_arrays.SharedArray(thing.filename, thing.dtype,
+                (num_rows,) + thing.shape[1:]).attach()
+    begin = thing.offset//max(row_nbytes, 1)
+    return existing[begin:begin+thing.shape[0]]
@@ -13,7 +13,6 @@
 #  You should have received a copy of the GNU General Public License
 #  along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-import bisect
 from collections import defaultdict
 import copy
 import datetime
@@ -30,18 +29,23 @@ except ImportError:
     from spikepy.other.callbacks.callbacks import supports_callbacks
 
 from spikepy.common import program_text as pt
-from spikepy.utils.substring_dict import SubstringDict 
-from spikepy.utils.cluster_data import cluster_data
+from spikepy.utils.substring_dict import SubstringIndex
+from spikepy.utils.cluster_data import cluster_data, cluster_indexes
 from spikepy.common.errors import *
 from spikepy.common.task_manager import Resource
+from spikepy.common import trace_storage
+from spikepy.common.config_manager import config_manager
+from spikepy.utils import precision as sample_precision
+from spikepy.utils.time_axis import TimeAxis
 
 def zero_mean(a):
     return a - numpy.average(a)
 
-def format_traces(trace_list):
-    result = numpy.empty((len(trace_list), len(trace_list[0])), 
-            dtype=numpy.float64)
+def format_traces(trace_list, dtype=numpy.float64):
+    result = trace_storage.empty((len(trace_list), len(trace_list[0])), 
+            dtype=dtype)
     for i, trace in enumerate(trace_list):
+        # the mean is removed at full precision.
         result[i,:] = zero_mean(numpy.array(trace, dtype=numpy.float64))
     return result
 
@@ -54,17 +58,28 @@ class TrialManager(object):
     def __init__(self):
         self._trial_index = {}
         self._display_names = set()
+        # _name_index[display_name] = trial, also found by part of the name.
+        self._name_index = SubstringIndex()
+        # _marked_trials[trial_id] = trial
+        self._marked_trials = {}
+        # the next count to try when making a name unique.
+        self._name_counts = {}
 
     def mark_trial(self, name, status):
         """Mark trial with display_name=<name> according to <status>."""
         trial = self.get_trial_with_name(name)
         assert type(status) is bool
 
-        if self.marked_trials:
-            num_channels = self.marked_trials[0].num_channels
-            if trial.num_channels != num_channels and status:
+        if self._marked_trials and status:
+            # all marked trials have the same number of channels.
+            num_channels = self._marked_trials.itervalues().next().num_channels
+            if trial.num_channels != num_channels:
                 raise CannotMarkTrialError('Cannot mark a trial with %d channels, since trials with %d channels are already marked.' % (trial.num_channels, num_channels))
         trial.mark(status=status)
+        if status:
+            self._marked_trials[trial.trial_id] = trial
+        else:
+            self._marked_trials.pop(trial.trial_id, None)
         return trial.trial_id, trial.is_marked
 
     @supports_callbacks 
@@ -75,12 +90,13 @@ class TrialManager(object):
         """
         new_names = []
         for trial in trial_list:
-            if trial.trial_id in self._trial_index.keys():
+            if trial.trial_id in self._trial_index:
                 trial.reset_trial_id()
             new_name = self._get_unique_display_name(trial.display_name)
             trial.display_name = new_name
             new_names.append(new_name)
             self._trial_index[trial.trial_id] = trial
+            self._name_index[new_name] = trial
 
         for name in new_names:
             try:
@@ -91,15 +107,20 @@ class TrialManager(object):
 
     def remove_trial(self, trial):
         self._display_names.remove(trial.display_name)
+        del self._name_index[trial.display_name]
         del self._trial_index[trial.trial_id]
+        self._marked_trials.pop(trial.trial_id, None)
         return trial.trial_id
 
     def _get_unique_display_name(self, proposed_display_name):
-        count = 1
         new_display_name = proposed_display_name
-        while new_display_name in self._display_names:
-            new_display_name = '%s(%d)' % (proposed_display_name, count)
-            count += 1
+        if new_display_name in self._display_names:
+            # start after the counts already used for this name.
+            count = self._name_counts.get(proposed_display_name, 1)
+            while new_display_name in self._display_names:
+                new_display_name = '%s(%d)' % (proposed_display_name, count)
+                count += 1
+            self._name_counts[proposed_display_name] = count
         self._display_names.add(new_display_name)
         return new_display_name
 
@@ -111,20 +132,20 @@ class TrialManager(object):
         """Find trial named <old_name> and rename it to <proposed_name>."""
         trial = self.get_trial_with_name(old_name)
         self._display_names.remove(trial.display_name)
+        del self._name_index[trial.display_name]
         trial.display_name = self._get_unique_display_name(proposed_name)
+        self._name_index[trial.display_name] = trial
         return trial
 
     @property
     def marked_trials(self):
         '''Return all currently marked trials.'''
-        return [trial for trial in self._trial_index.values()
-                if trial.is_marked]
+        return self._marked_trials.values()
 
     @property
     def marked_trial_ids(self):
         """Return the trial_ids for all currently marked trials"""
-        marked_ids = [trial.trial_id for trial in self.get_marked_trials()]
-        return marked_ids
+        return self._marked_trials.keys()
 
     @property
     def trials(self):
@@ -142,20 +163,14 @@ class TrialManager(object):
             raise MissingTrialError('No trial with id "%s" found.' % 
                     str(trial_id))
 
-    @property
-    def _trial_name_index(self):
-        tni = SubstringDict()
-        for trial in self._trial_index.values():
-            tni[trial.display_name] = trial
-        return tni
-
     def get_trial_with_name(self, name):
         """
-        Find the trial with display_name=<name> and return it.
+        Find the trial with display_name=<name> (or the only trial whose 
+        name contains <name>) and return it.
         Raises MissingTrialError if trial cannot be found.
         """
         try:
-            return self._trial_name_index[name]
+            return self._name_index[name]
         except KeyError:
             raise MissingTrialError('No trial named "%s" found.' % name)
 
@@ -182,6 +197,21 @@ class Trial(object):
         self._id = uuid.uuid4() 
         self.origin = origin
         self.originates = [] # list of resources the trial originally has.
+        # _clustered_cache[name] = (change_ids of the inputs, clustered data)
+        self._clustered_cache = {}
+
+    def __getstate__(self):
+        # stored traces are pickled as a reference to their file.
+        state = dict(self.__dict__)
+        if 'raw_traces' in state:
+            state['raw_traces'] = trace_storage.describe(state['raw_traces'])
+        state['_clustered_cache'] = {}
+        return state
+
+    def __setstate__(self, state):
+        if 'raw_traces' in state:
+            state['raw_traces'] = trace_storage.restore(state['raw_traces'])
+        self.__dict__.update(state)
 
     @property
     def num_channels(self):
@@ -191,11 +221,32 @@ class Trial(object):
             return 0
 
     def get_times(self, signal, sampling_freq):
-        return numpy.arange(0, signal.shape[1], 
-                dtype=signal.dtype)/sampling_freq*1000.0
+        '''The times (in ms) of the samples in <signal>, as a TimeAxis.'''
+        return TimeAxis(0.0, sampling_freq/1000.0, signal.shape[1])
 
-    def _setup_basic_attributes(self, raw_traces, sampling_freq):
-        self.raw_traces = format_traces(raw_traces)
+    def _setup_basic_attributes(self, raw_traces, sampling_freq, 
+            precision=None):
+        '''
+            Set up the trial from <raw_traces>, kept at <precision> (see
+        spikepy.utils.precision, default is the backend's sample_precision).
+        For 'int16', raw_traces holds the samples and raw_scale the factor
+        that converts them back to the original units, pf_traces is made 
+        from them (in float32) with the scale applied.
+        '''
+        if precision is None:
+            precision = config_manager['backend']['sample_precision']
+        self.sample_precision = precision
+        traces = format_traces(raw_traces, 
+                dtype=sample_precision.working_dtype(precision))
+        if precision == 'int16':
+            samples, self.raw_scale = sample_precision.quantize(traces)
+            self.raw_traces = trace_storage.store(samples)
+            # scaled once here, so the stages never need to know raw_scale.
+            traces = sample_precision.dequantize(self.raw_traces, 
+                    self.raw_scale, out=traces)
+        else:
+            self.raw_traces = traces
+            self.raw_scale = 1.0
         self.raw_times = self.get_times(self.raw_traces, sampling_freq)
         self.sampling_freq = sampling_freq
 
@@ -203,7 +254,8 @@ class Trial(object):
         # -- main processing stage resources --
         # pf_traces is a 2D numpy array where (pre-filtering)
         #    len(pf_traces) == num_channels
-        self.add_resource(Resource('pf_traces', data=self.raw_traces))
+        # the stages work on the traces at working precision.
+        self.add_resource(Resource('pf_traces', data=traces))
         self.add_resource(Resource('pf_sampling_freq', data=self.sampling_freq))
         
         # df_traces is a 2D numpy array where (detection-filtering)
@@ -214,7 +266,7 @@ class Trial(object):
         self.add_resource(Resource('df_psd'))
         self.add_resource(Resource('df_freqs'))
 
-        # events is a list of "list of times" where 
+        # events is a RaggedArray (or a list of "list of times") where 
         #    len(event_times) == num_channels
         #    len(event_times[i]) == number of events on the ith channel
         #    events[i][j] == time of jth event on the ith channel
@@ -241,10 +293,11 @@ class Trial(object):
 
     @classmethod
     def from_raw_traces(cls, sampling_freq=None, raw_traces=None, 
-            origin=None, display_name=None):
+            origin=None, display_name=None, precision=None):
         '''Create a trial object using the raw voltage traces.'''
         result = cls(origin=origin, display_name=display_name)
-        result._setup_basic_attributes(raw_traces, sampling_freq)
+        result._setup_basic_attributes(raw_traces, sampling_freq, 
+                precision=precision)
         result.originates = [result.pf_traces, result.pf_sampling_freq]
         return result
 
@@ -283,54 +336,70 @@ class Trial(object):
             info_dict[resource.name] = resource.as_dict
         return info_dict
 
-    def _cluster_data(self, data):
-        if self.clusters.data is not None:
-            clusters = self.clusters.data
-            return cluster_data(clusters, data)
-        else:
+    def _cached(self, name, resources, compute):
+        '''
+            Return compute(), remembered until one of <resources> changes.
+        The result is shared, so it must not be modified.
+        '''
+        change_ids = tuple([resource.change_id for resource in resources])
+        cached = self._clustered_cache.get(name)
+        if cached is not None and cached[0] == change_ids:
+            return cached[1]
+        result = compute()
+        self._clustered_cache[name] = (change_ids, result)
+        return result
+
+    @property
+    def _cluster_indexes(self):
+        '''The indexes of each cluster's members (see cluster_indexes).'''
+        if self.clusters.data is None:
             raise NoClustersError('Cannot fetch clustered data, clustering not yet run.')
+        return self._cached('indexes', [self.clusters], 
+                lambda: cluster_indexes(self.clusters.data))
+
+    def _cluster_data(self, data):
+        return cluster_data(None, data, indexes=self._cluster_indexes)
         
     @property
     def clustered_features(self):
-        return self._cluster_data(self.features.data)
+        return self._cached('features', [self.clusters, self.features], 
+                lambda: self._cluster_data(self.features.data))
 
     @property
     def clustered_feature_times(self):
-        return self._cluster_data(self.feature_times.data)
+        return self._cached('feature_times', 
+                [self.clusters, self.feature_times], 
+                lambda: self._cluster_data(self.feature_times.data))
 
     @property
     def clustered_df_spike_windows(self):
-        if not hasattr(self, 'df_spike_windows') or not\
-                hasattr(self, 'df_spike_window_times'):
-            raise MissingResourceError(
-                    'Missing "df_spike_windows" or "df_spike_window_times')
-
-        spike_windows = self.df_spike_windows.data
-        spike_window_times = self.df_spike_window_times.data
-        return self._cluster_spike_windows(spike_windows, spike_window_times)
+        return self._clustered_spike_windows('df')
 
     @property
     def clustered_ef_spike_windows(self):
-        if not hasattr(self, 'ef_spike_windows') or not\
-                hasattr(self, 'ef_spike_window_times'):
-            raise MissingResourceError(
-                    'Missing "ef_spike_windows" or "ef_spike_window_times')
+        return self._clustered_spike_windows('ef')
 
-        spike_windows = self.ef_spike_windows.data
-        spike_window_times = self.ef_spike_window_times.data
-        return self._cluster_spike_windows(spike_windows, spike_window_times)
+    def _clustered_spike_windows(self, prefix):
+        windows_name = '%s_spike_windows' % prefix
+        times_name = '%s_spike_window_times' % prefix
+        if not hasattr(self, windows_name) or not hasattr(self, times_name):
+            raise MissingResourceError(
+                    'Missing "%s" or "%s"' % (windows_name, times_name))
 
-    def _cluster_spike_windows(self, spike_windows, spike_window_times):
+        windows_resource = getattr(self, windows_name)
+        times_resource = getattr(self, times_name)
         cft = self.clustered_feature_times
-        window_len = spike_windows.shape[1]
-        
+        return self._cached(windows_name, [self.clusters, self.feature_times,
+                windows_resource, times_resource], 
+                lambda: self._cluster_spike_windows(windows_resource.data,
+                        times_resource.data, cft))
+
+    def _cluster_spike_windows(self, spike_windows, spike_window_times, cft):
+        spike_windows = numpy.asarray(spike_windows)
         result = {}
         for cluster_id, feature_times in cft.items():
-            result[cluster_id] = numpy.empty((len(feature_times), window_len),
-                    dtype=spike_windows.dtype)
-            for i, feature_time in enumerate(feature_times):
-                sw_index = bisect.bisect_left(spike_window_times, feature_time)
-                result[cluster_id][i] = spike_windows[sw_index]
+            sw_indexes = numpy.searchsorted(spike_window_times, feature_times)
+            result[cluster_id] = spike_windows[sw_indexes]
         return result
 
     @property
@@ -0,0 +1,370 @@
+#  Copyright (C) 2012  David Morton
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import time
+import traceback
+import threading
+import multiprocessing
+import itertools
+import Queue
+from collections import defaultdict, deque
+
+import numpy
+
+from spikepy.common.open_data_file import open_data_file
+from spikepy.common.config_manager import config_manager
+from spikepy.common.plugin_manager import plugin_manager
+from spikepy.common.warnings import warn
+from spikepy.common import shared_arrays
+from spikepy.common.errors import *
+
+def copy_arguments(result, args):
+    '''
+        Return <result> with any arrays that are (or are views of) arrays
+    in <args> replaced by copies.
+    '''
+    if isinstance(result, (list, tuple)):
+        copied = [copy_arguments(item, args) for item in result]
+        if isinstance(result, tuple):
+            copied = tuple(copied)
+        return copied
+    if isinstance(result, numpy.ndarray):
+        for arg in args:
+            if (isinstance(arg, numpy.ndarray) and 
+                    numpy.may_share_memory(result, arg)):
+                return numpy.array(result)
+    return result
+
+def run_task(task_info):
+    '''
+        Run the plugin described by <task_info> (see Task.checkout) and
+    return a results dictionary.  If task_info has a 'shared_dir', large
+    arrays in the arguments and results travel as shared segments.  If it
+    has a 'shard' index, that is passed back so the shards can be merged.
+    If its 'backend' is 'thread' or 'inline' the arguments are the trials'
+    own arrays, so any that the plugin returns are copied (a resource
+    must not share its data with another).
+    '''
+    shared_dir = task_info.get('shared_dir', None)
+    kwargs = task_info['kwargs']
+    stage_name = task_info['plugin_info']['stage']
+    plugin_name = task_info['plugin_info']['name']
+
+    results_dict = {}
+    args = []
+    begin_time = time.time()
+    try:
+        args = shared_arrays.unpack(task_info['args'], mode='c')
+        plugin = plugin_manager.find_plugin(stage_name, plugin_name)
+        results_dict['result'] = plugin.run(*args, **kwargs)
+    except:
+        results_dict['result'] = None
+        results_dict['traceback'] = traceback.format_exc()
+        traceback.print_exc()
+    end_time = time.time()
+    if task_info.get('backend', 'process') != 'process':
+        results_dict['result'] = copy_arguments(results_dict['result'], args)
+    del args # unmap any shared arguments.
+    if shared_dir is not None:
+        results_dict['result'] = shared_arrays.pack(results_dict['result'],
+                task_info['shared_threshold'], directory=shared_dir, 
+                reuse=False)[0]
+    results_dict['task_id'] = task_info['task_id']
+    results_dict['shard'] = task_info.get('shard', None)
+    results_dict['runtime'] = end_time - begin_time
+    return results_dict
+
+def open_file(fullpath):
+    '''
+        Open the file at <fullpath>, returning (fullpath, list of things
+    created).
+    '''
+    file_interpreters = plugin_manager.file_interpreters
+    try:
+        results = open_data_file(fullpath, file_interpreters)
+    except:
+        results = []
+        traceback.print_exc()
+    return fullpath, results
+
+job_handlers = {'task':run_task,
+                'open_file':open_file,
+                'ping':lambda payload: os.getpid()}
+
+execution_backends = ['process', 'thread', 'inline']
+
+
+class JobFailure(object):
+    '''The result of a job whose handler raised an exception.'''
+    def __init__(self, job_kind, traceback_text):
+        self.job_kind = job_kind
+        self.traceback = traceback_text
+
+
+def handle_job(job_kind, payload):
+    '''Run the handler for <job_kind>, returning a JobFailure if it raises.'''
+    try:
+        return job_handlers[job_kind](payload)
+    except Exception:
+        traceback.print_exc()
+        return JobFailure(job_kind, traceback.format_exc())
+
+def pool_worker(input_queue, results_queue):
+    '''
+        Worker process of the WorkerPool.  Handles (job_kind, job_id, 
+    payload) tuples until it receives None, replying with (job_kind, 
+    job_id, result).  Plugins are loaded once, when the worker starts, and
+    stay loaded for the life of the worker.
+    '''
+    for job_kind, job_id, payload in iter(input_queue.get, None):
+        results_queue.put((job_kind, job_id, handle_job(job_kind, payload)))
+
+
+class WorkerPool(object):
+    '''
+        A pool of long-lived worker processes.  Workers are started the
+    first time the pool is used and are reused until shutdown() is called,
+    so repeated runs don't pay for process startup and plugin loading.
+        Jobs may instead be run on a pool of threads in this process, or 
+    inline (see submit), their results are returned by get_result along
+    with those of the worker processes.
+        Every job gets an id, so replies nobody is waiting for any more
+    (late pings, jobs abandoned after an error) are dropped, and results 
+    of one kind of job are kept aside while another kind is waited for.
+    '''
+    def __init__(self, num_workers=None, health_check_interval=None):
+        self._num_workers = num_workers
+        if health_check_interval is None:
+            health_check_interval = \
+                    config_manager['backend']['health_check_interval']
+        self.health_check_interval = health_check_interval
+        self._workers = []
+        self._input_queue = None
+        self._results_queue = None
+        self._threads = []
+        self._thread_queue = None
+        self._job_ids = itertools.count()
+        # _outstanding[job_id] = job_kind, of jobs not collected yet.
+        self._outstanding = {}
+        # replies received while waiting for other jobs, by job kind.
+        self._pending = defaultdict(deque)
+        # results of thread/inline jobs, only a token goes on the queue.
+        self._local_results = {}
+        # only one run_tasks may use the pool at a time.
+        self.lock = threading.RLock()
+
+    @property
+    def num_workers(self):
+        if self._num_workers is None:
+            return config_manager.get_num_workers()
+        return self._num_workers
+
+    @property
+    def is_running(self):
+        return bool(self._workers)
+
+    def start(self):
+        '''Start the worker processes (if they aren't already running).'''
+        if self.is_running:
+            return
+        self._input_queue = multiprocessing.Queue()
+        self._results_queue = multiprocessing.Queue()
+        for i in xrange(self.num_workers):
+            self._start_worker()
+
+    def _start_worker(self):
+        worker = multiprocessing.Process(target=pool_worker,
+                args=(self._input_queue, self._results_queue))
+        worker.daemon = True
+        worker.start()
+        self._workers.append(worker)
+        return worker
+
+    def check_health(self):
+        '''
+            If any workers have died, restart the pool (a worker that dies
+        while holding a queue's lock leaves that queue unusable).  Returns
+        the number of workers that had died.
+        '''
+        dead_workers = [w for w in self._workers if not w.is_alive()]
+        if dead_workers:
+            for worker in dead_workers:
+                warn('Worker process %s died (exitcode=%s), restarting pool.' %
+                        (worker.pid, worker.exitcode))
+            self._terminate()
+            self.start()
+        return len(dead_workers)
+
+    def ping(self, timeout=None):
+        '''
+            Send one ping per worker and return the set of process ids
+        that answered within <timeout> seconds.  Replies that come later 
+        are dropped.
+        '''
+        if timeout is None:
+            timeout = self.health_check_interval
+        with self.lock:
+            self.start()
+            self.check_health()
+            ping_ids = set([self.submit('ping', None) 
+                    for worker in self._workers])
+            responders = set()
+            deadline = time.time() + timeout
+            try:
+                while [i for i in ping_ids if i in self._outstanding]:
+                    job_kind, job_id, pid = self._results_queue.get(
+                            timeout=max(0.0, deadline-time.time()))
+                    if job_id in ping_ids:
+                        self._outstanding.pop(job_id, None)
+                        responders.add(pid)
+                    else:
+                        self._keep(job_kind, job_id, pid)
+            except Queue.Empty:
+                pass
+            for job_id in ping_ids:
+                self._outstanding.pop(job_id, None)
+            return responders
+
+    def submit(self, job_kind, payload, backend='process'):
+        '''
+            Put a job on the queue, starting the workers if needed, and 
+        return its id.  The <backend> is one of:
+            'process': run the job on a worker process.
+            'thread': run the job on a thread of this process, the payload
+                    is not copied.
+            'inline': run the job right now, before returning.
+        '''
+        if job_kind not in job_handlers.keys():
+            raise WorkerPoolError('Unknown job kind "%s"' % job_kind)
+        if backend not in execution_backends:
+            raise WorkerPoolError('Unknown execution backend "%s"' % backend)
+        self.start()
+        job_id = self._job_ids.next()
+        self._outstanding[job_id] = job_kind
+        if backend == 'process':
+            self._input_queue.put((job_kind, job_id, payload))
+        else:
+            job = (job_kind, job_id, payload, self._results_queue)
+            if backend == 'thread':
+                self._start_threads()
+                self._thread_queue.put(job)
+            else:
+                self._run_local_job(*job)
+        return job_id
+
+    def _run_local_job(self, job_kind, job_id, payload, results_queue):
+        # the token is always posted, or get_result would wait forever.
+        result = handle_job(job_kind, payload)
+        if job_id in self._outstanding:
+            self._local_results[job_id] = result
+        results_queue.put((job_kind, job_id, 'local'))
+
+    def _thread_worker(self):
+        for job in iter(self._thread_queue.get, None):
+            self._run_local_job(*job)
+
+    def _start_threads(self):
+        if self._threads:
+            return
+        self._thread_queue = Queue.Queue()
+        for i in xrange(self.num_workers):
+            thread = threading.Thread(target=self._thread_worker)
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+
+    def _keep(self, job_kind, job_id, result):
+        # a reply for a job that someone is still waiting for.
+        if job_id in self._outstanding:
+            self._pending[job_kind].append((job_id, result))
+        else:
+            self._local_results.pop(job_id, None)
+
+    def get_result(self, job_kind='task'):
+        '''
+            Block until a job of <job_kind> finishes and return its result.
+        Raises WorkerPoolError if a worker dies while we wait, since any
+        outstanding jobs are lost when the pool restarts, if there are no
+        jobs of <job_kind> outstanding, or if the job's handler raised an 
+        exception.
+        '''
+        while True:
+            if self._pending[job_kind]:
+                job_id, result = self._pending[job_kind].popleft()
+            elif job_kind not in self._outstanding.values():
+                raise WorkerPoolError('No "%s" jobs are outstanding, they were lost if the pool restarted.' % job_kind)
+            else:
+                try:
+                    reply = self._results_queue.get(
+                            timeout=self.health_check_interval)
+                except Queue.Empty:
+                    if self.check_health():
+                        raise WorkerPoolError('A worker process died, outstanding jobs were lost.')
+                    continue
+                if reply[0] != job_kind:
+                    self._keep(*reply)
+                    continue
+                job_id, result = reply[1:]
+                if job_id not in self._outstanding:
+                    self._local_results.pop(job_id, None)
+                    continue # stale.
+            self._outstanding.pop(job_id, None)
+            if job_id in self._local_results:
+                result = self._local_results.pop(job_id)
+            if isinstance(result, JobFailure):
+                raise WorkerPoolError('A "%s" job failed:\n%s' % 
+                        (result.job_kind, result.traceback))
+            return result
+
+    def abandon(self, job_kind=None):
+        '''
+            Stop waiting for the outstanding jobs (of <job_kind>, default
+        all kinds), their results will be dropped when they arrive.
+        '''
+        for job_id, kind in self._outstanding.items():
+            if job_kind is None or kind == job_kind:
+                del self._outstanding[job_id]
+                self._local_results.pop(job_id, None)
+                self._pending.pop(kind, None)
+
+    def shutdown(self, timeout=None):
+        '''Stop all the workers and wait for them to exit.'''
+        if timeout is None:
+            timeout = self.health_check_interval
+        with self.lock:
+            for worker in self._workers:
+                self._input_queue.put(None)
+            for worker in self._workers:
+                worker.join(timeout)
+            self._terminate()
+            for thread in self._threads:
+                self._thread_queue.put(None)
+            for thread in self._threads:
+                thread.join(timeout)
+            self._threads = []
+            self._thread_queue = None
+
+    def _terminate(self):
+        for worker in self._workers:
+            if worker.is_alive():
+                worker.terminate()
+                worker.join()
+        self._workers = []
+        self._input_queue = None
+        self._results_queue = None
+        self._local_results = {}
+        self._outstanding.clear()
+        self._pending.clear()
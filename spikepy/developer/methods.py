@@ -13,7 +13,10 @@
 #  You should have received a copy of the GNU General Public License
 #  along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import numpy
+
 from spikepy.common.valid_types import ValidType
+from spikepy.utils.streaming_filters import ChunkedStream
 from spikepy.developer.spikepy_plugin import SpikepyPlugin
 
 class SpikepyMethod(SpikepyPlugin):
@@ -40,14 +43,64 @@ class SpikepyMethod(SpikepyPlugin):
     #     Is this method stochastic in nature (generally gives different results
     # with the same inputs)?
     is_stochastic = False
+    #     If is_channel_parallel = True, this method treats every channel
+    # independently, so spikepy may split a trial's channels into groups and
+    # run the groups on separate workers.  The 'requires' resources named in
+    # sharded_requires are split along their first (channel) axis and the 
+    # 'provides' resources named in sharded_provides are put back together
+    # the same way (2D arrays are stacked, lists are concatenated).  Other 
+    # 'provides' are taken from the first group.
+    # Note: is_channel_parallel is ignored if is_pooling is True
+    is_channel_parallel = False
+    sharded_requires = []
+    sharded_provides = []
+    #     If is_time_chunkable = True, spikepy may split very long recordings 
+    # into overlapping blocks of time and run the blocks on separate workers.
+    # The sharded_requires resources are split along their second (time) 
+    # axis and the sharded_provides resources (which must be 2D arrays) are
+    # trimmed and put back together.  Methods that set this must implement 
+    # chunk_overlap (and chunk_alignment if blocks must start on a grid).
+    # Note: is_time_chunkable is ignored if is_pooling is True
+    is_time_chunkable = False
+    #     How should this method be executed?
+    #   'process': in a worker process (arguments and results are copied).
+    #   'thread': in a thread of the main process, sharing the trials' arrays
+    #           with no copies.  Only worthwhile if the method spends its time
+    #           in code that releases the GIL (most of numpy/scipy) and the
+    #           method must not modify its arguments in place.
+    #   'inline': in the main process as soon as it is ready, for methods so
+    #           quick that handing them to a worker costs more than they do.
+    # The user may override this in the configuration, though methods that
+    # leave it as 'process' are never run on threads or inline.
+    execution_backend = 'process'
 
     #     What resources does this method need in order to run?
     requires = []
     provides = [] 
 
+    # Traces may be float64 or float32 (see spikepy.utils.precision),
+    # run should return traces and features with the precision of its
+    # input, e.g. with spikepy.utils.precision.like(result, signal).
     def run(self, *args, **kwargs):
+        raise NotImplementedError
+
+    def chunk_overlap(self, *args, **kwargs):
+        '''
+            Return the number of samples of context needed on either side
+        of a block of time so that the block's result matches the result 
+        of running on the whole recording, or None if the recording should
+        not be split this time.  Takes the same arguments as run, though 
+        arrays may be SharedArray descriptors (use only their shape).
+        '''
         raise NotImplementedError 
 
+    def chunk_alignment(self, *args, **kwargs):
+        '''
+            Return the number of samples that the start of every block must
+        be a multiple of.  Takes the same arguments as chunk_overlap.
+        '''
+        return 1
+
 
 class FilteringMethod(SpikepyMethod):
     '''
@@ -75,6 +128,27 @@ class FilteringMethod(SpikepyMethod):
     #    len(<stage_name>_traces) == num_channels
     provides = ['<stage_name>_traces', '<stage_name>_sampling_freq'] 
 
+    def make_stream(self, sampling_freq, num_channels, **kwargs):
+        '''
+            Return a spikepy.utils.streaming_filters.StreamingFilter that
+        filters a recording block by block (for recordings too long to hold
+        in memory) as run would filter it whole.  Takes the same keyword
+        arguments as run.  By default, methods that are time chunkable are
+        run on overlapping blocks (see chunk_overlap), others must 
+        implement this themselves.
+        '''
+        if not self.is_time_chunkable:
+            raise NotImplementedError
+        signal = numpy.empty((num_channels, 0))
+        overlap = self.chunk_overlap(signal, sampling_freq, **kwargs)
+        if overlap is None:
+            raise NotImplementedError
+        alignment = self.chunk_alignment(signal, sampling_freq, **kwargs)
+        def function(signal):
+            return self.run(signal, sampling_freq, **kwargs)[0]
+        return ChunkedStream(function, num_channels, overlap, 
+                alignment=alignment)
+
 
 class DetectionMethod(SpikepyMethod):
     '''
@@ -97,7 +171,8 @@ class DetectionMethod(SpikepyMethod):
                correspond to resources that already exist.
     '''
     requires = ['df_traces', 'df_sampling_freq']
-    # event_times is a list of "list of indexes" where 
+    # event_times is a spikepy.utils.ragged_array.RaggedArray (or a list 
+    # of "list of times") where 
     #    len(event_times) == num_channels
     #    len(event_times[i]) == number of events on the ith channel
     #    event_times[i][j] == time of jth event on the ith channel
@@ -138,6 +138,7 @@ class Controller(object):
 
     def _close_application(self, message):
         self.session.strategy_manager.save_strategies()
+        self.session.shutdown()
         pub.unsubAll()
         self.view.frame.Show(False)
         wx.Yield()
@@ -25,6 +25,7 @@ import wx.grid as gridlib
 from spikepy.common.config_manager import config_manager as config
 from spikepy.plotting_utils.plot_panel import PlotPanel
 from spikepy.plotting_utils.plot_operations import plot_operations
+from spikepy.common.scheduler import make_plot_dict
 from spikepy.common import program_text as pt
 from spikepy.utils.wrap import wrap
 
@@ -66,6 +67,8 @@ class GraphArea(wx.Panel):
         self.end_button = end_button
         self.plot_panel = plot_panel 
         self.shown = 0
+        self._layout = None
+        # (list of state changes, time) for every step of the run.
         self._plot_data = []
         self._has_plotted = False
 
@@ -81,13 +84,25 @@ class GraphArea(wx.Panel):
     def on_end(self, event):
         self.show_data(len(self._plot_data)-1)
 
-    def add_plot_data(self, data):
-        self._plot_data.append(data)
+    def set_layout(self, layout, t):
+        '''Start showing a new graph (see Scheduler.get_plot_layout).'''
+        self._layout = layout
+        self._plot_data = [([], t)]
+        self.show_data(0)
 
-        if len(self._plot_data) == 1:
-            self.show_data(0)
-        else:
-            self.enable_navigation_buttons()
+    def add_changes(self, changes, t):
+        '''Add a step, given as a list of (node_index, state) changes.'''
+        if self._layout is None:
+            return
+        self._plot_data.append((changes, t))
+        self.enable_navigation_buttons()
+
+    def _states_at(self, i):
+        states = list(self._layout['states'])
+        for changes, t in self._plot_data[1:i+1]:
+            for node_index, state in changes:
+                states[node_index] = state
+        return states
 
     def enable_navigation_buttons(self):
         first_two = self.shown > 0
@@ -98,8 +113,8 @@ class GraphArea(wx.Panel):
         self.end_button.Enable(last_two)
 
     def show_data(self, i):
-        plot_dict, t = self._plot_data[i]
-        self.plot(plot_dict, t)
+        changes, t = self._plot_data[i]
+        self.plot(make_plot_dict(self._layout, self._states_at(i)), t)
         self.shown = i
         self.enable_navigation_buttons()
 
@@ -220,7 +235,8 @@ class ProcessProgressDialog(wx.Dialog):
             if new_message is not None:
                 statement, data = new_message
                 if statement == 'TASKS':
-                    self._num_tasks = len(data)
+                    # an up to date incremental run has no tasks at all.
+                    self._num_tasks = max(len(data), 1)
                     self._update_messages('Created %d tasks.' % len(data))
                 if statement == 'SKIPPED_TASK':
                     self._num_tasks_competed += 1
@@ -238,13 +254,21 @@ class ProcessProgressDialog(wx.Dialog):
                     self.info_text.SetLabel('An ERROR occured in a plugin!')
                 if statement == 'FINISHED_TASK':
                     self._num_tasks_competed += 1
-                    self._update_messages(
-                            'Finished %s\n    Runtime:%8.4f seconds' % 
-                            (data['task'], data['runtime']))
+                    if data.get('cached', False):
+                        self._update_messages(
+                                'Finished %s\n    (using cached result)' % 
+                                data['task'])
+                    else:
+                        self._update_messages(
+                                'Finished %s\n    Runtime:%8.4f seconds' % 
+                                (data['task'], data['runtime']))
                     self._plugin_runtime += data['runtime']
-                if statement == 'DISPLAY_GRAPH':
-                    plot_dict = data
-                    self.graph_area.add_plot_data(plot_dict)
+                if statement == 'FINISHED_RUN':
+                    self._num_tasks_competed = self._num_tasks
+                if statement == 'GRAPH_LAYOUT':
+                    self.graph_area.set_layout(*data)
+                if statement == 'GRAPH_CHANGES':
+                    self.graph_area.add_changes(*data)
 
                 progress = int((self._num_tasks_competed/
                         float(self._num_tasks))*100.0)
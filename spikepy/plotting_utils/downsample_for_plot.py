@@ -15,8 +15,6 @@
 
 import numpy
 
-import bisect
-
 def downsample_for_plot(signal, times, tmin, tmax, num_samples=2000):
     '''
         Downsamples the signal into num_samples.  For each new sample point, 
@@ -26,12 +24,14 @@ def downsample_for_plot(signal, times, tmin, tmax, num_samples=2000):
         new_signal: shape=(signal.shape[0], 2*num_chunks)
             *note* num_chunks is approximately num_samples
         new_times: The time corresponding to each point in new_signal.
+    <times> may be an array or a TimeAxis, only the times that are plotted
+    are made into an array.
     '''
     # slice down to the region of interest
-    imin = bisect.bisect_left(times, tmin)
+    imin = numpy.searchsorted(times, tmin, side='left')
     if imin > 0:
         imin -= 1 # get previous point, even if not plotted
-    imax = bisect.bisect_right(times, tmax) + 1
+    imax = numpy.searchsorted(times, tmax, side='right') + 1
 
     signal_slice = signal.T[imin:imax].T # .T is in case signal.ndim == 2
     times_slice = times[imin:imax]
@@ -39,15 +39,12 @@ def downsample_for_plot(signal, times, tmin, tmax, num_samples=2000):
     # construct new times
     slice_len = len(signal_slice.T)
     if slice_len < 2*num_samples:
-        return signal_slice, times_slice
+        return signal_slice, numpy.asarray(times_slice)
 
     chunk_size = slice_len/num_samples
-    times_list = times_slice[::chunk_size]
+    times_list = numpy.asarray(times_slice[::chunk_size])
     num_chunks = len(times_list)
-    new_times = numpy.empty(num_chunks*2, dtype=times.dtype)
-    for i in xrange(num_chunks):
-        new_times[2*i]    = times_list[i]
-        new_times[2*i+1]  = times_list[i]
+    new_times = numpy.repeat(times_list, 2)
 
     if signal.ndim == 1:
         new_signal = numpy.empty(num_chunks*2, dtype=signal.dtype)
@@ -27,10 +27,11 @@ import numpy
 
 from spikepy.common.config_manager import config_manager as config
 from spikepy.common import program_text as pt
+from spikepy.utils.time_axis import TimeAxis
 
 def create_times_array(traces, sampling_freq):
-    dt = (1.0/sampling_freq)
-    return numpy.arange(0, traces.shape[1], dtype=traces.dtype)*dt
+    '''The times (in s) of the samples in <traces>, as a TimeAxis.'''
+    return TimeAxis(0.0, sampling_freq, traces.shape[1])
 
 def is_iterable(x):
     return hasattr(x, '__len__')
@@ -27,12 +27,18 @@ except ImportError:
 
 from spikepy.common.trial_manager import TrialManager, Trial
 from spikepy.common.process_manager import ProcessManager
+from spikepy.common.worker_pool import WorkerPool
+from spikepy.common.runtime_history import RuntimeHistory
+from spikepy.common.result_cache import ResultCache
 from spikepy.common.plugin_manager import plugin_manager
 from spikepy.common.config_manager import config_manager
 from spikepy.common.strategy_manager import StrategyManager, Strategy
+from spikepy.common.sweep import ParameterSweep
 from spikepy.common import path_utils
 from spikepy.common.errors import *
 from spikepy.common import stages
+from spikepy.common import trace_storage, resource_spill
+from spikepy.utils import filter_design_cache
 
 class Session(object):
     def __init__(self, module_suffix=None):
@@ -45,12 +51,53 @@ class Session(object):
         self.strategy_manager.load_all_strategies()
         self._current_strategy = None
         self.current_strategy = self.get_default_strategy()
-        self.process_manager  = ProcessManager(self.trial_manager)
+        # before the workers start, so they store traces in the same place.
+        self._setup_storage()
+        user_config_dir = path_utils.get_data_dirs(
+                app_name='spikepy')['user']['configuration']
+        self._setup_filter_design_cache(user_config_dir)
+        self.worker_pool      = WorkerPool()
+        self.runtime_history  = RuntimeHistory(
+                os.path.join(user_config_dir, 'runtime_history.json'))
+        self.result_cache     = ResultCache(
+                os.path.join(user_config_dir, 'result_cache'),
+                config_manager['backend']['result_cache_size']*2**20)
+        self.process_manager  = ProcessManager(self.trial_manager, 
+                worker_pool=self.worker_pool,
+                runtime_history=self.runtime_history,
+                result_cache=self.result_cache)
 
         # register callback for open_files
         self.process_manager.open_files.add_callback(self._files_opened,
                 takes_target_results=True)
 
+    def _setup_storage(self):
+        '''
+            Keep traces in memory-mapped files and limit the memory used by
+        results, if so configured.
+        '''
+        backend_config = config_manager['backend']
+        directory = backend_config['trace_storage_directory'] or None
+        if (backend_config['trace_storage'] == 'memmap' and
+                not trace_storage.is_enabled()):
+            threshold = backend_config['shared_memory_threshold'] or 2**20
+            trace_storage.enable(directory=directory, threshold=threshold)
+        budget = backend_config['resource_memory_budget']
+        if budget > 0 and not resource_spill.is_enabled():
+            resource_spill.enable(budget*2**20, directory=directory)
+
+    def _setup_filter_design_cache(self, user_config_dir):
+        '''
+            Load the filter designs saved by earlier sessions (workers
+        started afterwards inherit them), and save them again at exit.
+        '''
+        max_entries = config_manager['backend']['filter_design_cache_size']
+        filter_design_cache.set_max_entries(max_entries)
+        if max_entries > 0:
+            filename = os.path.join(user_config_dir, 'filter_designs.cPickle')
+            filter_design_cache.load(filename)
+            filter_design_cache.save_at_exit(filename)
+
 
     # FILE RELATED
     def export(self, data_interpreter_name, base_path=None, **kwargs):
@@ -73,6 +120,18 @@ class Session(object):
         """Open the files located at fullpaths"""
         return self.process_manager.open_files(fullpaths)
 
+    def iter_open_files(self, fullpaths):
+        '''
+            Open the files located at fullpaths, adding the trials from each
+        file to the session as soon as that file has been opened.  Yields
+        (fullpath, trials) for every file, in the order they finish, so
+        the trials can be used before the remaining files are opened (and
+        the session can be run on them inside the loop).
+        '''
+        for fullpath, results in self.process_manager.iter_open_files(
+                fullpaths):
+            yield fullpath, self._files_opened(results)
+
     def save(self, filename, gzipped=True):
         """Save this session."""
         if not filename.endswith('.ses'):
@@ -210,7 +269,7 @@ class Session(object):
 
     def run(self, stage_name=None, strategy=None,  
             message_queue=multiprocessing.Queue(),
-            async=False):
+            async=False, incremental=False):
         '''
             Run the given strategy (defaults to current_strategy), or a stage 
         from that strategy.  Results are placed into the appropriate 
@@ -222,6 +281,9 @@ class Session(object):
             message_queue: If passed, will be populated with run messages.
             async: If True, processing will run in a separate thread.  This 
                     thread can be joined with session.join_run()
+            incremental: If True, only tasks whose inputs or settings have
+                    changed since they last ran (and the tasks that depend 
+                    on them) will be run.
         '''
         if strategy is None or not isinstance(strategy, Strategy):
             strategy = self.current_strategy 
@@ -231,7 +293,44 @@ class Session(object):
             raise NoCurrentStrategyError("You must supply a strategy or set the session's current strategy.")
             
         self.process_manager.prepare_to_run_strategy(strategy, 
-                stage_name=stage_name)
+                stage_name=stage_name, incremental=incremental)
+
+        self._run_thread = threading.Thread(
+                target=self.process_manager.run_tasks,
+                kwargs={'message_queue':message_queue})
+        self._run_thread.start()
+        if not async:
+            self._run_thread.join()
+
+    def run_sweep(self, parameter_grid, strategy=None,
+            message_queue=multiprocessing.Queue(), async=False):
+        '''
+            Run every combination of the settings in <parameter_grid> over
+        the marked trials.  Work common to several combinations is only done
+        once.  The trials themselves are left untouched, results are found
+        on the returned sweep (see ParameterSweep.variants and 
+        ParameterSweep.results_table).
+        Inputs:
+            parameter_grid: A dictionary keyed on (stage_name, setting_name)
+                    (or (auxiliary_plugin_name, setting_name)) with lists of
+                    values to try.
+            strategy: A Strategy object that the combinations are based on.
+                    If not passed, session.current_strategy will be used.
+            message_queue: If passed, will be populated with run messages.
+            async: If True, processing will run in a separate thread.  This 
+                    thread can be joined with session.join_run()
+        Returns:
+            sweep: A ParameterSweep object.
+        '''
+        if strategy is None or not isinstance(strategy, Strategy):
+            strategy = self.current_strategy 
+
+        # if still none, then abort run.
+        if strategy is None:
+            raise NoCurrentStrategyError("You must supply a strategy or set the session's current strategy.")
+
+        sweep = ParameterSweep(self.marked_trials, strategy, parameter_grid)
+        self.process_manager.prepare_to_run_sweep(sweep)
 
         self._run_thread = threading.Thread(
                 target=self.process_manager.run_tasks,
@@ -239,6 +338,12 @@ class Session(object):
         self._run_thread.start()
         if not async:
             self._run_thread.join()
+        return sweep
+
+    def shutdown(self):
+        """Wait for any run to finish, then stop the worker processes."""
+        self.join_run()
+        self.worker_pool.shutdown()
 
     def get_default_strategy(self):
         methods_used = {}
@@ -290,6 +395,7 @@ class Session(object):
                     pass
                 self.current_strategy = result
         self.trial_manager.add_trials(trials)
+        return trials
 
 
             
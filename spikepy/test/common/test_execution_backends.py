@@ -0,0 +1,126 @@
+#  Copyright (C) 2012  David Morton
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import os
+import shutil
+import unittest
+import Queue
+
+import numpy
+
+from spikepy.common import trace_storage
+from spikepy.common.config_manager import config_manager
+from spikepy.common.plugin_manager import plugin_manager
+from spikepy.common.process_manager import ProcessManager
+from spikepy.common.task_manager import TaskManager, Task, RootTask
+from spikepy.common.trial_manager import Trial, Resource
+from spikepy.common.worker_pool import WorkerPool, run_task
+
+class FauxPlugin(object):
+    '''Returns its input as is (like NoFiltering) or scaled.'''
+    requires = ['pf_traces']
+    provides = ['df_traces']
+    is_stochastic = False
+    is_pooling = False
+    silent_pooling = False
+    unpool_as = None
+    is_channel_parallel = False
+    is_time_chunkable = False
+
+    def __init__(self, name, execution_backend, factor=None):
+        self.name = name
+        self.execution_backend = execution_backend
+        self.factor = factor
+
+    def run(self, signal, **kwargs):
+        if self.factor is None:
+            return [signal]
+        return [signal*self.factor]
+
+class FauxTrialManager(object):
+    def __init__(self, trials):
+        self.marked_trials = trials
+
+class ExecutionBackendTests(unittest.TestCase):
+    def setUp(self):
+        self.plugins = {}
+        self.find_plugin = plugin_manager.find_plugin
+        plugin_manager.find_plugin = lambda stage, name: self.plugins[name]
+        self.backend = config_manager['backend']['execution_backend']
+
+    def tearDown(self):
+        plugin_manager.find_plugin = self.find_plugin
+        config_manager['backend']['execution_backend'] = self.backend
+
+    def test_override(self):
+        '''Only plugins that run outside of processes can be moved there.'''
+        process_plugin = FauxPlugin('p', 'process')
+        thread_plugin = FauxPlugin('t', 'thread')
+        config_manager['backend']['execution_backend'] = 'plugin'
+        self.assertEqual(config_manager.get_execution_backend(
+                thread_plugin), 'thread')
+        for backend in ['process', 'thread', 'inline']:
+            config_manager['backend']['execution_backend'] = backend
+            self.assertEqual(config_manager.get_execution_backend(
+                    process_plugin), 'process')
+            self.assertEqual(config_manager.get_execution_backend(
+                    thread_plugin), backend)
+
+    def test_returned_arguments_copied(self):
+        '''Thread and inline jobs never return their arguments.'''
+        self.plugins['p'] = FauxPlugin('p', 'inline')
+        signal = numpy.arange(10.0)
+        task_info = {'task_id':1, 'args':[signal], 'kwargs':{},
+                'plugin_info':{'stage':'filtering', 'name':'p'}}
+        for backend in ['thread', 'inline']:
+            task_info['backend'] = backend
+            result = run_task(task_info)['result'][0]
+            self.assertFalse(numpy.may_share_memory(result, signal))
+            self.assertTrue(numpy.array_equal(result, signal))
+
+    def test_stored_traces_kept(self):
+        '''Replacing the result of an inline plugin keeps its input stored.'''
+        directory = trace_storage.enable(threshold=1024)
+        worker_pool = WorkerPool(num_workers=1)
+        try:
+            self.plugins['none'] = FauxPlugin('none', 'inline')
+            self.plugins['double'] = FauxPlugin('double', 'thread', 2)
+            trial = Trial()
+            trial.add_resource(Resource('pf_traces', 
+                    data=numpy.arange(4000.0).reshape(4, 1000)))
+            trial.originates = [trial.pf_traces]
+            pf_traces = trial.pf_traces.data
+            self.assertTrue(trace_storage.is_stored(pf_traces))
+
+            process_manager = ProcessManager(FauxTrialManager([trial]), 
+                    worker_pool=worker_pool)
+            for name in ['none', 'double']:
+                process_manager.task_manager = TaskManager()
+                process_manager.task_manager.add_task(Task([trial], 
+                        self.plugins[name], 'filtering'))
+                process_manager.task_manager.add_root_task(
+                        RootTask([trial]))
+                process_manager.run_tasks(Queue.Queue())
+                self.assertFalse(trial.df_traces.data is pf_traces)
+
+            self.assertTrue(trial.pf_traces.data is pf_traces)
+            self.assertTrue(trace_storage.is_stored(pf_traces))
+            self.assertTrue(os.path.exists(pf_traces.filename))
+            self.assertTrue(numpy.array_equal(trial.df_traces.data, 
+                    pf_traces*2))
+        finally:
+            worker_pool.shutdown()
+            trace_storage.disable()
+            shutil.rmtree(directory, True)
+
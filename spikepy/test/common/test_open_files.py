@@ -0,0 +1,114 @@
+#  Copyright (C) 2012  David Morton
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import threading
+import unittest
+
+from spikepy.session import Session
+from spikepy.common.process_manager import ProcessManager
+from spikepy.common.trial_manager import TrialManager, Trial
+from spikepy.common.errors import *
+
+class FauxWorkerPool(object):
+    '''Opens files in the order they were submitted, one per get_result.'''
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.queue = []
+        self.max_in_flight = 0
+        self.num_submitted = 0
+
+    def submit(self, job_kind, payload, backend='process'):
+        assert job_kind == 'open_file'
+        self.queue.append(payload)
+        self.num_submitted += 1
+        self.max_in_flight = max(self.max_in_flight, len(self.queue))
+
+    def get_result(self, job_kind='task'):
+        assert job_kind == 'open_file'
+        fullpath = self.queue.pop(0)
+        trial = Trial()
+        trial.display_name = fullpath
+        return fullpath, [trial]
+
+    def abandon(self, job_kind=None):
+        self.queue = []
+
+fullpaths = ['file_%d' % i for i in range(10)]
+
+class OpenFilesTests(unittest.TestCase):
+    def setUp(self):
+        self.pool = FauxWorkerPool()
+        self.process_manager = ProcessManager(TrialManager(), 
+                worker_pool=self.pool)
+
+    def test_streamed(self):
+        '''Each file is yielded as soon as it is opened.'''
+        opened = self.process_manager.iter_open_files(fullpaths, 
+                max_in_flight=3)
+        fullpath, results = opened.next()
+        self.assertEqual(fullpath, 'file_0')
+        self.assertEqual([t.display_name for t in results], ['file_0'])
+        # the rest have not all been sent to the workers yet.
+        self.assertEqual(self.pool.num_submitted, 3)
+
+        remaining = list(opened)
+        self.assertEqual([f for f, r in remaining], fullpaths[1:])
+        self.assertEqual(self.pool.max_in_flight, 3)
+        self.assertEqual(self.pool.queue, [])
+
+    def test_window(self):
+        '''No more than max_in_flight files are outstanding at once.'''
+        for max_in_flight in [1, 4, 20]:
+            pool = FauxWorkerPool()
+            self.process_manager.worker_pool = pool
+            list(self.process_manager.iter_open_files(fullpaths, 
+                    max_in_flight=max_in_flight))
+            self.assertEqual(pool.max_in_flight, 
+                    min(max_in_flight, len(fullpaths)))
+            self.assertEqual(pool.num_submitted, len(fullpaths))
+
+    def test_abandoned(self):
+        '''Results of files in flight are collected if the caller stops.'''
+        opened = self.process_manager.iter_open_files(fullpaths, 
+                max_in_flight=4)
+        opened.next()
+        opened.close()
+        self.assertEqual(self.pool.queue, [])
+        self.assertEqual(self.pool.num_submitted, 4)
+
+    def test_file_opened_callback(self):
+        '''open_files calls file_opened for every file as it is opened.'''
+        calls = []
+        def file_opened(fullpath, results):
+            # called before the later files are collected.
+            calls.append((fullpath, len(self.pool.queue)))
+        results = self.process_manager.open_files(fullpaths, 
+                file_opened=file_opened)
+        self.assertEqual([c[0] for c in calls], fullpaths)
+        self.assertTrue(calls[0][1] > 0)
+        self.assertEqual([t.display_name for t in results], fullpaths)
+
+    def test_session(self):
+        '''Session.iter_open_files adds each file's trials as it goes.'''
+        session = Session.__new__(Session) # without plugins, workers, etc.
+        session.trial_manager = self.process_manager.trial_manager
+        session.process_manager = self.process_manager
+        num_trials = []
+        for fullpath, trials in session.iter_open_files(fullpaths):
+            self.assertEqual([t.display_name for t in trials], [fullpath])
+            self.assertTrue(session.trial_manager.get_trial_with_name(
+                    fullpath) is trials[0])
+            num_trials.append(len(session.trial_manager.trials))
+        self.assertEqual(num_trials, range(1, len(fullpaths)+1))
+
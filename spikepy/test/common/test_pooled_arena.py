@@ -0,0 +1,96 @@
+#  Copyright (C) 2012  David Morton
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import shutil
+import cPickle
+import unittest
+
+import numpy
+
+from spikepy.common import pooled_arena, trace_storage
+from spikepy.common.task_manager import Task, Resource
+
+class FauxPlugin(object):
+    name = 'Faux Plugin'
+    requires = ['features']
+    provides = ['clusters']
+    is_stochastic = False
+    is_pooling = True
+    silent_pooling = True
+    unpool_as = ['features']
+
+class FauxTrial(object):
+    def __init__(self, trial_id, features):
+        self.trial_id = trial_id
+        self.features = Resource('features', data=features)
+        self.clusters = Resource('clusters')
+
+class PooledArenaTests(unittest.TestCase):
+    def setUp(self):
+        self.arrays = [numpy.random.randn(n, 4) for n in [5, 0, 3, 7]]
+
+    def test_pack(self):
+        arena, views = pooled_arena.pack(self.arrays)
+        self.assertEqual(arena.shape, (15, 4))
+        for view, array in zip(views, self.arrays):
+            self.assertTrue(numpy.array_equal(view, array))
+        self.assertTrue(pooled_arena.pooled_view(views) is arena)
+        middle = pooled_arena.pooled_view(views[1:3])
+        self.assertTrue(numpy.array_equal(middle, arena[5:8]))
+        self.assertTrue(numpy.may_share_memory(middle, arena))
+
+        self.assertTrue(pooled_arena.pooled_view(self.arrays) is None)
+        self.assertTrue(pooled_arena.pooled_view(views[::-1]) is None)
+        self.assertTrue(pooled_arena.pooled_view([views[0], views[3]]) 
+                is None)
+        self.assertTrue(pooled_arena.gather(views) is views)
+        self.assertTrue(pooled_arena.gather(['a', 'b']) == ['a', 'b'])
+
+    def test_pooling(self):
+        '''The first pooling moves trials' data into an arena, later ones
+        are free.'''
+        trials = [FauxTrial(i, array) for i, array in enumerate(self.arrays)]
+        task = Task(trials, FauxPlugin(), 'clustering')
+        pooled = task._get_args()[0]
+        self.assertTrue(numpy.array_equal(pooled, 
+                numpy.vstack(self.arrays)))
+        for trial, array in zip(trials, self.arrays):
+            self.assertTrue(numpy.array_equal(trial.features.data, array))
+            if len(array):
+                self.assertTrue(numpy.may_share_memory(trial.features.data,
+                        pooled))
+        self.assertTrue(task._get_args()[0] is pooled)
+
+        unpooled = task._unpack_pooled_resource('features', pooled)
+        for trial, result in zip(trials, unpooled):
+            self.assertTrue(numpy.array_equal(trial.features.data, result))
+
+    def test_stored_arena(self):
+        '''Views of a stored arena pickle by reference.'''
+        directory = trace_storage.enable(threshold=64)
+        try:
+            arena, views = pooled_arena.pack(self.arrays)
+            self.assertTrue(trace_storage.is_stored(arena))
+            resources = [Resource('features', data=view) for view in views]
+            for resource in resources:
+                self.assertTrue(resource.data is not None)
+            self.assertTrue(pooled_arena.pooled_view(
+                    [r.data for r in resources]) is arena)
+
+            copies = cPickle.loads(cPickle.dumps(resources, protocol=2))
+            self.assertTrue(pooled_arena.pooled_view(
+                    [r.data for r in copies]) is arena)
+        finally:
+            trace_storage.disable()
+            shutil.rmtree(directory, True)
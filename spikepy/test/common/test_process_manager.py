@@ -0,0 +1,201 @@
+#  Copyright (C) 2012  David Morton
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import threading
+import unittest
+import Queue
+
+import numpy
+
+from spikepy.common.config_manager import config_manager
+from spikepy.common.plugin_manager import plugin_manager
+from spikepy.common.process_manager import ProcessManager
+from spikepy.common.task_manager import TaskManager, Task, RootTask
+from spikepy.common.trial_manager import Trial, Resource
+from spikepy.common import worker_pool
+from spikepy.common.worker_pool import WorkerPool
+
+class NeighborSum(object):
+    '''Each sample becomes the sum of its neighbors (needs 1 of overlap).'''
+    name = 'Neighbor Sum'
+    requires = ['pf_traces']
+    provides = ['out', 'note']
+    sharded_requires = ['pf_traces']
+    sharded_provides = ['out']
+    is_stochastic = False
+    is_pooling = False
+    silent_pooling = False
+    unpool_as = None
+    is_channel_parallel = False
+    is_time_chunkable = True
+    execution_backend = 'thread'
+
+    def run(self, signal, **kwargs):
+        result = numpy.zeros(signal.shape)
+        result[:, 1:] += signal[:, :-1]
+        result[:, :-1] += signal[:, 1:]
+        return [result, 'note']
+
+    def chunk_overlap(self, signal, **kwargs):
+        return 1
+
+    def chunk_alignment(self, signal, **kwargs):
+        return 1
+
+
+class CountingWorkerPool(WorkerPool):
+    '''Keeps track of the most tasks that were out at once.'''
+    def __init__(self, *args, **kwargs):
+        WorkerPool.__init__(self, *args, **kwargs)
+        self.num_out = 0
+        self.max_out = 0
+        self.num_submitted = 0
+
+    def submit(self, job_kind, payload, backend='process'):
+        if job_kind == 'task':
+            self.num_out += 1
+            self.num_submitted += 1
+            self.max_out = max(self.max_out, self.num_out)
+        return WorkerPool.submit(self, job_kind, payload, backend)
+
+    def get_result(self, job_kind='task'):
+        result = WorkerPool.get_result(self, job_kind)
+        if job_kind == 'task':
+            self.num_out -= 1
+        return result
+
+
+class FauxTrialManager(object):
+    def __init__(self, trials):
+        self.marked_trials = trials
+
+def prepare_tasks(process_manager, plugin, trial, incremental=False):
+    process_manager.task_manager = TaskManager()
+    process_manager.task_manager.add_task(Task([trial], plugin, 'filtering'))
+    process_manager.task_manager.add_root_task(RootTask([trial]))
+    if incremental:
+        process_manager.skipped_tasks = \
+                process_manager.task_manager.skip_up_to_date_tasks()
+    else:
+        process_manager.skipped_tasks = []
+
+def make_trial():
+    trial = Trial()
+    trial.add_resource(Resource('pf_traces', data=numpy.random.randn(2, 50)))
+    trial.originates = [trial.pf_traces]
+    return trial
+
+class TimeChunkTests(unittest.TestCase):
+    def setUp(self):
+        self.plugin = NeighborSum()
+        self.find_plugin = plugin_manager.find_plugin
+        plugin_manager.find_plugin = lambda stage, name: self.plugin
+        self.chunk_size = config_manager['backend']['time_chunk_size']
+        config_manager['backend']['time_chunk_size'] = 100
+        self.worker_pool = CountingWorkerPool(num_workers=2)
+
+    def tearDown(self):
+        plugin_manager.find_plugin = self.find_plugin
+        config_manager['backend']['time_chunk_size'] = self.chunk_size
+        self.worker_pool.shutdown()
+
+    def test_blocks_in_flight(self):
+        '''Blocks go out a few at a time and are merged as they return.'''
+        trial = Trial()
+        signal = numpy.random.randn(3, 1050)
+        trial.add_resource(Resource('pf_traces', data=signal))
+        trial.originates = [trial.pf_traces]
+        process_manager = ProcessManager(FauxTrialManager([trial]),
+                worker_pool=self.worker_pool)
+        process_manager.task_manager = TaskManager()
+        process_manager.task_manager.add_task(Task([trial], self.plugin, 
+                'filtering'))
+        process_manager.task_manager.add_root_task(RootTask([trial]))
+        process_manager.run_tasks(Queue.Queue())
+
+        self.assertEqual(self.worker_pool.num_submitted, 11)
+        self.assertEqual(self.worker_pool.max_out, 2)
+        self.assertTrue(numpy.allclose(trial.out.data, 
+                self.plugin.run(signal)[0]))
+        self.assertEqual(trial.note.data, 'note')
+
+
+
+class IncrementalRunTests(unittest.TestCase):
+    def setUp(self):
+        self.plugin = NeighborSum()
+        self.find_plugin = plugin_manager.find_plugin
+        plugin_manager.find_plugin = lambda stage, name: self.plugin
+        self.worker_pool = WorkerPool(num_workers=1)
+
+    def tearDown(self):
+        plugin_manager.find_plugin = self.find_plugin
+        self.worker_pool.shutdown()
+
+    def test_up_to_date_run_finishes(self):
+        '''A run with nothing stale still reports that it finished.'''
+        trial = make_trial()
+        process_manager = ProcessManager(FauxTrialManager([trial]),
+                worker_pool=self.worker_pool)
+        prepare_tasks(process_manager, self.plugin, trial)
+        process_manager.run_tasks(Queue.Queue())
+
+        prepare_tasks(process_manager, self.plugin, trial, 
+                incremental=True)
+        self.assertEqual(process_manager.task_manager.num_tasks, 0)
+        message_queue = Queue.Queue()
+        process_manager.run_tasks(message_queue)
+        messages = []
+        while not message_queue.empty():
+            messages.append(message_queue.get())
+        self.assertEqual(messages, [('TASKS', []), ('FINISHED_RUN', None)])
+
+
+def open_nothing(fullpath):
+    return fullpath, []
+
+class OpenWhileRunningTests(unittest.TestCase):
+    def setUp(self):
+        self.plugin = NeighborSum()
+        self.find_plugin = plugin_manager.find_plugin
+        plugin_manager.find_plugin = lambda stage, name: self.plugin
+        # the workers are started after this, so they see it too.
+        self.open_file = worker_pool.job_handlers['open_file']
+        worker_pool.job_handlers['open_file'] = open_nothing
+        self.worker_pool = WorkerPool(num_workers=2)
+
+    def tearDown(self):
+        plugin_manager.find_plugin = self.find_plugin
+        worker_pool.job_handlers['open_file'] = self.open_file
+        self.worker_pool.shutdown()
+
+    def test_run_inside_loop(self):
+        '''A stage can be run while files are still being opened.'''
+        trial = make_trial()
+        process_manager = ProcessManager(FauxTrialManager([trial]),
+                worker_pool=self.worker_pool)
+        fullpaths = ['file_%d' % i for i in range(5)]
+        opened = []
+        for fullpath, results in process_manager.iter_open_files(fullpaths,
+                max_in_flight=3):
+            opened.append(fullpath)
+            # run it the way Session.run does.
+            prepare_tasks(process_manager, self.plugin, trial)
+            run_thread = threading.Thread(target=process_manager.run_tasks,
+                    kwargs={'message_queue':Queue.Queue()})
+            run_thread.start()
+            run_thread.join(10.0)
+            self.assertFalse(run_thread.is_alive())
+            self.assertEqual(trial.note.data, 'note')
+        self.assertEqual(sorted(opened), fullpaths)
@@ -85,3 +85,32 @@ class ResourceTests(unittest.TestCase):
         self.assertEqual(self.r_2.data, 'checkin_data')
         self.assertTrue('at' in self.r_2.change_info.keys())
         self.assertTrue('change_id' in self.r_2.change_info.keys())
+
+    def test_is_up_to_date(self):
+        source = Resource('source', data='source_data')
+        inputs = {('trial', 'source'):source}
+        self.assertFalse(self.r_2.is_up_to_date('plugin', {}, inputs))
+
+        def compute(resource, by, kwargs, inputs):
+            input_change_ids = dict([(key, r.change_id) 
+                    for key, r in inputs.items()])
+            co = resource.checkout()
+            resource.checkin(data_dict={'data':'computed', 
+                    'change_info':{'by':by, 'with':kwargs, 'using':[], 
+                                   'inputs':input_change_ids}},
+                    key=co['locking_key'], preserve_provenance=True)
+
+        compute(self.r_2, 'plugin', {'a':1}, inputs)
+        self.assertTrue(self.r_2.is_up_to_date('plugin', {'a':1}, inputs))
+        self.assertFalse(self.r_2.is_up_to_date('plugin', {'a':2}, inputs))
+        self.assertFalse(self.r_2.is_up_to_date('other', {'a':1}, inputs))
+
+        # a plugin that modifies the resource in place.
+        own_inputs = {('trial', 'name_2'):self.r_2}
+        compute(self.r_2, 'modifier', {}, own_inputs)
+        self.assertTrue(self.r_2.is_up_to_date('modifier', {}, own_inputs))
+        self.assertTrue(self.r_2.is_up_to_date('plugin', {'a':1}, inputs))
+
+        # changing an input makes it stale.
+        source.manually_set_data('new_source_data')
+        self.assertFalse(self.r_2.is_up_to_date('plugin', {'a':1}, inputs))
@@ -0,0 +1,85 @@
+#  Copyright (C) 2012  David Morton
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import os
+import shutil
+import unittest
+
+import numpy
+
+from spikepy.common import resource_spill
+from spikepy.common.task_manager import Resource
+
+class ResourceSpillTests(unittest.TestCase):
+    def setUp(self):
+        # room for two of the arrays.
+        self.directory = resource_spill.enable(2*8000 + 100)
+
+    def tearDown(self):
+        resource_spill.disable()
+        shutil.rmtree(self.directory, True)
+
+    def make_resources(self, num_resources):
+        return [Resource('r%d' % i, data=numpy.arange(1000.0)+i) 
+                for i in range(num_resources)]
+
+    def test_least_recently_used_spilled(self):
+        resources = self.make_resources(3)
+        self.assertTrue(resource_spill.is_spilled(resources[0]))
+        self.assertFalse(resource_spill.is_spilled(resources[1]))
+        self.assertFalse(resource_spill.is_spilled(resources[2]))
+        self.assertTrue(resource_spill.get_resident_bytes() <= 2*8000)
+
+        # using the data reads it back and spills the next oldest.
+        self.assertTrue(numpy.array_equal(resources[0].data, 
+                numpy.arange(1000.0)))
+        self.assertTrue(resource_spill.is_spilled(resources[1]))
+        self.assertEqual(len(os.listdir(self.directory)), 1)
+
+        resources[2].data # most recently used now.
+        resources[1].data
+        self.assertTrue(resource_spill.is_spilled(resources[0]))
+        self.assertFalse(resource_spill.is_spilled(resources[2]))
+
+    def test_pinned(self):
+        '''Checked out resources and data used elsewhere stay in memory.'''
+        resources = self.make_resources(2)
+        checked_out = resources[0].checkout()
+        data = resources[1].data
+        more_resources = self.make_resources(2)
+        self.assertFalse(resource_spill.is_spilled(resources[0]))
+        self.assertFalse(resource_spill.is_spilled(resources[1]))
+        self.assertTrue(resource_spill.is_spilled(more_resources[0]))
+
+        resources[0].checkin(key=checked_out['locking_key'])
+        del checked_out, data
+        more_resources[0].data
+        self.assertTrue(resource_spill.is_spilled(resources[0]))
+
+    def test_replaced_and_removed(self):
+        '''Spill files are removed with the data they hold.'''
+        resources = self.make_resources(3)
+        self.assertEqual(len(os.listdir(self.directory)), 1)
+        resources[0].manually_set_data(None)
+        self.assertFalse(resource_spill.is_spilled(resources[0]))
+        self.assertEqual(resources[0].data, None)
+        self.assertEqual(len(os.listdir(self.directory)), 0)
+
+        resources.append(Resource('r3', data=numpy.arange(1000.0)))
+        self.assertEqual(len(os.listdir(self.directory)), 1)
+        del resources[:]
+        self.assertEqual(len(os.listdir(self.directory)), 0)
+        self.assertEqual(resource_spill.get_resident_bytes(), 0)
@@ -0,0 +1,116 @@
+#  Copyright (C) 2012  David Morton
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import imp
+import shutil
+import tempfile
+import unittest
+
+import numpy
+
+from spikepy.common import result_cache
+from spikepy.common.result_cache import ResultCache, hash_data, \
+        canonical_kwargs, code_version
+
+class HashTests(unittest.TestCase):
+    def test_hash_data(self):
+        a = numpy.arange(10.0)
+        self.assertEqual(hash_data(a), hash_data(a.copy()))
+        self.assertNotEqual(hash_data(a), hash_data(a.astype(numpy.float32)))
+        self.assertNotEqual(hash_data(a), hash_data(a.reshape(2, 5)))
+        self.assertNotEqual(hash_data([a, 1]), hash_data([a, 2]))
+        self.assertEqual(hash_data({'b':1, 'a':[a]}), 
+                hash_data({'a':[a], 'b':1}))
+
+    def test_canonical_kwargs(self):
+        self.assertEqual(canonical_kwargs({'b':1, 'a':'x'}), 
+                canonical_kwargs({'a':'x', 'b':1}))
+
+    def test_code_version(self):
+        '''Editing a plugin's source or upgrading numpy changes the key.'''
+        directory = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(directory, 'faux_plugin.py')
+            def load(source, mtime):
+                with open(filename, 'w') as outfile:
+                    outfile.write(source)
+                os.utime(filename, (mtime, mtime))
+                module = imp.load_source('faux_plugin', filename)
+                return module.FauxPlugin()
+
+            source = 'class FauxPlugin(object):\n    order = %d\n'
+            version = code_version(load(source % 1, 1000))
+            self.assertEqual(version, code_version(load(source % 1, 1000)))
+            self.assertNotEqual(version, 
+                    code_version(load(source % 2, 2000)))
+
+            numpy_version = numpy.__version__
+            numpy.__version__ = '0.0'
+            try:
+                self.assertNotEqual(version, 
+                        code_version(load(source % 1, 3000)))
+            finally:
+                numpy.__version__ = numpy_version
+        finally:
+            shutil.rmtree(directory)
+
+
+class ResultCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_put_get(self):
+        cache = ResultCache(self.directory, 2**20)
+        result = [numpy.arange(10.0), 30000.0]
+        self.assertEqual(cache.get('key'), None)
+        cache.put('key', result)
+        self.assertTrue('key' in cache)
+        cached = cache.get('key')
+        self.assertTrue(numpy.array_equal(cached[0], result[0]))
+        self.assertEqual(cached[1], result[1])
+
+        # persists across instances.
+        cache = ResultCache(self.directory, 2**20)
+        self.assertTrue('key' in cache)
+
+    def test_lru_eviction(self):
+        one_kb = numpy.zeros(128)
+        cache = ResultCache(self.directory, 2500)
+        cache.put('a', one_kb)
+        cache.put('b', one_kb)
+        cache._index['a'][1] = 0.0
+        cache._index['b'][1] = 1.0
+        cache.get('a') # now 'b' is the least recently used.
+        cache.put('c', one_kb)
+        self.assertTrue('a' in cache)
+        self.assertFalse('b' in cache)
+        self.assertTrue('c' in cache)
+        self.assertTrue(cache.size <= 2500)
+        self.assertFalse(os.path.exists(cache._fullpath('b')))
+
+        # results bigger than the cache are not kept.
+        cache.put('d', numpy.zeros(1000))
+        self.assertFalse('d' in cache)
+
+    def test_disabled(self):
+        cache = ResultCache(os.path.join(self.directory, 'unused'), 0)
+        cache.put('key', [1])
+        self.assertEqual(cache.get('key'), None)
+        self.assertFalse(os.path.exists(os.path.join(self.directory, 
+                'unused')))
@@ -0,0 +1,53 @@
+#  Copyright (C) 2012  David Morton
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from spikepy.common.runtime_history import RuntimeHistory
+
+class RuntimeHistoryTests(unittest.TestCase):
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.fullpath = os.path.join(self.tempdir, 'runtime_history.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+
+    def test_estimate(self):
+        rh = RuntimeHistory()
+        self.assertEqual(rh.estimate('filtering', 'FIR', 1024), None)
+
+        rh.record('filtering', 'FIR', 1024, 2.0)
+        self.assertEqual(rh.estimate('filtering', 'FIR', 1024), 2.0)
+        # other sizes are scaled from the closest one known.
+        self.assertEqual(rh.estimate('filtering', 'FIR', 4096), 8.0)
+        self.assertEqual(rh.estimate('filtering', 'FIR', 512), 1.0)
+        # history is kept per stage and plugin.
+        self.assertEqual(rh.estimate('detection', 'FIR', 1024), None)
+
+        # newer runtimes are averaged in.
+        rh.record('filtering', 'FIR', 1024, 4.0)
+        self.assertEqual(rh.estimate('filtering', 'FIR', 1024), 3.0)
+
+    def test_save_and_load(self):
+        rh = RuntimeHistory(self.fullpath)
+        rh.record('clustering', 'K-means', 100, 30.0)
+        rh.save()
+
+        loaded = RuntimeHistory(self.fullpath)
+        self.assertEqual(loaded.estimate('clustering', 'K-means', 100), 30.0)
@@ -152,6 +152,17 @@ class OperationFunctionsTests(unittest.TestCase):
         self.assertEqual(output, desired_output)
         self.assertEqual(self.operations, cleared_input)
 
+    def test_clear_impossible_operations_with_xputs(self):
+        xputs = scheduler.find_xputs(self.operations)
+        output = scheduler.clear_impossible_operations(self.operations,
+                xputs=xputs)
+        self.assertEqual(output, set([self.b, self.c, self.e]))
+        # xputs now describe the remaining operations only.
+        self.assertEqual(xputs[1]['finalized_by'], set([self.d]))
+        self.assertEqual(xputs[5]['finalized_by'], set())
+        self.assertEqual(xputs[3], {'originated_by':set(), 
+                'modified_by':set(), 'finalized_by':set()})
+
     def test_find_ready_operations(self):
         fn = scheduler.find_ready_operations
         self.assertEqual(fn(self.operations), self.operations)
@@ -190,3 +201,106 @@ class OperationFunctionsTests(unittest.TestCase):
 
         
 
+    def test_find_upward_ranks(self):
+        scheduler.point_operations(self.operations)
+        self.a.cost = 1.0
+        self.b.cost = 2.0
+        self.c.cost = 3.0
+        self.d.cost = 10.0
+        ranks = scheduler.find_upward_ranks(self.operations, default_cost=0.5)
+        # e has no cost so it uses the default.
+        self.assertEqual(ranks[self.e], 0.5)
+        self.assertEqual(ranks[self.c], 3.5)
+        self.assertEqual(ranks[self.b], 5.5)
+        self.assertEqual(ranks[self.d], 10.5)
+        self.assertEqual(ranks[self.a], 11.5)
+
+        # only links within the operations given are followed.
+        ranks = scheduler.find_upward_ranks([self.a, self.b])
+        self.assertEqual(ranks[self.a], 3.0)
+
+
+class SchedulerTests(unittest.TestCase):
+    def setUp(self):
+        self.b = Operation([1], [2], 'b')
+        self.c = Operation([1], [3], 'c')
+        self.d = Operation([2], [4], 'd')
+        self.s = Scheduler()
+        for op in [self.b, self.c, self.d]:
+            self.s.add_operation(op)
+        self.s.set_root_outputs([1])
+
+    def test_prioritize_operations(self):
+        '''Ready operations heading the longest path come first.'''
+        self.b.cost = 1.0
+        self.c.cost = 5.0
+        self.d.cost = 10.0
+        ready = self.s.get_ready_operations()
+        self.assertEqual(set(ready), set([self.b, self.c]))
+        self.assertEqual(self.s.prioritize_operations(ready), 
+                [self.b, self.c])
+
+        # unknown costs are taken to be the average of the known ones.
+        self.b.cost = None
+        self.c.cost = 7.0
+        self.assertEqual(self.s.prioritize_operations(ready), 
+                [self.b, self.c])
+
+    def test_find_dependents(self):
+        self.assertEqual(self.s.find_dependents([self.b]), 
+                set([self.b, self.d]))
+        self.assertEqual(self.s.find_dependents([self.c]), set([self.c]))
+
+    def test_prioritize_without_costs(self):
+        ready = self.s.get_ready_operations()
+        prioritized = self.s.prioritize_operations(ready)
+        self.assertEqual(set(prioritized), set(ready))
+
+    def test_ready_operations_follow_progress(self):
+        '''The ready set is updated as operations start and finish.'''
+        self.b.cost = 1.0
+        self.c.cost = 5.0
+        self.d.cost = 10.0
+        self.assertEqual(self.s.num_ready_operations, 2)
+        self.assertEqual(self.s.get_next_ready_operation(), self.b)
+
+        self.s.start_operation(self.b)
+        self.assertEqual(self.s.get_ready_operations(), [self.c])
+        self.assertEqual(self.s.get_next_ready_operation(), self.c)
+
+        self.s.finish_operation(self.b)
+        self.assertEqual(set(self.s.get_ready_operations()), 
+                set([self.c, self.d]))
+        self.assertEqual(self.s.get_next_ready_operation(), self.d)
+
+        for op in [self.d, self.c]:
+            self.s.start_operation(op)
+            self.s.finish_operation(op)
+        self.assertEqual(self.s.get_next_ready_operation(), None)
+        self.assertEqual(self.s.operations, set())
+
+    def test_plot_layout_and_changes(self):
+        '''The layout is made once, after that only changes are reported.'''
+        layout = self.s.get_plot_layout()
+        self.assertEqual(sorted(layout['names']), ['Root', 'b', 'c', 'd'])
+        index = dict([(name, i) for i, name in enumerate(layout['names'])])
+        self.assertEqual(sorted(layout['links']), sorted([
+                (index['Root'], index['b']), (index['Root'], index['c']), 
+                (index['b'], index['d'])]))
+        self.assertEqual(layout['states'][index['Root']], 'finished')
+        self.assertEqual(layout['states'][index['b']], 'default')
+        self.assertEqual(self.s.pop_plot_changes(), [])
+
+        self.s.start_operation(self.b)
+        self.s.finish_operation(self.b)
+        self.s.start_operation(self.d)
+        self.assertEqual(self.s.pop_plot_changes(), [(index['b'], 'started'),
+                (index['b'], 'finished'), (index['d'], 'started')])
+        self.assertEqual(self.s.pop_plot_changes(), [])
+
+        states = self.s.get_plot_layout()['states']
+        self.assertEqual(states[index['d']], 'started')
+        plot_dict = scheduler.make_plot_dict(layout, states)
+        self.assertEqual(plot_dict['node_info']['kwargs']['facecolors'][
+                index['b']], 'black')
+        self.assertEqual(len(plot_dict['link_list']), 6)
@@ -0,0 +1,92 @@
+#  Copyright (C) 2012  David Morton
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import unittest
+
+import numpy
+
+from spikepy.common import shared_arrays
+from spikepy.common.shared_arrays import SharedArray
+
+class SharedArraysTests(unittest.TestCase):
+    def setUp(self):
+        self.big = numpy.arange(1000, dtype=numpy.float64).reshape(10, 100)
+        self.small = numpy.arange(3)
+
+    def test_pack_unpack(self):
+        '''Only large arrays are replaced with descriptors.'''
+        thing = [self.big, self.small, 'string', (self.big, 1)]
+        packed, created = shared_arrays.pack(thing, 1024)
+        self.assertTrue(isinstance(packed[0], SharedArray))
+        self.assertTrue(packed[1] is self.small)
+        self.assertEqual(packed[2], 'string')
+        self.assertTrue(isinstance(packed[3], tuple))
+        self.assertEqual(len(created), 2)
+
+        unpacked = shared_arrays.unpack(packed)
+        self.assertTrue(numpy.array_equal(unpacked[0], self.big))
+        self.assertTrue(numpy.array_equal(unpacked[3][0], self.big))
+
+        shared_arrays.release(created)
+        for shared_array in created:
+            self.assertFalse(os.path.exists(shared_array.filename))
+
+    def test_threshold_zero_disables(self):
+        packed, created = shared_arrays.pack([self.big], 0)
+        self.assertTrue(packed[0] is self.big)
+        self.assertEqual(created, [])
+
+    def test_reuse_attached(self):
+        '''Attached arrays are re-shared without creating a new segment.'''
+        packed, created = shared_arrays.pack(self.big, 1024)
+        attached = packed.attach()
+        repacked, recreated = shared_arrays.pack(attached, 1024)
+        self.assertEqual(recreated, [])
+        self.assertEqual(repacked.filename, packed.filename)
+
+        # without reuse a copy is made.
+        copied, copy_created = shared_arrays.pack(attached, 1024,
+                reuse=False)
+        self.assertEqual(len(copy_created), 1)
+        self.assertNotEqual(copied.filename, packed.filename)
+
+        shared_arrays.release(attached)
+        shared_arrays.release(copy_created)
+        self.assertFalse(os.path.exists(packed.filename))
+        # still mapped, so still usable.
+        self.assertTrue(numpy.array_equal(attached, self.big))
+
+    def test_copy_on_write(self):
+        '''Changes to a mode="c" attachment don't reach the segment.'''
+        packed, created = shared_arrays.pack(self.big, 1024)
+        private = packed.attach(mode='c')
+        private[0, 0] = -1.0
+        self.assertTrue(numpy.array_equal(packed.attach(), self.big))
+        shared_arrays.release(created)
+
+    def test_take_rows_and_columns(self):
+        '''Row and column views describe the right part of the segment.'''
+        packed, created = shared_arrays.pack(self.big, 1024)
+        rows = packed.take_rows(2, 5)
+        self.assertEqual(rows.shape, (3, 100))
+        self.assertTrue(numpy.array_equal(rows.attach(mode='c'), 
+                self.big[2:5]))
+
+        columns = rows.take_columns(10, 30).take_columns(5, 10)
+        self.assertEqual(columns.shape, (3, 5))
+        self.assertTrue(numpy.array_equal(columns.attach(mode='c'), 
+                self.big[2:5, 15:20]))
+        shared_arrays.release(created)
@@ -0,0 +1,149 @@
+#  Copyright (C) 2012  David Morton
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import unittest
+
+from spikepy.common.sweep import ParameterSweep, expand_grid
+from spikepy.common.strategy import Strategy
+from spikepy.common.task_manager import Task
+from spikepy.common.trial_manager import Trial, Resource
+from spikepy.common.errors import *
+
+class FauxPlugin(object):
+    def __init__(self, name, requires, provides):
+        self.name = name
+        self.requires = requires
+        self.provides = provides
+        self.is_stochastic = False
+        self.is_pooling = False
+        self.unpool_as = None
+        self.silent_pooling = False
+
+filter_plugin = FauxPlugin('Filter', requires=['pf_traces'],
+        provides=['df_traces'])
+detect_plugin = FauxPlugin('Detect', requires=['df_traces'],
+        provides=['events'])
+
+def make_strategy():
+    return Strategy(methods_used={'Filter':'Filter', 'Detect':'Detect'},
+            settings={'Filter':{'low':300}, 'Detect':{'threshold':4.0}})
+
+def make_trials(num_trials):
+    trials = []
+    for i in range(num_trials):
+        trial = Trial()
+        trial.display_name = 'trial_%d' % i
+        trial.add_resource(Resource('pf_traces', data=i))
+        trial.originates = [trial.pf_traces]
+        trials.append(trial)
+    return trials
+
+def build_tasks(variant):
+    tasks = []
+    for trial in variant.trials:
+        tasks.append(Task([trial], filter_plugin, 'Filter',
+                variant.strategy.settings['Filter']))
+        tasks.append(Task([trial], detect_plugin, 'Detect',
+                variant.strategy.settings['Detect']))
+    return tasks
+
+class SweepTests(unittest.TestCase):
+    def test_expand_grid(self):
+        '''Every combination of values gets its own modified strategy.'''
+        base_strategy = make_strategy()
+        grid = {('Filter', 'low'):[100, 200, 300],
+                ('Detect', 'threshold'):[3.0, 5.0]}
+        variants = expand_grid(base_strategy, grid)
+        self.assertEqual(len(variants), 6)
+        combinations = set()
+        for parameters, strategy in variants:
+            self.assertEqual(strategy.settings['Filter']['low'],
+                    parameters[('Filter', 'low')])
+            self.assertEqual(strategy.settings['Detect']['threshold'],
+                    parameters[('Detect', 'threshold')])
+            combinations.add((parameters[('Filter', 'low')],
+                    parameters[('Detect', 'threshold')]))
+        self.assertEqual(len(combinations), 6)
+        # the base strategy is not changed.
+        self.assertEqual(base_strategy.settings['Filter']['low'], 300)
+
+        self.assertRaises(SweepError, expand_grid, base_strategy,
+                {('Nonexistant', 'low'):[1, 2]})
+
+    def test_merge_tasks(self):
+        '''Tasks computed the same way in several variants are run once.'''
+        trials = make_trials(2)
+        sweep = ParameterSweep(trials, make_strategy(),
+                {('Detect', 'threshold'):[3.0, 4.0, 5.0]})
+        for variant in sweep.variants:
+            variant.tasks = build_tasks(variant)
+        tasks = sweep.merge_tasks()
+
+        self.assertEqual(sweep.num_tasks_without_sharing, 12)
+        # 2 filter tasks shared by all variants + 2 detect tasks per variant.
+        self.assertEqual(len(tasks), 8)
+
+        variant_1, variant_2 = sweep.variants[:2]
+        trial_1 = variant_1.get_trial('trial_0')
+        trial_2 = variant_2.get_trial('trial_0')
+        self.assertTrue(trial_1.pf_traces is trials[0].pf_traces)
+        self.assertTrue(trial_1.df_traces is trial_2.df_traces)
+        self.assertFalse(trial_1.events is trial_2.events)
+        self.assertFalse(trial_1.df_traces is
+                variant_1.get_trial('trial_1').df_traces)
+        # the original trials are not given any of the results.
+        self.assertFalse(hasattr(trials[0], 'df_traces'))
+        self.assertRaises(MissingTrialError, variant_1.get_trial, 
+                'nonexistant')
+
+    def test_clustered_cache(self):
+        '''Each variant trial caches clustered data for its own results.'''
+        trials = make_trials(1)
+        sweep = ParameterSweep(trials, make_strategy(),
+                {('Detect', 'threshold'):[3.0, 4.0]})
+        for variant in sweep.variants:
+            variant.tasks = build_tasks(variant)
+        sweep.merge_tasks()
+        trial_1, trial_2 = [v.get_trial('trial_0') for v in sweep.variants]
+        self.assertFalse(trial_1._clustered_cache is trial_2._clustered_cache)
+        self.assertFalse(trial_1._clustered_cache is 
+                trials[0]._clustered_cache)
+
+        for trial in [trial_1, trial_2]:
+            trial.events.manually_set_data(id(trial))
+        computed = []
+        def get(trial):
+            def compute():
+                computed.append(trial)
+                return trial.events.data
+            return trial._cached('events', [trial.events], compute)
+        for trial in [trial_1, trial_2, trial_1, trial_2]:
+            self.assertEqual(get(trial), id(trial))
+        self.assertEqual(computed, [trial_1, trial_2])
+
+    def test_results_table(self):
+        trials = make_trials(1)
+        sweep = ParameterSweep(trials, make_strategy(),
+                {('Filter', 'low'):[100, 200]})
+        for variant in sweep.variants:
+            variant.tasks = build_tasks(variant)
+            variant.get_trial('trial_0').events.manually_set_data(
+                    variant.parameters[('Filter', 'low')])
+        table = sweep.results_table('events')
+        self.assertEqual(len(table), 2)
+        for parameters, row in table:
+            self.assertEqual(row, {'trial_0':parameters[('Filter', 'low')]})
+
@@ -17,6 +17,8 @@
 import unittest
 import uuid
 
+import numpy
+
 from spikepy.common.process_manager import Task
 from spikepy.common.trial_manager import Trial, Resource
 from spikepy.common.errors import *
@@ -110,10 +112,97 @@ class TaskTests(unittest.TestCase):
         self.assertTrue(task_1.provides[1] in 
                 task_1.locking_keys.keys())
 
+    def test_shard_and_merge(self):
+        '''Sharded tasks split channels apart and merge them back in order.'''
+        plugin = FauxPlugin(requires=['traces', 'freq'], 
+                            provides=['filtered', 'freq_out', 'events'])
+        plugin.is_channel_parallel = True
+        plugin.sharded_requires = ['traces']
+        plugin.sharded_provides = ['filtered', 'events']
+        traces = numpy.arange(50).reshape(5, 10)
 
-        
-        
-        
-        
-
+        trial = Trial()
+        trial.add_resource(Resource('traces', data=traces))
+        trial.add_resource(Resource('freq', data=1000.0))
+        task = Task([trial], plugin, 'plugin_category')
+        self.assertTrue(task.is_shardable)
+
+        run_info = task.checkout()
+        self.assertEqual(task.num_channels(run_info), 5)
+        shards = task.shard(run_info, 2)
+        self.assertEqual([s['shard'] for s in shards], [0, 1])
+        self.assertEqual([len(s['args'][0]) for s in shards], [3, 2])
+        self.assertEqual(shards[1]['args'][1], 1000.0)
+
+        shard_results = [[s['args'][0]*2, 1000.0, 
+                [[i] for i in range(len(s['args'][0]))]] for s in shards]
+        merged = task.merge_shards(shard_results)
+        self.assertTrue(numpy.array_equal(merged[0], traces*2))
+        self.assertEqual(merged[1], 1000.0)
+        self.assertEqual(merged[2], [[0], [1], [2], [0], [1]])
+
+    def test_chunk_and_merge(self):
+        '''Chunked tasks overlap blocks of time and trim them when merged.'''
+        plugin = FauxPlugin(requires=['traces', 'freq'], 
+                            provides=['filtered', 'freq_out'])
+        plugin.is_time_chunkable = True
+        plugin.sharded_requires = ['traces']
+        plugin.sharded_provides = ['filtered']
+        plugin.chunk_overlap = lambda traces, freq: 3
+        plugin.chunk_alignment = lambda traces, freq: 4
+        traces = numpy.arange(50).reshape(2, 25)
 
+        trial = Trial()
+        trial.add_resource(Resource('traces', data=traces))
+        trial.add_resource(Resource('freq', data=1000.0))
+        task = Task([trial], plugin, 'plugin_category')
+        self.assertTrue(task.is_chunkable)
+
+        run_info = task.checkout()
+        self.assertEqual(task.num_samples(run_info), 25)
+        # block size and overlap are rounded up to the alignment.
+        chunks = task.chunk(run_info, 10)
+        self.assertEqual([c['shard'] for c in chunks], [0, 1, 2])
+        self.assertEqual([c['args'][0].shape[1] for c in chunks], 
+                [16, 17, 5])
+        self.assertEqual(task.chunk_trims, [(0, 12), (4, 12), (4, 1)])
+
+        chunk_results = [[c['args'][0]*2, 1000.0] for c in chunks]
+        merged = task.merge_shards(chunk_results)
+        self.assertTrue(numpy.array_equal(merged[0], traces*2))
+        self.assertEqual(merged[1], 1000.0)
+
+        # blocks may be merged one at a time, in any order.
+        task.merged_result = None
+        for index in [2, 0, 1]:
+            copied = task.merge_block(index, chunk_results[index])
+            self.assertEqual(len(copied), 1 + (index != 0))
+        self.assertTrue(numpy.array_equal(task.merged_result[0], traces*2))
+        self.assertEqual(task.merged_result[1], 1000.0)
+
+    def test_cache_key(self):
+        '''cache_key depends on kwargs and input data, not on identity.'''
+        def make_task(data, kwargs):
+            trial = Trial()
+            trial.add_resource(Resource('ra', data=data))
+            trial.add_resource(Resource('rb', data=2))
+            return Task([trial], plugin_1, 'plugin_category', kwargs)
+
+        key = make_task(numpy.arange(5), {'a':1}).cache_key
+        self.assertEqual(key, make_task(numpy.arange(5), {'a':1}).cache_key)
+        self.assertNotEqual(key, 
+                make_task(numpy.arange(6), {'a':1}).cache_key)
+        self.assertNotEqual(key, 
+                make_task(numpy.arange(5), {'a':2}).cache_key)
+
+    def test_cache_key_code_version(self):
+        '''cache_key depends on the code of the plugin.'''
+        class OtherFauxPlugin(FauxPlugin):
+            pass
+        trial = Trial()
+        trial.add_resource(Resource('ra', data=1))
+        trial.add_resource(Resource('rb', data=2))
+        plugin = OtherFauxPlugin(requires=['ra', 'rb'], provides=['pb'])
+        plugin.name = plugin_1.name
+        self.assertNotEqual(Task([trial], plugin_1, 'c').cache_key,
+                Task([trial], plugin, 'c').cache_key)
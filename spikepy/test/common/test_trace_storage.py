@@ -0,0 +1,76 @@
+#  Copyright (C) 2012  David Morton
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import os
+import shutil
+import cPickle
+import unittest
+
+import numpy
+
+from spikepy.common import trace_storage
+from spikepy.common.shared_arrays import SharedArray
+from spikepy.common.task_manager import Resource
+
+class TraceStorageTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = trace_storage.enable(threshold=1024)
+        self.big = numpy.arange(1000, dtype=numpy.float64).reshape(10, 100)
+        self.small = numpy.arange(3)
+
+    def tearDown(self):
+        trace_storage.disable()
+        shutil.rmtree(self.directory, True)
+
+    def test_store(self):
+        '''Only large arrays are moved into files.'''
+        stored = trace_storage.store(self.big)
+        self.assertTrue(trace_storage.is_stored(stored))
+        self.assertEqual(os.path.dirname(stored.filename), self.directory)
+        self.assertTrue(numpy.array_equal(stored, self.big))
+        self.assertTrue(trace_storage.store(stored) is stored)
+
+        self.assertTrue(trace_storage.store(self.small) is self.small)
+        self.assertTrue(trace_storage.store('string') == 'string')
+        self.assertFalse(trace_storage.is_stored(self.big))
+
+        empty = trace_storage.empty((10, 100))
+        self.assertTrue(trace_storage.is_stored(empty))
+        self.assertFalse(trace_storage.is_stored(
+                trace_storage.empty((3,))))
+
+    def test_disabled(self):
+        trace_storage.disable()
+        self.assertTrue(trace_storage.store(self.big) is self.big)
+        self.assertFalse(trace_storage.is_stored(
+                trace_storage.empty((10, 100))))
+
+    def test_resource(self):
+        '''Resources keep their data in storage, and pickle by reference.'''
+        resource = Resource('traces', data=self.big)
+        self.assertTrue(trace_storage.is_stored(resource.data))
+        filename = resource.data.filename
+
+        state = resource.__getstate__()
+        self.assertTrue(isinstance(state['_data'], SharedArray))
+        self.assertTrue(len(cPickle.dumps(resource, protocol=2)) < 
+                self.big.nbytes)
+
+        other = cPickle.loads(cPickle.dumps(resource, protocol=2))
+        self.assertTrue(other.data is resource.data)
+
+        resource.manually_set_data(None)
+        self.assertFalse(os.path.exists(filename))
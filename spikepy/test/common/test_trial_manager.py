@@ -0,0 +1,139 @@
+#  Copyright (C) 2012  David Morton
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+import unittest
+
+import numpy
+
+from spikepy.common.trial_manager import TrialManager, Trial, Resource
+from spikepy.common.errors import *
+
+def make_trial(name, num_channels=1):
+    return Trial.from_raw_traces(1000.0, numpy.zeros((num_channels, 10)), 
+            display_name=name, precision='float64')
+
+class TrialManagerTests(unittest.TestCase):
+    def setUp(self):
+        self.trial_manager = TrialManager()
+        self.trials = [make_trial('trial_a'), make_trial('trial_b'), 
+                make_trial('trial_a'), make_trial('tetrode', num_channels=4)]
+        self.trial_manager.add_trials(self.trials)
+
+    def test_add_trials(self):
+        self.assertEqual([trial.display_name for trial in self.trials], 
+                ['trial_a', 'trial_b', 'trial_a(1)', 'tetrode'])
+        # the tetrode has a different number of channels, so isn't marked.
+        self.assertEqual(len(self.trial_manager.marked_trials), 3)
+        self.assertFalse(self.trials[3].is_marked)
+        self.assertEqual(set(self.trial_manager.marked_trial_ids),
+                set([trial.trial_id for trial in self.trials[:3]]))
+
+    def test_get_trial_with_name(self):
+        tm = self.trial_manager
+        self.assertTrue(tm.get_trial_with_name('trial_a') is self.trials[0])
+        self.assertTrue(tm.get_trial_with_name('(1)') is self.trials[2])
+        self.assertTrue(tm.get_trial_with_name('tet') is self.trials[3])
+        self.assertRaises(MissingTrialError, tm.get_trial_with_name, 'trial')
+
+        tm.rename_trial('tetrode', 'stereotrode')
+        self.assertTrue(tm.get_trial_with_name('stereo') is self.trials[3])
+        self.assertRaises(MissingTrialError, tm.get_trial_with_name, 'tet')
+
+    def test_mark_and_remove(self):
+        tm = self.trial_manager
+        for trial in self.trials[:3]:
+            tm.mark_trial(trial.display_name, False)
+        self.assertEqual(tm.marked_trials, [])
+        tm.mark_trial('tetrode', True)
+        self.assertRaises(CannotMarkTrialError, tm.mark_trial, 'trial_b', 
+                True)
+
+        tm.remove_trial(self.trials[3])
+        self.assertEqual(tm.marked_trials, [])
+        self.assertRaises(MissingTrialError, tm.get_trial_with_name, 
+                'tetrode')
+        tm.mark_trial('trial_b', True)
+        self.assertEqual(tm.marked_trials, [self.trials[1]])
+
+
+class SamplePrecisionTests(unittest.TestCase):
+    def setUp(self):
+        self.signal = numpy.sin(numpy.linspace(0, 100, 4000)).reshape(2, 2000)
+
+    def test_int16(self):
+        trial = Trial.from_raw_traces(1000.0, self.signal*0.001, 
+                precision='int16')
+        self.assertEqual(trial.raw_traces.dtype, numpy.int16)
+        self.assertEqual(trial.pf_traces.data.dtype, numpy.float32)
+        self.assertTrue(numpy.allclose(trial.pf_traces.data, 
+                trial.raw_traces*trial.raw_scale))
+        # traces are made zero mean when the trial is set up.
+        signal = self.signal*0.001
+        signal -= signal.mean(axis=1)[:, numpy.newaxis]
+        self.assertTrue(numpy.allclose(trial.pf_traces.data, signal, 
+                atol=trial.raw_scale))
+
+    def test_float32(self):
+        trial = Trial.from_raw_traces(1000.0, self.signal, precision='float32')
+        self.assertEqual(trial.raw_scale, 1.0)
+        self.assertTrue(trial.pf_traces.data is trial.raw_traces)
+        self.assertEqual(trial.raw_traces.dtype, numpy.float32)
+
+class ClusteredViewTests(unittest.TestCase):
+    def setUp(self):
+        self.trial = make_trial('trial')
+        self.trial.features.manually_set_data(
+                numpy.arange(10.0).reshape(5, 2))
+        self.trial.feature_times.manually_set_data(
+                numpy.array([0.1, 0.3, 0.5, 0.7, 0.9]))
+        self.trial.clusters.manually_set_data(numpy.array([0, 1, 0, -1, 1]))
+        self.trial.add_resource(Resource('df_spike_windows', 
+                data=numpy.arange(24.0).reshape(6, 4)))
+        self.trial.add_resource(Resource('df_spike_window_times', 
+                data=numpy.array([0.1, 0.2, 0.3, 0.5, 0.7, 0.9])))
+
+    def test_clustered_views(self):
+        features = self.trial.clustered_features
+        self.assertTrue(numpy.array_equal(features[1], [[2, 3], [8, 9]]))
+        times = self.trial.clustered_feature_times
+        self.assertTrue(numpy.array_equal(times['Rejected'], [0.7]))
+        windows = self.trial.clustered_df_spike_windows
+        self.assertTrue(numpy.array_equal(windows[0], 
+                numpy.arange(24.0).reshape(6, 4)[[0, 3]]))
+        self.assertTrue(numpy.array_equal(windows[1], 
+                numpy.arange(24.0).reshape(6, 4)[[2, 5]]))
+        self.assertRaises(MissingResourceError, getattr, self.trial, 
+                'clustered_ef_spike_windows')
+
+    def test_cached_until_changed(self):
+        features = self.trial.clustered_features
+        windows = self.trial.clustered_df_spike_windows
+        self.assertTrue(self.trial.clustered_features is features)
+        self.assertTrue(self.trial.clustered_df_spike_windows is windows)
+
+        self.trial.clusters.manually_set_data(numpy.array([0, 0, 0, 0, 1]))
+        self.assertFalse(self.trial.clustered_features is features)
+        self.assertEqual(len(self.trial.clustered_features[0]), 4)
+        self.assertEqual(len(self.trial.clustered_df_spike_windows[0]), 4)
+
+        self.trial.df_spike_windows.manually_set_data(
+                numpy.zeros((6, 4)))
+        self.assertFalse(self.trial.clustered_df_spike_windows[0].any())
+
+    def test_no_clusters(self):
+        self.trial.clusters.manually_set_data(None)
+        self.assertRaises(NoClustersError, getattr, self.trial, 
+                'clustered_features')
@@ -0,0 +1,169 @@
+#  Copyright (C) 2012  David Morton
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import os
+import time
+import unittest
+
+from spikepy.common import worker_pool
+from spikepy.common.worker_pool import WorkerPool
+from spikepy.common.errors import *
+
+# workers are forked, so they see handlers added here.
+worker_pool.job_handlers['echo'] = lambda payload: (os.getpid(), payload)
+worker_pool.job_handlers['die'] = lambda payload: os._exit(1)
+worker_pool.job_handlers['sleep'] = lambda payload: time.sleep(payload)
+def fail(payload):
+    raise ValueError('failed on purpose')
+worker_pool.job_handlers['fail'] = fail
+
+class WorkerPoolTests(unittest.TestCase):
+    def setUp(self):
+        self.pool = WorkerPool(num_workers=2, health_check_interval=0.2)
+
+    def tearDown(self):
+        self.pool.shutdown()
+
+    def worker_pids(self):
+        return set([w.pid for w in self.pool._workers])
+
+    def test_start(self):
+        '''Workers are started when first needed and only once.'''
+        self.assertFalse(self.pool.is_running)
+        self.pool.start()
+        self.assertTrue(self.pool.is_running)
+        workers = list(self.pool._workers)
+        self.assertEqual(len(workers), 2)
+        self.pool.start()
+        self.assertEqual(self.pool._workers, workers)
+
+    def test_ping(self):
+        '''Pings are answered by the workers with their process ids.'''
+        responders = self.pool.ping()
+        self.assertTrue(responders)
+        self.assertTrue(responders <= self.worker_pids())
+
+    def test_submit_and_get_result(self):
+        for i in range(6):
+            self.pool.submit('echo', i)
+        results = [self.pool.get_result('echo') for i in range(6)]
+        self.assertEqual(sorted([payload for pid, payload in results]), 
+                range(6))
+        for pid, payload in results:
+            self.assertTrue(pid in self.worker_pids())
+
+        self.assertRaises(WorkerPoolError, self.pool.submit, 'nonexistant', 
+                None)
+        self.assertRaises(WorkerPoolError, self.pool.submit, 'echo', None,
+                backend='nonexistant')
+
+    def test_local_backends(self):
+        '''Thread and inline jobs run in this process on the same payload.'''
+        payload = [1, 2, 3]
+        for backend in ['thread', 'inline']:
+            self.pool.submit('echo', payload, backend=backend)
+            pid, result = self.pool.get_result('echo')
+            self.assertEqual(pid, os.getpid())
+            self.assertTrue(result is payload)
+        self.assertEqual(self.pool._local_results, {})
+
+    def test_worker_dies(self):
+        '''A dead worker raises WorkerPoolError and the pool restarts.'''
+        self.pool.start()
+        old_pids = self.worker_pids()
+        self.pool.submit('echo', 'lost')
+        self.pool.submit('die', None)
+        # the echo may come back first, it is kept aside.
+        self.assertRaises(WorkerPoolError, self.pool.get_result, 'die')
+        self.assertTrue(self.pool.is_running)
+        self.assertEqual(len(self.pool._workers), 2)
+        self.assertEqual(self.pool.check_health(), 0)
+        self.assertFalse(self.worker_pids() & old_pids)
+        self.assertTrue(self.pool.ping() <= self.worker_pids())
+
+    def test_late_ping(self):
+        '''A ping answered too late doesn't get in the way of later jobs.'''
+        pool = WorkerPool(num_workers=1, health_check_interval=0.2)
+        try:
+            pool.submit('sleep', 0.5)
+            self.assertEqual(pool.ping(timeout=0.05), set())
+            pool.submit('echo', 'after')
+            # the sleep's reply is kept, the late ping's is dropped.
+            self.assertEqual(pool.get_result('echo')[1], 'after')
+            self.assertEqual(pool.get_result('sleep'), None)
+            self.assertEqual(pool._outstanding, {})
+            self.assertTrue(pool._results_queue.empty())
+        finally:
+            pool.shutdown()
+
+    def test_kinds_kept_apart(self):
+        '''Results of other kinds of jobs wait until they are asked for.'''
+        self.pool.submit('sleep', 0.0)
+        self.pool.submit('echo', 1, backend='inline')
+        self.pool.submit('echo', 2)
+        self.assertEqual(sorted([self.pool.get_result('echo')[1] 
+                for i in range(2)]), [1, 2])
+        self.assertEqual(self.pool.get_result('sleep'), None)
+
+        # abandoned jobs are dropped when they come back.
+        self.pool.submit('echo', 3)
+        self.pool.abandon('echo')
+        self.pool.submit('echo', 4, backend='thread')
+        self.assertEqual(self.pool.get_result('echo')[1], 4)
+        self.assertEqual(self.pool._outstanding, {})
+
+    def test_failed_jobs(self):
+        '''A handler that raises gives a WorkerPoolError, not a hang.'''
+        for backend in ['process', 'thread', 'inline']:
+            self.pool.submit('fail', None, backend=backend)
+            self.assertRaises(WorkerPoolError, self.pool.get_result, 'fail')
+            # the pool (and its threads) carry on.
+            self.pool.submit('echo', backend, backend=backend)
+            self.assertEqual(self.pool.get_result('echo')[1], backend)
+        self.assertEqual(len(self.pool._threads), 2)
+        for thread in self.pool._threads:
+            self.assertTrue(thread.is_alive())
+
+    def test_nothing_outstanding(self):
+        '''Waiting on a kind of job that isn't out raises, not hangs.'''
+        self.pool.start()
+        self.assertRaises(WorkerPoolError, self.pool.get_result, 'echo')
+        self.pool.submit('echo', 1)
+        self.pool.abandon('echo')
+        self.assertRaises(WorkerPoolError, self.pool.get_result, 'echo')
+
+    def test_killed_worker(self):
+        '''A worker killed from outside is noticed by check_health.'''
+        self.pool.start()
+        victim = self.pool._workers[0]
+        victim.terminate()
+        victim.join()
+        self.assertEqual(self.pool.check_health(), 1)
+        self.assertFalse(victim in self.pool._workers)
+        self.assertEqual(len(self.pool._workers), 2)
+        self.assertTrue(self.pool.ping() <= self.worker_pids())
+
+    def test_shutdown(self):
+        self.pool.submit('echo', None, backend='thread')
+        self.pool.get_result('echo')
+        workers = list(self.pool._workers)
+        self.pool.shutdown()
+        self.assertFalse(self.pool.is_running)
+        for worker in workers:
+            self.assertFalse(worker.is_alive())
+        self.assertEqual(self.pool._threads, [])
+        # the pool can be used again after shutting down.
+        self.assertTrue(self.pool.ping() <= self.worker_pids())
+        self.assertTrue(self.pool.is_running)
+
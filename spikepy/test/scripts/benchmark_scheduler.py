@@ -0,0 +1,102 @@
+#  Copyright (C) 2012  David Morton
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+    Time the Scheduler on a graph shaped like a full strategy run over
+many trials: for every trial, the six stages plus auxiliary stages that
+modify the filtered traces or just read the results.
+
+    python benchmark_scheduler.py [num_operations]
+'''
+import sys
+import time
+
+from spikepy.common.scheduler import Scheduler, Operation
+
+# (name, inputs, outputs) of the operations run on every trial.
+pipeline = [('df',  ['pf_traces'], ['df_traces']),
+            ('rdf', ['df_traces'], ['df_traces']),
+            ('psd_df', ['df_traces'], ['df_psd']),
+            ('d',   ['df_traces'], ['events']),
+            ('ef',  ['pf_traces'], ['ef_traces']),
+            ('ref', ['ef_traces'], ['ef_traces']),
+            ('psd_ef', ['ef_traces'], ['ef_psd']),
+            ('dsw', ['df_traces', 'events'], ['df_windows']),
+            ('esw', ['ef_traces', 'events'], ['ef_windows']),
+            ('e',   ['ef_traces', 'events'], ['features']),
+            ('c',   ['features'], ['clusters']),
+            ('cq',  ['features', 'clusters'], ['cluster_quality'])]
+
+def build_scheduler(num_trials):
+    scheduler = Scheduler()
+    root_outputs = []
+    for trial in xrange(num_trials):
+        for name, inputs, outputs in pipeline:
+            scheduler.add_operation(Operation(
+                    [(trial, i) for i in inputs],
+                    [(trial, o) for o in outputs],
+                    name='%s_%d' % (name, trial), cost=1.0))
+        root_outputs.append((trial, 'pf_traces'))
+    scheduler.set_root_outputs(root_outputs)
+    return scheduler
+
+def run(scheduler):
+    '''Start and finish every operation, in the order given.'''
+    num_run = 0
+    operation = scheduler.get_next_ready_operation()
+    while operation is not None:
+        scheduler.start_operation(operation)
+        scheduler.finish_operation(operation)
+        num_run += 1
+        operation = scheduler.get_next_ready_operation()
+    return num_run
+
+def run_with_lookahead(scheduler, window):
+    '''Keep <window> operations started at once, as the workers would.'''
+    num_run = 0
+    started = []
+    while True:
+        operation = scheduler.get_next_ready_operation()
+        while operation is not None and len(started) < window:
+            scheduler.start_operation(operation)
+            started.append(operation)
+            operation = scheduler.get_next_ready_operation()
+        if not started:
+            return num_run
+        scheduler.finish_operation(started.pop(0))
+        num_run += 1
+
+if __name__ == '__main__':
+    num_operations = 50000
+    if len(sys.argv) > 1:
+        num_operations = int(sys.argv[1])
+    num_trials = num_operations // len(pipeline)
+
+    for name, runner in [('one at a time', run),
+            ('8 in flight', lambda s: run_with_lookahead(s, 8))]:
+        begin = time.time()
+        scheduler = build_scheduler(num_trials)
+        added = time.time()
+        scheduler.get_ready_operations() # builds the graph.
+        built = time.time()
+        num_run = runner(scheduler)
+        finished = time.time()
+        assert num_run == num_trials*len(pipeline)
+        assert not scheduler.operations
+        print '%s: %d operations' % (name, num_run)
+        print '    add operations: %8.1f ms' % ((added-begin)*1000)
+        print '    build graph:    %8.1f ms' % ((built-added)*1000)
+        print '    schedule:       %8.1f ms (%.2f us per operation)' % (
+                (finished-built)*1000, (finished-built)*1e6/num_run)
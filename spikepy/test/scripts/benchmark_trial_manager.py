@@ -0,0 +1,60 @@
+#  Copyright (C) 2012  David Morton
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+    Time the TrialManager adding, marking and looking up many trials.
+
+    python benchmark_trial_manager.py [num_trials]
+'''
+import sys
+import time
+
+from spikepy.common.trial_manager import TrialManager, Trial
+
+def timed(name, function, num_calls):
+    begin = time.time()
+    function()
+    elapsed = time.time() - begin
+    print '    %-28s %8.1f ms (%.2f us each)' % (name, elapsed*1000, 
+            elapsed*1e6/num_calls)
+
+if __name__ == '__main__':
+    num_trials = 100000
+    if len(sys.argv) > 1:
+        num_trials = int(sys.argv[1])
+
+    trial_manager = TrialManager()
+    trials = [Trial(display_name='trial_%07d' % i) 
+            for i in xrange(num_trials)]
+    duplicates = [Trial(display_name='duplicate') 
+            for i in xrange(num_trials/10)]
+    names = [trial.display_name for trial in trials]
+
+    print '%d trials' % num_trials
+    timed('add (marked)', lambda: trial_manager.add_trials(trials), 
+            num_trials)
+    timed('add duplicate names', 
+            lambda: trial_manager.add_trials(duplicates), len(duplicates))
+    timed('marked_trials x100', 
+            lambda: [trial_manager.marked_trials for i in xrange(100)], 100)
+    timed('unmark by name', lambda: [trial_manager.mark_trial(name, False)
+            for name in names], num_trials)
+    timed('mark by name', lambda: [trial_manager.mark_trial(name, True)
+            for name in names], num_trials)
+    # 'trial_0012345' is found by the unique part '0012345'.
+    timed('find by part of name', 
+            lambda: [trial_manager.get_trial_with_name(name[6:]) 
+            for name in names[:10000]], 10000)
+    assert len(trial_manager.marked_trials) == num_trials + len(duplicates)
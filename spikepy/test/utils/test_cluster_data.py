@@ -0,0 +1,38 @@
+#  Copyright (C) 2012  David Morton
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import unittest
+
+import numpy
+from spikepy.utils.cluster_data import cluster_data, cluster_indexes
+
+class TestClusterData(unittest.TestCase):
+    def test_cluster_indexes(self):
+        indexes = cluster_indexes([2, 0, -1, 2, 0, 2])
+        self.assertEqual(sorted(indexes.keys()), [0, 2, 'Rejected'])
+        self.assertEqual(list(indexes[0]), [1, 4])
+        self.assertEqual(list(indexes[2]), [0, 3, 5])
+        self.assertEqual(list(indexes['Rejected']), [2])
+        self.assertEqual(cluster_indexes([]), {})
+
+    def test_cluster_data(self):
+        clusters = numpy.array([1, 0, 1, -1])
+        features = numpy.arange(8).reshape(4, 2)
+        result = cluster_data(clusters, features)
+        self.assertTrue(numpy.array_equal(result[1], [[0, 1], [4, 5]]))
+        self.assertTrue(numpy.array_equal(result[0], [[2, 3]]))
+        self.assertTrue(numpy.array_equal(result['Rejected'], [[6, 7]]))
+
+        times = cluster_data(clusters, [0.1, 0.2, 0.3, 0.4])
+        self.assertTrue(numpy.array_equal(times[1], [0.1, 0.3]))
@@ -0,0 +1,103 @@
+#  Copyright (C) 2012  David Morton
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy
+import scipy.signal as scisig
+from spikepy.utils import filter_design_cache
+from spikepy.builtins.methods.filtering_iir.simple_iir import make_iir_filter
+from spikepy.builtins.methods.filtering_fir.simple_fir import make_fir_filter
+
+class TestFilterDesignCache(unittest.TestCase):
+    def setUp(self):
+        self.max_entries = filter_design_cache.get_max_entries()
+        filter_design_cache.clear()
+
+    def tearDown(self):
+        filter_design_cache.set_max_entries(self.max_entries)
+        filter_design_cache.clear()
+
+    def test_hits_and_misses(self):
+        sos = make_iir_filter(30000.0, (300, 3000), scisig.butter, 3, 'band')
+        again = make_iir_filter(30000.0, (300, 3000), scisig.butter, 3, 
+                'band')
+        self.assertTrue(again is sos)
+        self.assertFalse(sos.flags.writeable)
+        other = make_iir_filter(30000.0, (300, 3000), scisig.bessel, 3, 
+                'band')
+        self.assertFalse(numpy.array_equal(other, sos))
+        kernel = make_fir_filter(30000.0, 300, 'hamming', 100, 'high')
+        self.assertTrue(make_fir_filter(30000.0, 300, 'hamming', 100, 
+                'high') is kernel)
+        self.assertEqual(filter_design_cache.get_counters(),
+                {'hits':2, 'misses':3, 'entries':3})
+
+    def test_bounded(self):
+        filter_design_cache.set_max_entries(2)
+        for order in [2, 3, 4]:
+            make_iir_filter(30000.0, 300, scisig.butter, order, 'high')
+        self.assertEqual(filter_design_cache.get_counters()['entries'], 2)
+        make_iir_filter(30000.0, 300, scisig.butter, 4, 'high')
+        make_iir_filter(30000.0, 300, scisig.butter, 2, 'high')
+        self.assertEqual(filter_design_cache.get_counters()['misses'], 4)
+
+        filter_design_cache.set_max_entries(0)
+        make_iir_filter(30000.0, 300, scisig.butter, 5, 'high')
+        self.assertEqual(filter_design_cache.get_counters()['entries'], 0)
+
+    def test_save_and_load(self):
+        directory = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(directory, 'designs.cPickle')
+            sos = make_iir_filter(30000.0, 300, scisig.butter, 4, 'high')
+            self.assertTrue(filter_design_cache.save(filename))
+            filter_design_cache.clear()
+            self.assertEqual(filter_design_cache.load(filename), 1)
+            loaded = make_iir_filter(30000.0, 300, scisig.butter, 4, 'high')
+            self.assertTrue(numpy.array_equal(loaded, sos))
+            self.assertEqual(filter_design_cache.get_counters()['hits'], 1)
+            self.assertEqual(filter_design_cache.load(
+                    os.path.join(directory, 'missing')), 0)
+
+            # designs saved by other versions are dropped, file and all.
+            version = filter_design_cache._version
+            filter_design_cache._version = lambda: 'spikepy 0.0'
+            try:
+                self.assertEqual(filter_design_cache.load(filename), 0)
+            finally:
+                filter_design_cache._version = version
+            self.assertFalse(os.path.exists(filename))
+        finally:
+            shutil.rmtree(directory)
+
+    def test_save_at_exit(self):
+        '''Each file is saved at exit once, however many sessions ask.'''
+        registered = []
+        register = filter_design_cache.atexit.register
+        filter_design_cache.atexit.register = lambda *args: \
+                registered.append(args)
+        try:
+            for i in range(3):
+                filter_design_cache.save_at_exit('designs_a')
+            filter_design_cache.save_at_exit('designs_b')
+        finally:
+            filter_design_cache.atexit.register = register
+            filter_design_cache._save_at_exit.difference_update(
+                    ['designs_a', 'designs_b'])
+        self.assertEqual(registered, [(filter_design_cache.save, 
+                'designs_a'), (filter_design_cache.save, 'designs_b')])
@@ -0,0 +1,52 @@
+#  Copyright (C) 2012  David Morton
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import unittest
+
+import numpy
+from spikepy.utils.fir_convolve import convolve_same, fft_length
+
+def reference(signal, kernel):
+    delay = (len(kernel)-1)//2
+    return numpy.array([numpy.convolve(channel, kernel)[
+            delay:delay+signal.shape[-1]] for channel in signal])
+
+class TestFIRConvolve(unittest.TestCase):
+    def setUp(self):
+        self.signal = numpy.random.randn(3, 20000)
+
+    def test_methods_agree(self):
+        for taps in [1, 4, 31, 64, 101, 1001, 3001]:
+            kernel = numpy.random.randn(taps)
+            expected = reference(self.signal, kernel)
+            for method in ['direct', 'fft', 'auto']:
+                result = convolve_same(self.signal, kernel, method=method)
+                self.assertTrue(numpy.allclose(result, expected, atol=1e-9),
+                        '%d taps, %s' % (taps, method))
+            self.assertTrue(numpy.allclose(convolve_same(self.signal[1], 
+                    kernel), expected[1], atol=1e-9))
+
+    def test_out(self):
+        '''The result is written into out, with its dtype.'''
+        kernel = numpy.hanning(201)
+        out = numpy.empty(self.signal.shape, dtype=numpy.float32)
+        result = convolve_same(self.signal, kernel, out=out)
+        self.assertTrue(result is out)
+        self.assertTrue(numpy.allclose(out, reference(self.signal, kernel),
+                atol=1e-4))
+
+    def test_fft_length(self):
+        self.assertEqual(fft_length(101, 10**6), 4096)
+        self.assertEqual(fft_length(1001, 10**6), 8192)
+        self.assertEqual(fft_length(101, 100), 256)
@@ -0,0 +1,72 @@
+#  Copyright (C) 2012  David Morton
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import unittest
+
+import numpy
+from spikepy.utils import precision
+from spikepy.utils.resample import resample
+from spikepy.utils.generate_spike_windows import generate_spike_windows
+from spikepy.utils.clustering_metrics.mahalanobis_distance import \
+        mahalanobis_squared
+
+class TestPrecision(unittest.TestCase):
+    def setUp(self):
+        self.signal = numpy.sin(numpy.linspace(0, 100, 4000)).reshape(2, 2000)
+
+    def test_working_dtype(self):
+        self.assertEqual(precision.working_dtype('float64'), numpy.float64)
+        self.assertEqual(precision.working_dtype('float32'), numpy.float32)
+        self.assertEqual(precision.working_dtype('int16'), numpy.float32)
+        self.assertRaises(ValueError, precision.working_dtype, 'float16')
+
+    def test_quantize(self):
+        samples, scale = precision.quantize(self.signal*0.001)
+        self.assertEqual(samples.dtype, numpy.int16)
+        self.assertEqual(numpy.max(numpy.abs(samples)), 32767)
+        self.assertTrue(numpy.allclose(samples*scale, self.signal*0.001,
+                atol=scale))
+
+        samples, scale = precision.quantize(numpy.zeros((2, 10)))
+        self.assertEqual(scale, 1.0)
+        self.assertFalse(samples.any())
+
+    def test_dequantize(self):
+        samples, scale = precision.quantize(self.signal*0.001)
+        traces = precision.dequantize(samples, scale)
+        self.assertEqual(traces.dtype, numpy.float32)
+        self.assertTrue(numpy.allclose(traces, samples*scale))
+        out = numpy.empty(samples.shape, dtype=numpy.float32)
+        self.assertTrue(precision.dequantize(samples, scale, out=out) is out)
+
+    def test_results_keep_precision(self):
+        signal = self.signal.astype(numpy.float32)
+        self.assertEqual(resample(signal, 1000, 500).dtype, numpy.float32)
+        self.assertEqual(resample(signal[0], 1000, 500).dtype, numpy.float32)
+        self.assertEqual(resample(self.signal[0], 1000, 500).dtype, 
+                numpy.float64)
+
+        windows = generate_spike_windows(signal, 1000.0, [[0.5], [0.5]],
+                pre_padding=2.0, post_padding=4.0, min_num_channels=1,
+                peak_drift=0.3, exclude_overlappers=False)[0]
+        self.assertEqual(windows.dtype, numpy.float32)
+        windows = generate_spike_windows(signal, 1000.0, [[], []],
+                pre_padding=2.0, post_padding=4.0, min_num_channels=1,
+                peak_drift=0.3, exclude_overlappers=False)[0]
+        self.assertEqual(windows.dtype, numpy.float32)
+
+    def test_upcast(self):
+        data = numpy.random.randn(100, 3).astype(numpy.float32)
+        self.assertEqual(mahalanobis_squared(data, data).dtype, numpy.float64)
+        self.assertTrue(precision.upcast(self.signal) is self.signal)
@@ -0,0 +1,75 @@
+#  Copyright (C) 2012  David Morton
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import unittest
+import cPickle
+
+import numpy
+from spikepy.utils.ragged_array import RaggedArray, as_ragged
+from spikepy.utils.collapse_event_times import collapse_event_times
+from spikepy.common.result_cache import hash_data
+
+class TestRaggedArray(unittest.TestCase):
+    def setUp(self):
+        self.lists = [[0.1, 0.5, 0.9], [], [0.2], [0.3, 0.4]]
+        self.ragged = RaggedArray.from_lists(self.lists, 
+                channel_ids=[3, 4, 5, 6])
+
+    def test_channels(self):
+        self.assertEqual(len(self.ragged), 4)
+        self.assertEqual(list(self.ragged.lengths), [3, 0, 1, 2])
+        for channel_values, expected in zip(self.ragged, self.lists):
+            self.assertEqual(list(channel_values), expected)
+        self.assertEqual(list(self.ragged[-1]), [0.3, 0.4])
+        self.assertRaises(IndexError, self.ragged.__getitem__, 4)
+        self.assertEqual(list(self.ragged.channel_index()), 
+                [0, 0, 0, 2, 3, 3])
+
+    def test_views(self):
+        '''Channels are views of the values, not copies.'''
+        channel_values = self.ragged[2]
+        channel_values[0] = 7.0
+        self.assertEqual(self.ragged.values[3], 7.0)
+
+        sliced = self.ragged[1:3]
+        self.assertEqual(len(sliced), 2)
+        self.assertEqual(list(sliced.channel_ids), [4, 5])
+        self.assertEqual([list(c) for c in sliced], [[], [7.0]])
+        self.assertTrue(sliced.values.base is not None)
+
+    def test_concatenate(self):
+        parts = [self.ragged[:1], self.ragged[1:3], self.ragged[3:]]
+        joined = RaggedArray.concatenate(parts)
+        self.assertTrue(numpy.array_equal(joined.offsets, 
+                self.ragged.offsets))
+        self.assertTrue(numpy.array_equal(joined.values, self.ragged.values))
+        self.assertEqual(list(joined.channel_ids), [3, 4, 5, 6])
+
+    def test_pickle_and_hash(self):
+        copy = cPickle.loads(cPickle.dumps(self.ragged, protocol=-1))
+        self.assertEqual(hash_data(copy), hash_data(self.ragged))
+        other = RaggedArray.from_lists([[0.1], [0.5, 0.9], [0.2], 
+                [0.3, 0.4]], channel_ids=[3, 4, 5, 6])
+        self.assertNotEqual(hash_data(other), hash_data(self.ragged))
+        self.assertEqual(hash_data(as_ragged(self.lists)), 
+                hash_data(as_ragged(as_ragged(self.lists))))
+
+    def test_collapse_event_times(self):
+        '''Lists and RaggedArrays of event times collapse the same way.'''
+        event_times = [numpy.sort(numpy.random.uniform(0, 10, n)) 
+                for n in [50, 0, 80, 20]]
+        expected = collapse_event_times(event_times, 2, 0.01)
+        result = collapse_event_times(RaggedArray.from_lists(event_times), 
+                2, 0.01)
+        self.assertTrue(numpy.array_equal(expected, result))
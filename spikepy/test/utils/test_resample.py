@@ -0,0 +1,74 @@
+#  Copyright (C) 2012  David Morton
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import unittest
+
+import numpy
+import scipy.signal as scisig
+from spikepy.utils.resample import resample, rational_ratio, \
+        resampled_rate, ResampleStream
+
+class TestResample(unittest.TestCase):
+    def setUp(self):
+        self.signal = numpy.random.randn(3, 10001)
+
+    def test_rational_ratio(self):
+        self.assertEqual(rational_ratio(30000, 10000), (1, 3))
+        self.assertEqual(rational_ratio(44100, 30000), (100, 147))
+        self.assertEqual(rational_ratio(30000, 30000*numpy.pi), (355, 113))
+
+    def test_resampled_rate(self):
+        '''The rate reached is reported when the ratio is approximated.'''
+        self.assertEqual(resampled_rate(44100, 30000), 30000)
+        self.assertEqual(resampled_rate(30000, 30000), 30000)
+        self.assertEqual(rational_ratio(30000.3, 25000), (5, 6))
+        self.assertAlmostEqual(resampled_rate(30000.3, 25000), 25000.25)
+        self.assertEqual(resampled_rate(30000.3, 25000, method='fft'), 
+                25000)
+        self.assertAlmostEqual(ResampleStream(2, 30000.3, 
+                25000).new_sample_rate, 25000.25)
+
+    def test_matches_scipy(self):
+        '''All channels at once matches scipy channel by channel.'''
+        for rates, up, down in [((30000, 20000), 2, 3), 
+                ((25000, 30000), 6, 5)]:
+            result = resample(self.signal, *rates)
+            num_samples = self.signal.shape[1]*up//down
+            self.assertEqual(result.shape, (3, num_samples))
+            for channel, r in zip(self.signal, result):
+                self.assertTrue(numpy.allclose(r, scisig.resample_poly(
+                        channel, up, down)[:num_samples]))
+            self.assertTrue(numpy.allclose(resample(self.signal[0], 
+                    *rates), result[0]))
+
+    def test_fft(self):
+        result = resample(self.signal, 30000, 20000, method='fft')
+        self.assertEqual(result.shape, (3, 6667))
+        self.assertTrue(numpy.allclose(result[1], 
+                scisig.resample(self.signal[1], 6667)))
+        self.assertRaises(ValueError, resample, self.signal, 30000, 20000,
+                method='linear')
+
+    def test_stream(self):
+        '''Resampling block by block matches resampling the whole.'''
+        for rates in [(30000, 10000), (44100, 30000)]:
+            stream = ResampleStream(3, *rates, block_size=1000)
+            blocks = [self.signal[:, i:i+777] for i in 
+                    xrange(0, self.signal.shape[1], 777)]
+            result = numpy.concatenate(list(stream.filter_blocks(blocks)), 
+                    axis=1)
+            expected = resample(self.signal, *rates)
+            self.assertEqual(result.shape, expected.shape)
+            self.assertTrue(numpy.allclose(result, expected))
+
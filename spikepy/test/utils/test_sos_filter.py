@@ -0,0 +1,67 @@
+#  Copyright (C) 2012  David Morton
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import unittest
+
+import numpy
+import scipy.signal as scisig
+from spikepy.utils import sos_filter
+
+class TestSOSFilter(unittest.TestCase):
+    def setUp(self):
+        self.signal = numpy.random.randn(3, 5000)
+        self.sos = scisig.butter(4, (0.02, 0.3), btype='band', output='sos')
+
+    def test_matches_scipy(self):
+        '''All channels at once, in blocks, matches scipy channel by 
+        channel.'''
+        block_length = sos_filter.BLOCK_LENGTH
+        sos_filter.BLOCK_LENGTH = 777
+        try:
+            zero_phase = sos_filter.filtfilt(self.sos, self.signal)
+            causal = sos_filter.lfilter(self.sos, self.signal)
+        finally:
+            sos_filter.BLOCK_LENGTH = block_length
+        for channel, zp, c in zip(self.signal, zero_phase, causal):
+            self.assertTrue(numpy.allclose(zp, 
+                    scisig.sosfiltfilt(self.sos, channel)))
+            self.assertTrue(numpy.allclose(c, scisig.sosfilt(self.sos, 
+                    channel)))
+        self.assertTrue(numpy.allclose(sos_filter.filtfilt(self.sos, 
+                self.signal[0]), zero_phase[0]))
+
+    def test_short_signals(self):
+        for length in [1, 2, 10]:
+            signal = numpy.random.randn(2, length)
+            result = sos_filter.filtfilt(self.sos, signal)
+            self.assertEqual(result.shape, signal.shape)
+            self.assertTrue(numpy.allclose(result[0], scisig.sosfiltfilt(
+                    self.sos, signal[0], padlen=length-1)))
+
+    def test_out_and_dtype(self):
+        out = numpy.empty(self.signal.shape, dtype=numpy.float32)
+        self.assertTrue(sos_filter.filtfilt(self.sos, self.signal, out=out)
+                is out)
+        result = sos_filter.lfilter(self.sos, self.signal.astype(
+                numpy.float32))
+        self.assertEqual(result.dtype, numpy.float32)
+
+    def test_high_order(self):
+        '''High orders stay stable in sos form.'''
+        sos = scisig.butter(20, (0.02, 0.3), btype='band', output='sos')
+        self.assertTrue(sos_filter.pole_radius(sos) < 1.0)
+        result = sos_filter.filtfilt(sos, self.signal)
+        self.assertTrue(numpy.all(numpy.isfinite(result)))
+        self.assertTrue(numpy.abs(result).max() < 
+                10*numpy.abs(self.signal).max())
@@ -0,0 +1,79 @@
+#  Copyright (C) 2012  David Morton
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import unittest
+
+import numpy
+import scipy.signal as scisig
+from spikepy.utils import streaming_filters, sos_filter
+from spikepy.utils.fir_convolve import convolve_same
+
+class TestStreamingFilters(unittest.TestCase):
+    def setUp(self):
+        self.signal = numpy.random.randn(3, 20000)
+        self.sos = scisig.butter(4, (0.02, 0.2), btype='band', output='sos')
+
+    def stream(self, streaming_filter):
+        '''Filter self.signal in blocks of all sorts of sizes.'''
+        blocks = []
+        begin = 0
+        for size in [1, 5, 100, 37, 3000, 2, 7000, 1]:
+            blocks.append(self.signal[:, begin:begin+size])
+            begin += size
+        blocks.append(self.signal[:, begin:])
+        results = list(streaming_filter.filter_blocks(blocks))
+        return numpy.concatenate(results, axis=1)
+
+    def test_causal_iir(self):
+        result = self.stream(streaming_filters.CausalIIRStream(self.sos, 3))
+        self.assertTrue(numpy.allclose(result, 
+                sos_filter.lfilter(self.sos, self.signal)))
+
+    def test_zero_phase_iir(self):
+        result = self.stream(streaming_filters.ZeroPhaseIIRStream(
+                self.sos, 3))
+        self.assertTrue(numpy.allclose(result, 
+                sos_filter.filtfilt(self.sos, self.signal), atol=1e-10))
+
+        # recordings shorter than the padding.
+        stream = streaming_filters.ZeroPhaseIIRStream(self.sos, 3)
+        short = self.signal[:, :10]
+        result = numpy.hstack([stream.process(short[:, :4]), 
+                stream.process(short[:, 4:]), stream.flush()])
+        self.assertTrue(numpy.allclose(result, 
+                sos_filter.filtfilt(self.sos, short)))
+
+    def test_fir(self):
+        kernel = scisig.firwin(201, 0.1)
+        stream = streaming_filters.FIRStream(kernel, 3)
+        self.assertEqual(stream.delay, 100)
+        result = self.stream(stream)
+        self.assertTrue(numpy.allclose(result, 
+                convolve_same(self.signal, kernel)))
+
+    def test_chunked(self):
+        '''Blocks with context on either side, as time chunking does.'''
+        def function(signal):
+            return convolve_same(signal, numpy.ones(5))
+        stream = streaming_filters.ChunkedStream(function, 3, overlap=3,
+                alignment=4, block_size=999)
+        self.assertEqual((stream.block_size, stream.overlap), (1000, 4))
+        result = self.stream(stream)
+        self.assertTrue(numpy.allclose(result, function(self.signal)))
+
+    def test_dtype(self):
+        stream = streaming_filters.CausalIIRStream(self.sos, 3)
+        result = stream.process(self.signal.astype(numpy.float32))
+        self.assertEqual(result.dtype, numpy.float32)
+        self.assertRaises(ValueError, stream.process, self.signal[:2])
@@ -0,0 +1,44 @@
+#  Copyright (C) 2012  David Morton
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import unittest
+
+from spikepy.utils.substring_dict import SubstringIndex
+
+class TestSubstringIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = SubstringIndex()
+        for name in ['trial_a', 'trial_b', 'other', 'trial_abc']:
+            self.index[name] = name.upper()
+
+    def test_lookup(self):
+        self.assertEqual(len(self.index), 4)
+        self.assertEqual(self.index['trial_a'], 'TRIAL_A') # exact beats part
+        self.assertEqual(self.index['abc'], 'TRIAL_ABC')
+        self.assertEqual(self.index['oth'], 'OTHER')
+        self.assertRaises(KeyError, self.index.__getitem__, 'trial_')
+        self.assertRaises(KeyError, self.index.__getitem__, 'missing')
+        self.assertEqual(sorted(self.index.matching_keys('al_a')), 
+                ['trial_a', 'trial_abc'])
+        # parts shorter than the trigrams are still found.
+        self.assertEqual(self.index['th'], 'OTHER')
+        self.assertRaises(KeyError, self.index.__getitem__, 'b')
+
+    def test_delete(self):
+        del self.index['trial_abc']
+        self.assertFalse('trial_abc' in self.index)
+        self.assertRaises(KeyError, self.index.__getitem__, 'abc')
+        self.assertEqual(self.index['al_a'], 'TRIAL_A')
+        self.index['trial_abc'] = 'again'
+        self.assertEqual(self.index['abc'], 'again')
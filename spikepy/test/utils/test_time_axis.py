@@ -0,0 +1,67 @@
+#  Copyright (C) 2012  David Morton
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import unittest
+
+import numpy
+from spikepy.utils.time_axis import TimeAxis
+from spikepy.plotting_utils.downsample_for_plot import downsample_for_plot
+
+class TestTimeAxis(unittest.TestCase):
+    def setUp(self):
+        self.time_axis = TimeAxis(2.0, 30.0, 10000)
+        self.times = 2.0 + numpy.arange(10000)/30.0
+
+    def test_indexing(self):
+        self.assertEqual(len(self.time_axis), 10000)
+        self.assertEqual(self.time_axis[0], 2.0)
+        self.assertAlmostEqual(self.time_axis[-1], self.times[-1])
+        self.assertRaises(IndexError, self.time_axis.__getitem__, 10000)
+        self.assertTrue(numpy.allclose(numpy.asarray(self.time_axis), 
+                self.times))
+
+        for key in [slice(10, 20), slice(5, None, 7), slice(None, -3),
+                slice(9000, 100)]:
+            sliced = self.time_axis[key]
+            self.assertTrue(isinstance(sliced, TimeAxis))
+            self.assertEqual(len(sliced), len(self.times[key]))
+            self.assertTrue(numpy.allclose(numpy.asarray(sliced), 
+                    self.times[key]))
+        self.assertTrue(numpy.allclose(self.time_axis[::-2], 
+                self.times[::-2]))
+        self.assertTrue(numpy.allclose(self.time_axis[[0, 5, -1]], 
+                self.times[[0, 5, -1]]))
+
+    def test_searchsorted(self):
+        values = numpy.hstack([self.times[::37], self.times[::41] + 1e-3,
+                [-10.0, 0.0, 1e6]])
+        for side in ['left', 'right']:
+            expected = numpy.searchsorted(self.times, values, side=side)
+            result = numpy.searchsorted(self.time_axis, values, side=side)
+            self.assertTrue(numpy.array_equal(expected, result))
+            self.assertEqual(self.time_axis.searchsorted(self.times[50],
+                    side=side), numpy.searchsorted(self.times, 
+                    self.times[50], side=side))
+
+    def test_downsample_for_plot(self):
+        '''A TimeAxis plots just like the array of times would.'''
+        signal = numpy.random.randn(2, 10000)
+        for tmin, tmax in [(0.0, 400.0), (50.0, 60.0), (100.0, 300.0)]:
+            expected = downsample_for_plot(signal, self.times, tmin, tmax,
+                    num_samples=100)
+            result = downsample_for_plot(signal, self.time_axis, tmin, tmax,
+                    num_samples=100)
+            self.assertTrue(numpy.array_equal(expected[0], result[0]))
+            self.assertTrue(numpy.allclose(expected[1], result[1]))
+            self.assertTrue(isinstance(result[1], numpy.ndarray))
@@ -13,25 +13,42 @@
 #  You should have received a copy of the GNU General Public License
 #  along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-from collections import defaultdict
-
 import numpy
 
 
-def cluster_data(clusters, data):
+def cluster_indexes(clusters):
     '''
-        Given the cluster identities and data return a dictionary keyed on
-    cluster identity with data in the form of a numpy array.
+        Given the cluster identities return a dictionary keyed on cluster
+    identity (-1 is 'Rejected') with the indexes of that cluster's members,
+    in their original order.
     '''
-    adict = defaultdict(list)
-    for cluster_id, thing in zip(clusters, data):
-        if cluster_id == -1:
-            adict['Rejected'].append(thing)
-        else:
-            adict[cluster_id].append(thing)
+    clusters = numpy.asarray(clusters)
+    if len(clusters) == 0:
+        return {}
+    # a stable sort keeps each cluster's members in their original order.
+    order = numpy.argsort(clusters, kind='mergesort')
+    sorted_clusters = clusters[order]
+    cluster_ids = numpy.unique(sorted_clusters)
+    begins = numpy.searchsorted(sorted_clusters, cluster_ids, side='left')
+    ends = numpy.searchsorted(sorted_clusters, cluster_ids, side='right')
 
-    for key in adict.keys():
-        adict[key] = numpy.array(adict[key])
+    result = {}
+    for cluster_id, begin, end in zip(cluster_ids, begins, ends):
+        if cluster_id == -1:
+            cluster_id = 'Rejected'
+        result[cluster_id] = order[begin:end]
+    return result
 
-    return dict(adict)
-    
+def cluster_data(clusters, data, indexes=None):
+    '''
+        Given the cluster identities and data return a dictionary keyed on
+    cluster identity with data in the form of a numpy array.  <indexes> 
+    may be given if they were already found with cluster_indexes.
+    '''
+    if indexes is None:
+        indexes = cluster_indexes(clusters)
+    data = numpy.asarray(data)
+    result = {}
+    for cluster_id, members in indexes.items():
+        result[cluster_id] = data[members]
+    return result
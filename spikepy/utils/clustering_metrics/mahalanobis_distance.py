@@ -16,6 +16,8 @@
 
 import numpy
 
+from spikepy.utils.precision import upcast
+
 def _m_sq(x, mu, vi):
     fdot = numpy.dot((x-mu), vi)
     dist = numpy.dot(fdot, (x-mu).T)
@@ -40,8 +42,10 @@ def _mahalanobis_squared(x, mu, vi):
 def mahalanobis_squared(x, data, use_pseudo_inverse=False):
     '''
         Return the mahalanobis distance between x and the centeroid of the
-    data.
+    data.  This is computed in float64, whatever the data's precision.
     '''
+    x = upcast(x)
+    data = upcast(data)
     mu = numpy.average(data, axis=0)
     cov = numpy.cov(data, rowvar=0)
     if use_pseudo_inverse:
@@ -15,13 +15,14 @@
 
 import numpy
 
+from spikepy.utils.ragged_array import as_ragged
+
 def collapse_event_times(event_times, 
         min_num_channels, peak_drift):
     assert peak_drift >= 0.0
-    all_times = numpy.hstack(event_times)
-    channels = numpy.hstack([[i for d in event_times[i]] 
-            for i in range(len(event_times))])
-    sorted_indexes = all_times.argsort()
+    event_times = as_ragged(event_times)
+    all_times = event_times.values
+    sorted_indexes = all_times.argsort(kind='mergesort')
     sorted_times = all_times[sorted_indexes]
     if len(event_times) < min_num_channels:
         return sorted_times
@@ -32,6 +33,7 @@ def collapse_event_times(event_times,
         # cover <min_num_channels> then we have a single event across multiple
         # channels.  The event time will be the event_time of the 
         # lowest numbered channel that participated in the event.
+        sorted_channels = event_times.channel_index()[sorted_indexes]
         h = 0 # head
         t = 0 # tail
         collapsed_event_times = []
@@ -43,7 +45,7 @@ def collapse_event_times(event_times,
 
             # detect event
             if ((h - t) + 1 >= min_num_channels and
-                    len(set(channels[sorted_indexes][t:h+1])) >= 
+                    len(set(sorted_channels[t:h+1])) >= 
                     min_num_channels):
                 event_time = all_times[min(sorted_indexes[t:h+1])]
                 collapsed_event_times.append(event_time)
@@ -0,0 +1,181 @@
+#  Copyright (C) 2012  David Morton
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+    A process-wide cache of filter designs (IIR sections, FIR kernels and
+their spectra), which depend only on a few parameters but would otherwise
+be recomputed for every trial.  The cache holds at most max_entries
+designs, dropping the least recently used, and can be saved to and loaded
+from a file so designs outlive the session (saved designs are dropped
+when spikepy, numpy or scipy are upgraded).  Cached arrays are read-only,
+since every caller shares them.
+'''
+import os
+import uuid
+import atexit
+import cPickle
+import functools
+import threading
+from collections import OrderedDict
+
+import numpy
+import scipy
+
+import spikepy
+
+_lock = threading.Lock()
+_cache = OrderedDict()
+_max_entries = 256
+num_hits = 0
+num_misses = 0
+_save_at_exit = set()
+
+def set_max_entries(max_entries):
+    '''Keep at most <max_entries> designs (0 disables the cache).'''
+    global _max_entries
+    with _lock:
+        _max_entries = max_entries
+        _trim()
+
+def get_max_entries():
+    return _max_entries
+
+def get_counters():
+    '''A dictionary with the number of hits, misses and cached entries.'''
+    return {'hits':num_hits, 'misses':num_misses, 'entries':len(_cache)}
+
+def clear():
+    '''Forget every design and reset the counters.'''
+    global num_hits, num_misses
+    with _lock:
+        _cache.clear()
+        num_hits = 0
+        num_misses = 0
+
+def _trim():
+    while len(_cache) > _max_entries:
+        _cache.popitem(last=False)
+
+def _freeze(thing):
+    '''Return a hashable (and picklable) key equivalent to <thing>.'''
+    if isinstance(thing, numpy.ndarray):
+        return ('array', thing.dtype.str, thing.shape, thing.tostring())
+    if isinstance(thing, numpy.generic):
+        return thing.item()
+    if isinstance(thing, (list, tuple)):
+        return tuple([_freeze(item) for item in thing])
+    if isinstance(thing, dict):
+        return tuple([(key, _freeze(thing[key])) 
+                for key in sorted(thing.keys())])
+    if callable(thing):
+        return '%s.%s' % (thing.__module__, thing.__name__)
+    return thing
+
+def _read_only(thing):
+    if isinstance(thing, numpy.ndarray):
+        thing.flags.writeable = False
+    elif isinstance(thing, tuple):
+        for item in thing:
+            _read_only(item)
+    return thing
+
+def get(key, compute):
+    '''
+        Return the design cached under <key> (see _freeze), calling 
+    <compute> to make it if it is not cached.
+    '''
+    global num_hits, num_misses
+    with _lock:
+        if key in _cache:
+            num_hits += 1
+            design = _cache.pop(key)
+            _cache[key] = design
+            return design
+        num_misses += 1
+    design = _read_only(compute())
+    with _lock:
+        if _max_entries > 0:
+            _cache[key] = design
+            _trim()
+    return design
+
+def memoized(function):
+    '''
+        Decorate a filter design function so that its results are cached.
+    Its arguments may be numbers, strings, arrays, functions or sequences
+    of those.
+    '''
+    name = '%s.%s' % (function.__module__, function.__name__)
+    @functools.wraps(function)
+    def cached_function(*args, **kwargs):
+        key = (name, _freeze(args), _freeze(kwargs))
+        return get(key, lambda: function(*args, **kwargs))
+    return cached_function
+
+def _version():
+    '''Saved designs are only used by the versions that made them.'''
+    return 'spikepy %s numpy %s scipy %s' % (spikepy.__version__,
+            numpy.__version__, scipy.__version__)
+
+def save(filename):
+    '''Write the cached designs to <filename>.'''
+    with _lock:
+        items = (_version(), _cache.items())
+    # write then rename, so a partial file is never read back.
+    temp_filename = '%s.%s.tmp' % (filename, uuid.uuid4().hex)
+    try:
+        with open(temp_filename, 'wb') as ofile:
+            cPickle.dump(items, ofile, protocol=-1)
+        os.rename(temp_filename, filename)
+    except (IOError, OSError, cPickle.PicklingError):
+        if os.path.exists(temp_filename):
+            os.remove(temp_filename)
+        return False
+    return True
+
+def load(filename):
+    '''
+        Add the designs saved in <filename> to the cache, returning how
+    many were added (a missing or unreadable file adds none).  A file 
+    saved by other versions of spikepy, numpy or scipy is removed.
+    '''
+    try:
+        with open(filename, 'rb') as infile:
+            version, items = cPickle.load(infile)
+    except Exception:
+        version = None
+    if version != _version():
+        if os.path.exists(filename):
+            try:
+                os.remove(filename)
+            except OSError:
+                pass
+        return 0
+    with _lock:
+        num_added = 0
+        for key, design in items:
+            if key not in _cache:
+                _cache[key] = _read_only(design)
+                num_added += 1
+        _trim()
+    return num_added
+
+def save_at_exit(filename):
+    '''Save the cached designs to <filename> when the program exits.'''
+    with _lock:
+        if filename in _save_at_exit:
+            return
+        _save_at_exit.add(filename)
+    atexit.register(save, filename)
@@ -0,0 +1,110 @@
+#  Copyright (C) 2012  David Morton
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+    Convolution of many channels with one FIR kernel at a time.  Short
+kernels are applied directly, long ones by FFT overlap-add, which costs
+O(log(taps)) per sample instead of O(taps).
+"""
+import numpy
+from scipy.ndimage import convolve1d
+
+from spikepy.utils.filter_design_cache import memoized
+
+# kernels with more taps than this are applied with the FFT.
+MAX_DIRECT_TAPS = 32
+# the FFT length is about this many times the number of taps, but no less
+# than MIN_FFT_LENGTH (so short kernels don't mean many tiny blocks).
+FFT_LENGTH_FACTOR = 8
+MIN_FFT_LENGTH = 4096
+
+def fft_length(taps, num_samples):
+    """
+    Return the length (a power of two) of the FFTs used to convolve 
+    <num_samples> samples with a kernel of <taps> taps.
+    """
+    full_length = num_samples + taps - 1
+    nfft = 2**int(numpy.ceil(numpy.log2(max(FFT_LENGTH_FACTOR*taps, 
+            MIN_FFT_LENGTH))))
+    return min(nfft, 2**int(numpy.ceil(numpy.log2(full_length))))
+
+@memoized
+def kernel_spectrum(kernel, nfft):
+    """
+    Return the real FFT of <kernel> zero padded to <nfft> samples.
+    """
+    return numpy.fft.rfft(kernel, nfft)
+
+def convolve_same(signal, kernel, out=None, method='auto'):
+    """
+    Convolve every channel of <signal> with <kernel>, keeping the result
+    centered on the input (like numpy.convolve(..., mode='same') for
+    kernels with an odd number of taps).
+    Inputs:
+        signal          : a 1D or 2D (num_channels, num_samples) array
+        kernel          : a 1D array of filter taps
+        --kwargs--
+        out             : an array shaped like <signal> to write the result
+                          into (a new array with the dtype of <signal> by 
+                          default).
+        method          : 'direct', 'fft' or 'auto' (choose by the number 
+                          of taps).
+    Returns:
+        out             : the filtered signal
+    """
+    signal = numpy.asarray(signal)
+    kernel = numpy.asarray(kernel, dtype=numpy.float64)
+    if out is None:
+        out = numpy.empty(signal.shape, dtype=signal.dtype)
+    if method == 'auto':
+        if len(kernel) > MAX_DIRECT_TAPS:
+            method = 'fft'
+        else:
+            method = 'direct'
+
+    if signal.shape[-1] == 0:
+        return out
+    if method == 'direct':
+        # convolve1d centers even kernels one tap later than we do.
+        convolve1d(signal, kernel, axis=-1, output=out, mode='constant',
+                origin=len(kernel) % 2 - 1)
+    elif method == 'fft':
+        if signal.ndim == 1:
+            _overlap_add(signal[numpy.newaxis], kernel, 
+                    out[numpy.newaxis])
+        else:
+            _overlap_add(signal, kernel, out)
+    else:
+        raise ValueError('Unknown convolution method "%s".' % method)
+    return out
+
+def _overlap_add(signal, kernel, out):
+    taps = len(kernel)
+    num_samples = signal.shape[-1]
+    # index of the full convolution that lines up with out[:, 0]
+    delay = (taps-1)//2
+    nfft = fft_length(taps, num_samples)
+    step = nfft - taps + 1
+    spectrum = kernel_spectrum(kernel, nfft)
+
+    out[...] = 0.0
+    for begin in xrange(0, num_samples, step):
+        block = signal[:, begin:begin+step]
+        full = numpy.fft.irfft(numpy.fft.rfft(block, nfft, axis=-1)*
+                spectrum, nfft, axis=-1)
+        # full[:, k] is the convolution at begin+k, out[:, j] is at j+delay
+        first = max(begin - delay, 0)
+        last = min(begin + block.shape[-1] + taps - 1 - delay, num_samples)
+        out[:, first:last] += full[:, first-begin+delay:last-begin+delay]
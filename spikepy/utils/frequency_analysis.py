@@ -80,8 +80,8 @@ def psd(signal, sampling_frequency, frequency_resolution,
     """
     if (high_frequency_cutoff is not None 
         and high_frequency_cutoff < sampling_frequency):
-        resampled_signal = resample_signal(signal, sampling_frequency, 
-                                                    high_frequency_cutoff)
+        resampled_signal = resample(signal, sampling_frequency, 
+                                           high_frequency_cutoff)
     else:
         high_frequency_cutoff = sampling_frequency
         resampled_signal = signal
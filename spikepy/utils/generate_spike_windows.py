@@ -16,6 +16,7 @@
 import numpy
 
 from spikepy.utils.collapse_event_times import collapse_event_times 
+from spikepy.utils.precision import result_dtype
 
 def generate_spike_windows(signal, sampling_freq, event_times,
             pre_padding=None,
@@ -38,8 +39,9 @@ def generate_spike_windows(signal, sampling_freq, event_times,
     if len(collapsed_event_times) == 0:
         # need to return something compatible in shape with what would have
         # been returned if there were event_times.
-        return [numpy.empty((0, window_size)),numpy.empty(0),
-                numpy.empty((0, window_size)),numpy.empty(0)]
+        dtype = result_dtype(signal)
+        return [numpy.empty((0, window_size), dtype=dtype),numpy.empty(0),
+                numpy.empty((0, window_size), dtype=dtype),numpy.empty(0)]
 
     spike_index_list = numpy.array(collapsed_event_times, 
             dtype=numpy.float64)*sampling_freq
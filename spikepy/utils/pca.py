@@ -16,6 +16,8 @@
 import numpy
 from numpy.linalg import svd
 
+from spikepy.utils.precision import upcast
+
 def pca(P):
     """
     Use singular value decomposition to determine the optimal
@@ -33,6 +35,9 @@ def pca(P):
                    this is the bias corrected variance using 
                    m-1 instead of m.
     """
+    # the decomposition is done in float64, whatever the data's precision.
+    P = upcast(P)
+
     # first we need to zero mean the data
     m,n = P.shape
     column_means = sum(P,0) / m
@@ -0,0 +1,77 @@
+#  Copyright (C) 2012  David Morton
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+    The sample precision policy.  Traces are kept as float64 (the default)
+or float32, or for 'int16' the raw samples are kept as 16-bit integers
+with a scale factor and the processing stages work in float32 traces made
+from them.  Stages
+produce results with the same precision as their input and only work in
+float64 internally where it matters for accuracy (filter design,
+covariance inversion, ...).
+'''
+import numpy
+
+SAMPLE_PRECISIONS = ['float64', 'float32', 'int16']
+
+def working_dtype(precision):
+    '''The float dtype that traces are processed in under <precision>.'''
+    if precision not in SAMPLE_PRECISIONS:
+        raise ValueError('Unknown sample precision "%s", choose from %s.' %
+                (precision, SAMPLE_PRECISIONS))
+    if precision == 'float64':
+        return numpy.dtype(numpy.float64)
+    return numpy.dtype(numpy.float32)
+
+def result_dtype(signal):
+    '''
+        The float dtype of results computed from <signal>: float32 (or
+    int16) data give float32 results, anything else gives float64.
+    '''
+    if numpy.asarray(signal).dtype in (numpy.float32, numpy.int16):
+        return numpy.dtype(numpy.float32)
+    return numpy.dtype(numpy.float64)
+
+def like(result, signal):
+    '''Return <result> with the precision results from <signal> should have.'''
+    return numpy.asarray(result).astype(result_dtype(signal), copy=False)
+
+def upcast(array):
+    '''Return <array> as float64 (not copied if it already is).'''
+    return numpy.asarray(array).astype(numpy.float64, copy=False)
+
+def quantize(traces):
+    '''
+        Return int16 samples and the scale that maps them back onto
+    <traces>, so that traces ~= samples*scale.
+    '''
+    traces = numpy.asarray(traces)
+    peak = float(numpy.max(numpy.abs(traces))) if traces.size else 0.0
+    scale = peak/32767.0 if peak > 0.0 else 1.0
+    samples = numpy.empty(traces.shape, dtype=numpy.int16)
+    for i in xrange(len(traces)):
+        samples[i] = numpy.round(upcast(traces[i])/scale)
+    return samples, scale
+
+def dequantize(samples, scale, out=None):
+    '''
+        Return float32 traces from int16 <samples> and their <scale>,
+    written into <out> if it is passed.
+    '''
+    if out is None:
+        out = numpy.empty(samples.shape, dtype=numpy.float32)
+    for i in xrange(len(samples)):
+        numpy.multiply(samples[i], scale, out=out[i], casting='unsafe')
+    return out
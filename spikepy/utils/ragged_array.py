@@ -0,0 +1,122 @@
+#  Copyright (C) 2012  David Morton
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+    A compact container for a varying number of values per channel, such
+as the event_times of a trial.
+'''
+import numpy
+
+class RaggedArray(object):
+    '''
+        The values of all channels in one array, with channel i's values
+    in values[offsets[i]:offsets[i+1]].  Indexing with an integer gives a
+    view of that channel's values, iterating gives every channel's in turn
+    (so a RaggedArray can be used like a list of per-channel arrays), and
+    slicing gives a RaggedArray of those channels.
+    '''
+    def __init__(self, values, offsets, channel_ids=None):
+        self.values = numpy.asarray(values)
+        self.offsets = numpy.asarray(offsets, dtype=numpy.int64)
+        if channel_ids is not None:
+            channel_ids = numpy.asarray(channel_ids)
+            if len(channel_ids) != len(self):
+                raise ValueError('There are %d channel_ids for %d channels.'
+                        % (len(channel_ids), len(self)))
+        self.channel_ids = channel_ids
+
+    @classmethod
+    def from_lists(cls, lists, channel_ids=None, dtype=numpy.float64):
+        '''Make a RaggedArray from a sequence of per-channel sequences.'''
+        lengths = [len(item) for item in lists]
+        offsets = numpy.zeros(len(lengths)+1, dtype=numpy.int64)
+        numpy.cumsum(lengths, out=offsets[1:])
+        values = numpy.empty(offsets[-1], dtype=dtype)
+        for i, item in enumerate(lists):
+            values[offsets[i]:offsets[i+1]] = item
+        return cls(values, offsets, channel_ids=channel_ids)
+
+    @classmethod
+    def concatenate(cls, parts):
+        '''The channels of all <parts> (RaggedArrays), one after another.'''
+        values = numpy.concatenate([part.values for part in parts])
+        offsets = [numpy.zeros(1, dtype=numpy.int64)]
+        end = 0
+        for part in parts:
+            offsets.append(part.offsets[1:] - part.offsets[0] + end)
+            end += part.offsets[-1] - part.offsets[0]
+        channel_ids = None
+        if parts and all([part.channel_ids is not None for part in parts]):
+            channel_ids = numpy.concatenate([part.channel_ids 
+                    for part in parts])
+        return cls(values, numpy.concatenate(offsets), 
+                channel_ids=channel_ids)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    @property
+    def lengths(self):
+        '''The number of values on each channel.'''
+        return numpy.diff(self.offsets)
+
+    @property
+    def dtype(self):
+        return self.values.dtype
+
+    @property
+    def nbytes(self):
+        return self.values.nbytes + self.offsets.nbytes
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            begin, end, step = key.indices(len(self))
+            if step != 1:
+                raise IndexError('RaggedArrays can only be sliced in steps of 1.')
+            end = max(begin, end)
+            offsets = self.offsets[begin:end+1]
+            values = self.values[offsets[0]:offsets[-1]]
+            channel_ids = None
+            if self.channel_ids is not None:
+                channel_ids = self.channel_ids[begin:end]
+            return RaggedArray(values, offsets - offsets[0], 
+                    channel_ids=channel_ids)
+        if key < 0:
+            key += len(self)
+        if not 0 <= key < len(self):
+            raise IndexError('channel index out of range')
+        return self.values[self.offsets[key]:self.offsets[key+1]]
+
+    def __iter__(self):
+        for i in xrange(len(self)):
+            yield self.values[self.offsets[i]:self.offsets[i+1]]
+
+    def channel_index(self):
+        '''The channel (0 to len(self)-1) of each of the values.'''
+        return numpy.repeat(numpy.arange(len(self)), self.lengths)
+
+    def tolist(self):
+        '''A list of per-channel arrays (copies).'''
+        return [numpy.array(channel_values) for channel_values in self]
+
+    def __repr__(self):
+        return 'RaggedArray(%d channels, %d values)' % (len(self), 
+                len(self.values))
+
+def as_ragged(thing, dtype=numpy.float64):
+    '''Return <thing> (a sequence of per-channel sequences) as a RaggedArray.'''
+    if isinstance(thing, RaggedArray):
+        return thing
+    return RaggedArray.from_lists(thing, dtype=dtype)
@@ -14,19 +14,112 @@
 #  along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 
+from fractions import Fraction
+
 import numpy
 import scipy.signal as scisig
 
-def resample(signal, prev_sample_rate, new_sample_rate):
+from spikepy.utils.precision import like
+from spikepy.utils.filter_design_cache import memoized
+from spikepy.utils.streaming_filters import ChunkedStream
+
+RESAMPLE_METHODS = ['polyphase', 'fft']
+
+def rational_ratio(prev_sample_rate, new_sample_rate, max_denominator=1000):
+    """
+    Return (up, down), the ratio of the sample rates as a fraction in 
+    lowest terms, or the best approximation with down <= max_denominator
+    (see resampled_rate for the rate that is actually reached).
+    """
+    ratio = Fraction(new_sample_rate)/Fraction(prev_sample_rate)
+    ratio = ratio.limit_denominator(max_denominator)
+    if ratio == 0:
+        ratio = Fraction(1, max_denominator)
+    return ratio.numerator, ratio.denominator
+
+def resampled_rate(prev_sample_rate, new_sample_rate, method='polyphase'):
+    """
+    Return the sampling rate that resample really gives when asked to go
+    from <prev_sample_rate> to <new_sample_rate>, which for the polyphase
+    method differs from <new_sample_rate> if the ratio had to be 
+    approximated.
+    """
+    if method != 'polyphase' or prev_sample_rate == new_sample_rate:
+        return new_sample_rate
+    up, down = rational_ratio(prev_sample_rate, new_sample_rate)
+    rate = Fraction(prev_sample_rate)*up/down
+    if rate == new_sample_rate:
+        return new_sample_rate
+    return float(rate)
+
+@memoized
+def polyphase_kernel(up, down):
+    """
+    Return the anti-aliasing filter that scipy.signal.resample_poly 
+    designs for <up> and <down> (by default).
+    """
+    max_rate = max(up, down)
+    return scisig.firwin(2*10*max_rate + 1, 1.0/max_rate, 
+            window=('kaiser', 5.0))
+
+def polyphase_overlap(up, down):
+    """
+    Return the number of input samples on either side of a block needed
+    to resample it by up/down just as if it were part of a longer signal.
+    """
+    return (len(polyphase_kernel(up, down))//2)//up + 1
+
+def _resample_poly(signal, up, down):
+    return scisig.resample_poly(signal, up, down, axis=-1,
+            window=polyphase_kernel(up, down))
+
+def resample(signal, prev_sample_rate, new_sample_rate, method='polyphase'):
+    """
+    Resample <signal> (1D, or 2D with one channel per row, all resampled 
+    at once) from <prev_sample_rate> to <new_sample_rate>.
+    Inputs:
+        signal              : a 1D or 2D (num_channels, num_samples) array
+        prev_sample_rate    : the sampling rate of <signal>
+        new_sample_rate     : the sampling rate wanted
+        --kwargs--
+        method              : 'polyphase' filters with a polyphase FIR 
+                              filter (see rational_ratio and 
+                              resampled_rate), 'fft' uses 
+                              scipy.signal.resample, whose speed depends on
+                              the prime factors of the signal's length.
+    Returns:
+        resampled_signal    : int(num_samples*new/prev) samples per channel
+    """
     if prev_sample_rate == new_sample_rate:
         return signal
 
-    rate_factor = new_sample_rate/float(prev_sample_rate)
-    num_samples = int(len(signal.T)*rate_factor)
-    if signal.ndim == 2:
-        result = numpy.empty((len(signal), num_samples), dtype=signal.dtype)
-        for si, s in enumerate(signal):
-            result[si] = scisig.resample(s, num_samples)
-        return result
+    signal = numpy.asarray(signal)
+    if method == 'polyphase':
+        up, down = rational_ratio(prev_sample_rate, new_sample_rate)
+        num_samples = signal.shape[-1]*up//down
+        result = _resample_poly(signal, up, down)[..., :num_samples]
+    elif method == 'fft':
+        rate_factor = new_sample_rate/float(prev_sample_rate)
+        num_samples = int(signal.shape[-1]*rate_factor)
+        result = scisig.resample(signal, num_samples, axis=-1)
     else:
-        return scisig.resample(signal, num_samples)    
+        raise ValueError('Unknown resampling method "%s".' % method)
+    return like(result, signal)
+
+
+class ResampleStream(ChunkedStream):
+    """
+    Resamples a recording block by block with the polyphase method, giving
+    the same result as resample on the whole recording.  The output's
+    sampling rate is <new_sample_rate> (see resampled_rate).
+    """
+    def __init__(self, num_channels, prev_sample_rate, new_sample_rate,
+            block_size=None):
+        up, down = rational_ratio(prev_sample_rate, new_sample_rate)
+        self.new_sample_rate = resampled_rate(prev_sample_rate, 
+                new_sample_rate)
+        def function(signal):
+            return _resample_poly(signal, up, down)
+        ChunkedStream.__init__(self, function, num_channels, 
+                polyphase_overlap(up, down), alignment=down, 
+                block_size=block_size, ratio=(up, down))
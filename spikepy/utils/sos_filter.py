@@ -0,0 +1,162 @@
+#  Copyright (C) 2012  David Morton
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+    IIR filtering of many channels at once with filters in second-order
+sections (sos) form, which unlike transfer function (b, a) form stays
+stable at high orders.  Signals are filtered along their last axis in
+blocks of time, so no full length intermediate arrays are made.
+"""
+import numpy
+import scipy.signal as scisig
+
+from spikepy.utils.filter_design_cache import memoized
+
+# number of samples (per channel) filtered at a time.
+BLOCK_LENGTH = 2**16
+
+def initial_state(sos, num_channels):
+    """
+    Return a zeroed filter state for <num_channels> channels, shaped
+    (num_sections, num_channels, 2) as filter_blocks expects.
+    """
+    return numpy.zeros((len(sos), num_channels, 2))
+
+def filter_blocks(sos, signal, out, state):
+    """
+    Filter <signal> (num_channels, num_samples) into <out>, which may be
+    <signal> itself or a view of it, starting from and updating <state>
+    (see initial_state) in place.
+    """
+    num_samples = signal.shape[-1]
+    for begin in xrange(0, num_samples, BLOCK_LENGTH):
+        end = min(begin + BLOCK_LENGTH, num_samples)
+        block = signal[:, begin:end]
+        for i, section in enumerate(sos):
+            block, state[i] = scisig.lfilter(section[:3], section[3:], block,
+                    axis=-1, zi=state[i])
+        out[:, begin:end] = block
+    return out
+
+@memoized
+def steady_state(sos):
+    """
+    Return the state (num_sections, 2) of the filter <sos> after a long 
+    run of ones, see scipy.signal.sosfilt_zi.
+    """
+    return scisig.sosfilt_zi(sos)
+
+def default_padlen(sos):
+    """
+    Return the number of samples filtfilt extends each end of the signal
+    by (the same as scipy.signal.sosfiltfilt).
+    """
+    sos = numpy.asarray(sos)
+    ntaps = 2*len(sos) + 1
+    ntaps -= min((sos[:, 2] == 0).sum(), (sos[:, 5] == 0).sum())
+    return 3*ntaps
+
+def pole_radius(sos):
+    """
+    Return the largest magnitude of the poles of the filter <sos>, the
+    filter is stable if this is less than one.
+    """
+    poles = scisig.sos2zpk(sos)[1]
+    if len(poles) == 0:
+        return 0.0
+    return numpy.max(numpy.abs(poles))
+
+def decay_length(sos, tolerance=1e-12):
+    """
+    Return the number of samples it takes the response of the filter <sos>
+    to an impulse (or to a mismatched starting state) to decay below 
+    <tolerance>, or None if the filter is not stable.
+    """
+    ntaps = 2*len(sos) + 1
+    radius = pole_radius(sos)
+    if radius >= 1.0:
+        return None
+    elif radius < tolerance:
+        return ntaps
+    return int(numpy.ceil(numpy.log(tolerance)/numpy.log(radius)))
+
+def _as_2d(signal, out, dtype):
+    signal = numpy.asarray(signal)
+    if out is None:
+        out = numpy.empty(signal.shape, dtype=dtype or signal.dtype)
+    if signal.ndim == 1:
+        return signal[numpy.newaxis], out[numpy.newaxis], out
+    return signal, out, out
+
+def lfilter(sos, signal, out=None, dtype=None):
+    """
+    Filter every channel of <signal> (1D or 2D) with the filter <sos>.
+    Inputs:
+        sos             : the filter, shaped (num_sections, 6)
+        signal          : a 1D or 2D (num_channels, num_samples) array
+        --kwargs--
+        out             : an array shaped like <signal> to write the 
+                          result into.
+        dtype           : the dtype of the result if <out> is not given
+                          (default is the dtype of <signal>).
+    Returns:
+        out             : the filtered signal
+    """
+    signal, out_2d, out = _as_2d(signal, out, dtype)
+    filter_blocks(sos, signal, out_2d, initial_state(sos, len(signal)))
+    return out
+
+def filtfilt(sos, signal, out=None, dtype=None, padlen=None):
+    """
+    Filter every channel of <signal> (1D or 2D) forwards and then backwards
+    with the filter <sos>, so that the result has no phase shift.  As with
+    scipy.signal.sosfiltfilt, the signal is extended at each end by <padlen>
+    samples (an odd extension) and the filter starts in the steady state
+    for the first (or last) sample, to minimize edge effects.
+    Inputs:
+        sos             : the filter, shaped (num_sections, 6)
+        signal          : a 1D or 2D (num_channels, num_samples) array
+        --kwargs--
+        out             : an array shaped like <signal> to write the 
+                          result into.
+        dtype           : the dtype of the result if <out> is not given
+                          (default is the dtype of <signal>).
+        padlen          : see default_padlen (at most num_samples-1).
+    Returns:
+        out             : the filtered signal
+    """
+    signal, out_2d, out = _as_2d(signal, out, dtype)
+    num_channels, num_samples = signal.shape
+    if padlen is None:
+        padlen = default_padlen(sos)
+    padlen = max(min(padlen, num_samples-1), 0)
+
+    # the extended signal, filtered in place (in float64).
+    work = numpy.empty((num_channels, num_samples + 2*padlen))
+    work[:, padlen:padlen+num_samples] = signal
+    if padlen > 0:
+        numpy.subtract(2*signal[:, :1], signal[:, padlen:0:-1],
+                out=work[:, :padlen])
+        numpy.subtract(2*signal[:, -1:], signal[:, -2:-padlen-2:-1],
+                out=work[:, -padlen:])
+
+    zi = steady_state(sos)[:, numpy.newaxis, :]
+    state = zi*work[numpy.newaxis, :, :1]
+    filter_blocks(sos, work, work, state)
+    backwards = work[:, ::-1]
+    state = zi*backwards[numpy.newaxis, :, :1]
+    filter_blocks(sos, backwards, backwards, state)
+    out_2d[...] = work[:, padlen:padlen+num_samples]
+    return out
@@ -0,0 +1,267 @@
+#  Copyright (C) 2012  David Morton
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+    Filters for recordings too long to hold in memory.  A streaming filter
+is given successive blocks of samples (num_channels, num_samples) and
+returns the filtered samples that are ready, carrying whatever state it
+needs from one block to the next, so memory use does not grow with the
+length of the recording.  Joined together, the outputs of process() and
+flush() are the filtered recording.
+"""
+from fractions import gcd
+
+import numpy
+
+from spikepy.utils import sos_filter
+from spikepy.utils.fir_convolve import convolve_same
+from spikepy.utils.precision import result_dtype
+
+def _append(buffer, block):
+    if buffer.shape[1] == 0:
+        return numpy.array(block, dtype=numpy.float64)
+    return numpy.concatenate([buffer, block], axis=1)
+
+
+class StreamingFilter(object):
+    """
+    Base class for streaming filters.  Subclasses implement _process and
+    may implement _flush.
+    """
+    def __init__(self, num_channels):
+        self.num_channels = num_channels
+        self.dtype = numpy.dtype(numpy.float64)
+
+    def _empty(self):
+        return numpy.empty((self.num_channels, 0), dtype=self.dtype)
+
+    def process(self, block):
+        """
+        Filter the next <block> of samples, returning the filtered samples
+        that are ready (fewer than, or more than, were given if the filter
+        needs samples from later blocks).
+        """
+        block = numpy.asarray(block)
+        if block.ndim == 1:
+            block = block[numpy.newaxis]
+        if len(block) != self.num_channels:
+            raise ValueError('Expected %d channels, got %d.' % 
+                    (self.num_channels, len(block)))
+        self.dtype = numpy.dtype(result_dtype(block))
+        return self._process(block).astype(self.dtype, copy=False)
+
+    def flush(self):
+        """Return the samples held back at the end of the recording."""
+        return self._flush().astype(self.dtype, copy=False)
+
+    def _process(self, block):
+        raise NotImplementedError
+
+    def _flush(self):
+        return self._empty()
+
+    def filter_blocks(self, blocks):
+        """
+        Yield the filtered samples for each of <blocks> (any iterable of
+        sample blocks, e.g. from a file reader) and then those held back.
+        """
+        for block in blocks:
+            result = self.process(block)
+            if result.shape[1]:
+                yield result
+        result = self.flush()
+        if result.shape[1]:
+            yield result
+
+
+class CausalIIRStream(StreamingFilter):
+    """
+    A causal IIR filter (in second-order sections), whose state is carried
+    from block to block.  The output is the same as sos_filter.lfilter on
+    the whole recording and has no delay.
+    """
+    def __init__(self, sos, num_channels):
+        StreamingFilter.__init__(self, num_channels)
+        self.sos = sos
+        self.state = sos_filter.initial_state(sos, num_channels)
+
+    def _process(self, block):
+        out = numpy.empty(block.shape)
+        return sos_filter.filter_blocks(self.sos, block, out, self.state)
+
+
+class FIRStream(StreamingFilter):
+    """
+    An FIR filter, which keeps the last len(kernel)-1 samples of each block
+    for the next.  The output is the same as fir_convolve.convolve_same on
+    the whole recording, delayed by (len(kernel)-1)//2 samples.
+    """
+    def __init__(self, kernel, num_channels):
+        StreamingFilter.__init__(self, num_channels)
+        self.kernel = numpy.asarray(kernel, dtype=numpy.float64)
+        taps = len(self.kernel)
+        self.delay = (taps-1)//2
+        self._history = numpy.zeros((num_channels, taps-1))
+        self._to_skip = self.delay
+
+    def _process(self, block):
+        taps = len(self.kernel)
+        buffered = _append(self._history, block)
+        # the full convolution at the times of <block>.
+        result = convolve_same(buffered, self.kernel)[:, 
+                taps-1-self.delay:buffered.shape[1]-self.delay]
+        self._history = buffered[:, buffered.shape[1]-(taps-1):]
+        skipped = min(self._to_skip, result.shape[1])
+        self._to_skip -= skipped
+        return result[:, skipped:]
+
+    def _flush(self):
+        # samples after the end of the recording are taken to be zero.
+        return self._process(numpy.zeros((self.num_channels, self.delay)))
+
+
+class ZeroPhaseIIRStream(StreamingFilter):
+    """
+    An IIR filter (in second-order sections) run forwards and backwards,
+    like sos_filter.filtfilt.  The forward pass carries its state from
+    block to block, the backward pass for each output block starts
+    <lookahead> samples later (so outputs lag inputs by that much) in the
+    steady state, which differs from filtfilt on the whole recording by
+    less than <tolerance>.  The first and last samples are treated exactly
+    as filtfilt treats them.
+    """
+    def __init__(self, sos, num_channels, lookahead=None, tolerance=1e-12,
+            padlen=None):
+        StreamingFilter.__init__(self, num_channels)
+        self.sos = sos
+        if lookahead is None:
+            lookahead = sos_filter.decay_length(sos, tolerance)
+            if lookahead is None:
+                raise ValueError('The filter is not stable.')
+        self.lookahead = lookahead
+        if padlen is None:
+            padlen = sos_filter.default_padlen(sos)
+        self.padlen = padlen
+        self._zi = sos_filter.steady_state(sos)[:, numpy.newaxis, :]
+        self._state = None
+        # the last padlen+1 input samples (all of them until started).
+        self._tail = numpy.empty((num_channels, 0))
+        # forward filtered samples not yet output.
+        self._forward = numpy.empty((num_channels, 0))
+
+    def _forward_filter(self, block):
+        out = numpy.empty(block.shape)
+        return sos_filter.filter_blocks(self.sos, block, out, self._state)
+
+    def _backward_filter(self, num_samples):
+        forward = self._forward
+        out = numpy.empty(forward.shape)
+        backwards = forward[:, ::-1]
+        state = self._zi*backwards[numpy.newaxis, :, :1]
+        sos_filter.filter_blocks(self.sos, backwards, out[:, ::-1], state)
+        self._forward = forward[:, num_samples:]
+        return out[:, :num_samples]
+
+    def _process(self, block):
+        self._tail = _append(self._tail, block)
+        if self._state is None:
+            if self._tail.shape[1] <= self.padlen:
+                return self._empty()
+            # start as filtfilt does, with an odd extension of the start.
+            tail = self._tail
+            extension = 2*tail[:, :1] - tail[:, self.padlen:0:-1]
+            self._state = self._zi*extension[numpy.newaxis, :, :1]
+            self._forward_filter(extension)
+            block = tail
+        self._tail = self._tail[:, -(self.padlen+1):]
+        self._forward = _append(self._forward, self._forward_filter(block))
+
+        num_ready = self._forward.shape[1] - self.lookahead
+        if num_ready <= 0:
+            return self._empty()
+        return self._backward_filter(num_ready)
+
+    def _flush(self):
+        if self._state is None:
+            if self._tail.shape[1] == 0:
+                return self._empty()
+            return sos_filter.filtfilt(self.sos, self._tail, 
+                    padlen=self.padlen)
+        # end as filtfilt does, with an odd extension of the end.
+        tail = self._tail
+        extension = 2*tail[:, -1:] - tail[:, -2:-self.padlen-2:-1]
+        num_samples = self._forward.shape[1]
+        self._forward = _append(self._forward, 
+                self._forward_filter(extension))
+        return self._backward_filter(num_samples)
+
+
+class ChunkedStream(StreamingFilter):
+    """
+    Applies <function> (which filters a whole signal) to blocks of
+    <block_size> samples, each with <overlap> samples of context on either
+    side, just as spikepy splits long recordings into blocks of time (see
+    SpikepyMethod.chunk_overlap).  Blocks start on multiples of
+    <alignment>.  If <function> changes the sampling rate by <ratio> 
+    (up, down), the result of samples begin to end is taken to be samples
+    begin*up/down to end*up/down of its output (rounded down).
+    """
+    def __init__(self, function, num_channels, overlap, alignment=1,
+            block_size=None, ratio=(1, 1)):
+        StreamingFilter.__init__(self, num_channels)
+        self.function = function
+        self.up, self.down = ratio
+        # blocks must start on whole output samples.
+        alignment = alignment*self.down//gcd(alignment, self.down)
+        if block_size is None:
+            block_size = max(4*overlap, 2**16)
+        # round up to whole multiples of the alignment.
+        self.block_size = -(-max(block_size, 1)//alignment)*alignment
+        self.overlap = -(-overlap//alignment)*alignment
+        self._buffer = numpy.empty((num_channels, 0))
+        self._buffer_begin = 0 # the time of the first buffered sample.
+        self._next = 0 # the time of the first sample not yet output.
+
+    def _emit(self, end, padded_end):
+        begin = self._next
+        padded_begin = max(0, begin-self.overlap)
+        chunk = self._buffer[:, padded_begin-self._buffer_begin:
+                padded_end-self._buffer_begin]
+        result = numpy.asarray(self.function(chunk))
+        self._next = end
+        # keep only what the next block needs.
+        discard = max(0, end-self.overlap) - self._buffer_begin
+        self._buffer = self._buffer[:, discard:]
+        self._buffer_begin += discard
+        return result[:, (begin-padded_begin)*self.up//self.down:
+                (end-padded_begin)*self.up//self.down]
+
+    def _process(self, block):
+        self._buffer = _append(self._buffer, block)
+        buffer_end = self._buffer_begin + self._buffer.shape[1]
+        results = [self._empty()]
+        while self._next + self.block_size + self.overlap <= buffer_end:
+            end = self._next + self.block_size
+            results.append(self._emit(end, end+self.overlap))
+        return numpy.concatenate(results, axis=1)
+
+    def _flush(self):
+        buffer_end = self._buffer_begin + self._buffer.shape[1]
+        results = [self._empty()]
+        while self._next < buffer_end:
+            end = min(self._next + self.block_size, buffer_end)
+            results.append(self._emit(end, min(buffer_end, 
+                    end+self.overlap)))
+        return numpy.concatenate(results, axis=1)
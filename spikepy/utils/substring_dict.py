@@ -14,6 +14,8 @@
 #  along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 
+from collections import defaultdict
+
 class SubstringDict(dict):
     '''
         A dictionary whose elements can be fetched either by giving the full
@@ -21,7 +23,7 @@ class SubstringDict(dict):
     isn't a unique subset of any key.
     '''
     def __getitem__(self, key):
-        if key in self.keys():
+        if dict.__contains__(self, key):
             return dict.__getitem__(self, key)
         else:
             pkeys = []
@@ -32,3 +34,65 @@ class SubstringDict(dict):
                 return dict.__getitem__(self, pkeys[0])
             else:
                 raise KeyError("%s is an invalid key." % key)
+
+
+class SubstringIndex(object):
+    '''
+        Like a SubstringDict, but with an index of the keys' trigrams so
+    that fetching by a part of a key doesn't scan all the keys.
+    '''
+    gram_length = 3
+
+    def __init__(self):
+        self._items = {}
+        self._keys_with_gram = defaultdict(set)
+
+    def _grams(self, key):
+        n = self.gram_length
+        return set([key[i:i+n] for i in xrange(len(key)-n+1)])
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def __setitem__(self, key, value):
+        if key not in self._items:
+            for gram in self._grams(key):
+                self._keys_with_gram[gram].add(key)
+        self._items[key] = value
+
+    def __delitem__(self, key):
+        del self._items[key]
+        for gram in self._grams(key):
+            keys = self._keys_with_gram[gram]
+            keys.discard(key)
+            if not keys:
+                del self._keys_with_gram[gram]
+
+    def keys(self):
+        return self._items.keys()
+
+    def values(self):
+        return self._items.values()
+
+    def matching_keys(self, part):
+        '''Return the keys that contain <part>.'''
+        grams = self._grams(part)
+        if not grams: # too short to use the index.
+            return [key for key in self._items if part in key]
+        # check the rarest grams first.
+        gram_sets = sorted([self._keys_with_gram.get(gram, set()) 
+                for gram in grams], key=len)
+        candidates = set.intersection(*gram_sets)
+        return [key for key in candidates if part in key]
+
+    def __getitem__(self, key):
+        if key in self._items:
+            return self._items[key]
+        matching_keys = self.matching_keys(key)
+        if len(matching_keys) == 1:
+            return self._items[matching_keys[0]]
+        else:
+            raise KeyError("%s is an invalid key." % key)
@@ -0,0 +1,107 @@
+#  Copyright (C) 2012  David Morton
+#
+#  This program is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU General Public License as published by
+#  the Free Software Foundation, either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU General Public License for more details.
+#
+#  You should have received a copy of the GNU General Public License
+#  along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+'''
+    A uniformly sampled time axis that is only turned into an array when
+(and as much as) it is needed.
+'''
+import numpy
+
+class TimeAxis(object):
+    '''
+        The times start + i/sampling_freq for i in range(length).  Indexing
+    with an integer gives a time, with a slice another TimeAxis, and
+    numpy.asarray(time_axis) gives the array of times.
+    '''
+    dtype = numpy.dtype(numpy.float64)
+    ndim = 1
+
+    def __init__(self, start, sampling_freq, length):
+        self.start = float(start)
+        self.sampling_freq = float(sampling_freq)
+        self.length = int(length)
+
+    @property
+    def shape(self):
+        return (self.length,)
+
+    def __len__(self):
+        return self.length
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            begin, end, step = key.indices(self.length)
+            if step < 0:
+                return self.as_array()[key]
+            length = len(xrange(begin, end, step))
+            return TimeAxis(self.start + begin/self.sampling_freq,
+                    self.sampling_freq/step, length)
+        if isinstance(key, (int, long, numpy.integer)):
+            if key < 0:
+                key += self.length
+            if not 0 <= key < self.length:
+                raise IndexError('index out of range')
+            return self.start + key/self.sampling_freq
+        indexes = numpy.asarray(key)
+        indexes = numpy.where(indexes < 0, indexes + self.length, indexes)
+        if numpy.any((indexes < 0) | (indexes >= self.length)):
+            raise IndexError('index out of range')
+        return self.start + indexes/self.sampling_freq
+
+    def __iter__(self):
+        for i in xrange(self.length):
+            yield self.start + i/self.sampling_freq
+
+    def as_array(self):
+        '''Return the times as an array.'''
+        return self.start + numpy.arange(self.length)/self.sampling_freq
+
+    def __array__(self, dtype=None):
+        result = self.as_array()
+        if dtype is not None:
+            result = result.astype(dtype)
+        return result
+
+    def searchsorted(self, value, side='left', sorter=None):
+        '''
+            Like numpy.searchsorted: the index where <value> would be
+    inserted to keep the times in order ('left' before equal times, 'right'
+    after them).
+        '''
+        values = numpy.asarray(value, dtype=numpy.float64)
+        position = (values - self.start)*self.sampling_freq
+        if side == 'left':
+            result = numpy.ceil(position)
+        else:
+            result = numpy.floor(position) + 1
+        result = numpy.clip(numpy.nan_to_num(result), 0, self.length)
+        result = result.astype(numpy.int64)
+
+        # correct for rounding, comparing against the times themselves.
+        times_before = self.start + (result - 1)/self.sampling_freq
+        times_at = self.start + result/self.sampling_freq
+        if side == 'left':
+            result -= (result > 0) & (times_before >= values)
+            result += (result < self.length) & (times_at < values)
+        else:
+            result -= (result > 0) & (times_before > values)
+            result += (result < self.length) & (times_at <= values)
+        if result.ndim == 0:
+            return int(result)
+        return result
+
+    def __repr__(self):
+        return 'TimeAxis(%r, %r, %d)' % (self.start, self.sampling_freq, 
+                self.length)